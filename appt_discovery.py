@@ -0,0 +1,115 @@
+"""
+Bounded-depth search for a hospital's online registration page.
+
+Starting from the homepage, links are scored by their text and URL:
+  appointment candidates  text with an APPT_TEXT_KW keyword, or a URL matching
+                          APPT_URL_RE (weaker); any domain
+  links worth following   same domain, text or URL that looks like a menu leading
+                          there (就醫服務, 門診資訊, …), best score first
+Pages are fetched SITE_CONCURRENCY at a time, no deeper than MAX_DEPTH links
+from the homepage and no more than MAX_PAGES per site. The search stops as
+soon as a candidate reaches STOP_SCORE (a keyword in the link text), so a
+hospital whose homepage already links to registration costs one request, as
+before; only homepages without such a link are explored further.
+Usage:
+    found = await discover_appointment(client, "https://www.tahsda.org.tw/")
+    found.url, found.score, found.depth      # or None
+"""
+import asyncio
+import heapq
+import re
+from dataclasses import dataclass
+from urllib.parse import urldefrag, urljoin
+
+from crawl_client import host_of
+from link_extractor import iter_anchors
+from pipeline_profile import PROFILE
+
+# 掛號文字關鍵字
+APPT_TEXT_KW = ["網路掛號", "線上掛號", "掛號", "預約掛號", "網路預約", "線上預約"]
+APPT_URL_RE = re.compile(r"(appointment|register|booking|netreg|regist|預約|掛號)", re.I)
+# 常通往掛號頁的選單
+NAV_TEXT_KW = ["就醫服務", "門診資訊", "門診服務", "就醫指南", "就診須知", "門診時間", "門診表", "病患服務", "民眾服務"]
+NAV_URL_RE = re.compile(r"(service|outpatient|opd|clinic|guide|patient)", re.I)
+SKIP_HREF = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".doc", ".xls", ".zip", "mailto:", "tel:")
+
+MAX_DEPTH = 2
+MAX_PAGES = 8
+SITE_CONCURRENCY = 3
+STOP_SCORE = 8      # keyword in the link text; a matching URL adds 3 more
+
+
+@dataclass
+class Candidate:
+    url: str
+    score: int
+    depth: int          # depth of the page the link was found on (0 = homepage)
+    order: int          # discovery order, breaks ties in favour of earlier links
+
+
+def appointment_score(href: str, text: str) -> int:
+    score = 0
+    if any(kw in text for kw in APPT_TEXT_KW):
+        score = STOP_SCORE
+    if APPT_URL_RE.search(href):
+        score += 3
+    return score
+
+
+def follow_score(href: str, text: str) -> int:
+    score = 0
+    if any(kw in text for kw in NAV_TEXT_KW):
+        score += 5
+    if NAV_URL_RE.search(href):
+        score += 2
+    return score
+
+
+async def discover_appointment(client, homepage: str, max_depth: int = MAX_DEPTH,
+                               max_pages: int = MAX_PAGES) -> Candidate | None:
+    site = host_of(homepage)
+    seen = {urldefrag(homepage)[0]}
+    frontier: list[tuple[int, int, int, str]] = [(0, 0, 0, homepage)]   # (-score, depth, order, url)
+    best: Candidate | None = None
+    order = 0
+    fetched = 0
+
+    async def visit(url: str, depth: int):
+        try:
+            resp = await client.get(url, phase="homepage" if depth == 0 else "appt_crawl")
+        except Exception:
+            return None
+        return resp if resp.status < 400 else None
+
+    while frontier and fetched < max_pages:
+        wave = [heapq.heappop(frontier) for _ in range(min(SITE_CONCURRENCY, max_pages - fetched, len(frontier)))]
+        fetched += len(wave)
+        pages = await asyncio.gather(*(visit(url, depth) for _, depth, _, url in wave))
+        for (_, depth, _, _), resp in zip(wave, pages):
+            if resp is None:
+                continue
+            if depth == 0:             # the homepage may redirect to another host (http→https, a new domain)
+                site = host_of(resp.url)
+                seen.add(urldefrag(resp.url)[0])
+            # 第一個文字含掛號關鍵字的連結即採用並停止解析（與原本首頁的規則相同）
+            for href, text in PROFILE.iterate("html.parse", iter_anchors(resp.content, resp.encoding)):
+                if not href or href.startswith("#") or href.lower().startswith("javascript"):
+                    continue
+                if any(bad in href.lower() for bad in SKIP_HREF):
+                    continue
+                url = href if href.startswith("http") else urljoin(resp.url, href)
+                order += 1
+                score = appointment_score(href, text)
+                if score and (best is None or score > best.score):
+                    best = Candidate(url, score, depth, order)
+                    if score >= STOP_SCORE:
+                        break
+                if depth < max_depth and host_of(url) == site:
+                    key = urldefrag(url)[0]
+                    priority = follow_score(href, text)
+                    if priority and key not in seen:
+                        seen.add(key)
+                        heapq.heappush(frontier, (-priority, depth + 1, order, url))
+        if best and best.score >= STOP_SCORE:
+            break
+    return best
@@ -0,0 +1,241 @@
+"""
+Scale-out benchmarks for the data pipeline.
+
+For every scale a synthetic registry is generated (benchmarks/synth_ods.py)
+and each stage is timed in a fresh child process: wall time, CPU time,
+tracemalloc peak, peak RSS and items/s. Results are appended to
+benchmarks/history.json and compared with the previous run at the same
+scale, so throughput or memory regressions stand out.
+Usage:
+  python benchmarks/run_benchmarks.py                     # 1×, 10×, 100×
+  python benchmarks/run_benchmarks.py --scales 1,10,100,1000
+  python benchmarks/run_benchmarks.py --stages parse,convert
+  python benchmarks/run_benchmarks.py --format csv        # registry as CSV (ods, csv, xlsx)
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+HISTORY_JSON = ROOT / "benchmarks" / "history.json"
+STAGES = ["parse", "convert", "write", "export", "merge"]
+FORMATS = ["ods", "csv", "xlsx"]
+REGRESSION_RATIO = 1.2   # flag stages 20% slower / larger than last time
+
+try:
+    import resource
+except ImportError:       # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def measure(results: dict, stage: str, counter: dict):
+    """Record wall/CPU time, tracemalloc peak (above what was live before) and throughput of one stage."""
+    tracemalloc.reset_peak()
+    live = tracemalloc.get_traced_memory()[0]
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    items = counter.get("items", 0)
+    results[stage] = {
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_mem_mb": round((tracemalloc.get_traced_memory()[1] - live) / 1e6, 2),
+        "items": items,
+        "items_per_s": round(items / wall, 1) if wall else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ─── Child: run the stages for one scale ─────────────────────────────────────
+def run_child(scale: int, stages: list[str], fmt: str) -> dict:
+    import convert_hospitals as ch
+    from benchmarks.synth_ods import BASE_ROWS, synth_rows, write_registry
+    from registry_readers import read_records
+
+    results: dict = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / f"registry_{scale}x.{fmt}"
+        write_registry(source, synth_rows(scale * BASE_ROWS))
+        with open(ROOT / ch.EXISTING_JSON, encoding="utf-8") as f:
+            existing = json.load(f)
+
+        tracemalloc.start()
+        hospitals: list[dict] = []
+        department_rows = []
+        quiet = contextlib.redirect_stdout(io.StringIO())
+
+        if "parse" in stages:
+            counter = {}
+            with measure(results, "parse", counter):
+                counter["items"] = sum(1 for _ in read_records(source))
+
+        counter = {}
+        with measure(results, "convert", counter):
+            for code, _, status, entry, facility in ch.convert_records(
+                read_records(source), (existing, {}, False), workers=1
+            ):
+                counter["items"] = counter.get("items", 0) + 1
+                if status == "built":
+                    hospitals.append(entry)
+                if facility:
+                    department_rows.append((code, *facility))
+        if "convert" not in stages:
+            results.pop("convert")
+
+        out_json = tmp / "hospitals.json"
+        if "write" in stages:
+            import build_search_index
+            import compact_bundle
+            import dataset_writer
+            import department_index
+            counter = {"items": len(hospitals)}
+            with measure(results, "write", counter), quiet:
+                dataset_writer.write_dataset(hospitals, out_json, tmp / "manifest.json")
+                compact_bundle.write_compact(hospitals, tmp / "compact.json")
+                build_search_index.write_index(hospitals, tmp / "search_index.json")
+                department_index.write_departments(department_rows, tmp / "departments.json")
+        else:
+            with open(out_json, "w", encoding="utf-8") as f:
+                json.dump(hospitals, f, ensure_ascii=False)
+
+        if "export" in stages:
+            import export_hospitals
+            export_hospitals.HOSPITALS_JSON = out_json
+            export_hospitals.OUTPUT_FILE = tmp / "hospitals.xlsx"
+            sys.argv = ["export_hospitals.py"]
+            counter = {"items": len(hospitals)}
+            with measure(results, "export", counter), quiet:
+                export_hospitals.main()
+
+        if "merge" in stages:
+            # same work as `find_hospital_urls.py --merge`: open the URL cache, merge, write the dataset
+            import compact_bundle
+            import dataset_writer
+            import find_hospital_urls
+            from url_cache import UrlCache
+            cache_json = tmp / "hospital_urls_cache.json"
+            with UrlCache(cache_json) as cache:
+                for i, h in enumerate(hospitals):
+                    if i % 2 == 0:
+                        cache[h["id"]] = {"website": f"https://h{i}.example.tw/",
+                                          "appointmentUrl": f"https://h{i}.example.tw/reg"}
+            counter = {"items": len(hospitals)}
+            with measure(results, "merge", counter), quiet:
+                with UrlCache(cache_json) as cache:
+                    merged = find_hospital_urls.merge_cache(hospitals, cache)
+                if dataset_writer.write_dataset(merged, tmp / "merged.json", tmp / "merged_manifest.json"):
+                    compact_bundle.write_compact(merged, tmp / "merged_compact.json")
+
+        tracemalloc.stop()
+    return {"scale": scale, "format": fmt, "rows": scale * BASE_ROWS, "hospitals": len(hospitals), "stages": results}
+
+
+# ─── Parent: orchestrate scales, history and regression report ───────────────
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history() -> list[dict]:
+    if HISTORY_JSON.exists():
+        with open(HISTORY_JSON, encoding="utf-8") as f:
+            return json.load(f)
+    return []
+
+
+def previous_result(history: list[dict], current: dict) -> dict | None:
+    """Last result for the same scale, format and registry size (runs before a resize are not comparable)."""
+    for run in reversed(history):
+        for result in run["results"]:
+            if (result["scale"], result.get("format", "ods"), result["rows"]) == (
+                    current["scale"], current["format"], current["rows"]):
+                return result
+    return None
+
+
+def report(result: dict, previous: dict | None) -> None:
+    print(f"\n{result['scale']}× {result['format']} ({result['rows']:,} rows, {result['hospitals']:,} hospitals)")
+    print(f"  {'stage':<9}{'wall s':>9}{'cpu s':>9}{'items/s':>12}{'py MB':>9}{'RSS MB':>9}")
+    for stage, m in result["stages"].items():
+        flags = []
+        old = (previous or {}).get("stages", {}).get(stage)
+        if old:
+            if m["wall_s"] > old["wall_s"] * REGRESSION_RATIO:
+                flags.append(f"slower ×{m['wall_s'] / old['wall_s']:.2f}")
+            if old["peak_mem_mb"] and m["peak_mem_mb"] > old["peak_mem_mb"] * REGRESSION_RATIO:
+                flags.append(f"memory ×{m['peak_mem_mb'] / old['peak_mem_mb']:.2f}")
+        rss = m["peak_rss_mb"] if m["peak_rss_mb"] is not None else "-"
+        print(f"  {stage:<9}{m['wall_s']:>9.3f}{m['cpu_s']:>9.3f}{m['items_per_s'] or 0:>12,.0f}"
+              f"{m['peak_mem_mb']:>9.1f}{rss:>9}  {'  '.join(flags)}")
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic registries")
+    parser.add_argument("--scales", default="1,10,100", help="comma-separated multiples of today's 481 hospitals")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"subset of {','.join(STAGES)}")
+    parser.add_argument("--format", default="ods", choices=FORMATS, help="registry file format to parse")
+    parser.add_argument("--no-history", action="store_true", help="do not append to history.json")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    stages = [s for s in args.stages.split(",") if s]
+
+    if args.child is not None:
+        print(json.dumps(run_child(args.child, stages, args.format), ensure_ascii=False))
+        return
+
+    os.chdir(ROOT)
+    history = load_history()
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for scale in (int(s) for s in args.scales.split(",")):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", str(scale), "--stages", ",".join(stages),
+             "--format", args.format],
+            cwd=ROOT, capture_output=True, text=True, encoding="utf-8",
+        )
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            sys.exit(f"benchmark at {scale}× failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        report(result, previous_result(history, result))
+        run["results"].append(result)
+
+    if not args.no_history:
+        history.append(run)
+        with open(HISTORY_JSON, "w", encoding="utf-8") as f:
+            json.dump(history, f, ensure_ascii=False, indent=2)
+        print(f"\nAppended to {HISTORY_JSON.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Synthetic MOHW registry generator for benchmarks.
+
+Writes an ODS (or CSV / XLSX, picked by the --out suffix) file with the
+columns convert_hospitals.py reads. Rows are
+sampled so that the city/district mix follows today's hospitals.json and
+科別 follow a long-tailed distribution: hospitals carry 6–30 departments,
+clinics 1–3. All three writers stream, so even 1000× files are written in
+constant memory.
+Usage:
+  python benchmarks/synth_ods.py --scale 10 --out /tmp/registry_10x.ods
+  python benchmarks/synth_ods.py --scale 10 --out /tmp/registry_10x.csv
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from location_resolver import DISTRICTS  # noqa: E402
+
+HOSPITALS_JSON = Path("src/data/hospitals.json")
+BASE_HOSPITALS = 481       # 1× = today's hospital count
+BASE_ROWS = 4810           # registry rows per 1×: mostly clinics, which convert skips
+# Hospitals are spaced evenly through the rows, so scale × BASE_ROWS rows hold
+# exactly scale × BASE_HOSPITALS of them (the real registry has even more
+# clinics per hospital; 10:1 keeps 100× parseable in seconds).
+
+HEADER = ["機構代碼", "機構名稱", "縣市區名", "地址", "電話", "科別"]
+
+# (科別, relative weight) — common departments first, long tail after
+DEPARTMENTS = [
+    ("家庭醫學科", 30), ("內科", 28), ("外科", 20), ("小兒科", 18), ("婦產科", 12),
+    ("骨科", 12), ("眼科", 10), ("耳鼻喉科", 10), ("皮膚科", 9), ("泌尿科", 8),
+    ("復健科", 8), ("牙科", 8), ("中醫一般科", 8), ("精神科", 7), ("神經科", 6),
+    ("急診科", 6), ("放射診斷科", 5), ("麻醉科", 5), ("腎臟科", 4), ("心臟血管內科", 4),
+    ("胸腔內科", 4), ("腸胃內科", 4), ("神經外科", 3), ("整形外科", 3), ("病理科", 3),
+    ("放射腫瘤科", 2), ("血液腫瘤科", 2), ("核子醫學科", 2), ("職業醫學科", 1),
+    ("安寧緩和醫療科", 1), ("兒童青少年精神科", 1), ("口腔外科", 1), ("針灸科", 1),
+]
+ROADS = ["中正路", "中山路", "民生路", "民權路", "建國路", "復興路", "光復路", "忠孝路",
+         "仁愛路", "信義路", "和平路", "成功路", "文化路", "自由路", "三民路", "中華路"]
+NAME_STEMS = ["仁愛", "安康", "博愛", "慈心", "永和", "祥和", "康寧", "宏恩", "同仁",
+              "惠民", "建成", "長安", "華濟", "福田", "佑民", "信安", "德生", "明德"]
+TAI = {"台北市": "臺北市", "台中市": "臺中市", "台南市": "臺南市", "台東縣": "臺東縣"}
+
+
+def city_weights() -> list[tuple[str, str, int]]:
+    """(city, district, weight) from the current dataset, every district at least 1."""
+    counts: dict[tuple[str, str], int] = {}
+    if HOSPITALS_JSON.exists():
+        with open(HOSPITALS_JSON, encoding="utf-8") as f:
+            for h in json.load(f):
+                counts[(h["city"], h["district"])] = counts.get((h["city"], h["district"]), 0) + 1
+    return [(c, d, 1 + 4 * counts.get((c, d), 0)) for c, ds in DISTRICTS.items() for d in ds]
+
+
+def synth_rows(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    places = city_weights()
+    place_w = [w for _, _, w in places]
+    depts = [d for d, _ in DEPARTMENTS]
+    dept_w = [w for _, w in DEPARTMENTS]
+    for i in range(n):
+        city, district, _ = rng.choices(places, place_w)[0]
+        raw_city = TAI.get(city, city)
+        is_hospital = (i + 1) * BASE_HOSPITALS // BASE_ROWS > i * BASE_HOSPITALS // BASE_ROWS
+        stem = rng.choice(NAME_STEMS) + district[:-1]
+        if is_hospital:
+            name = rng.choice(["", "醫療財團法人", "醫療社團法人"]) + stem + rng.choice(["醫院", "綜合醫院", "紀念醫院"])
+            k = rng.randint(6, 30)
+        else:
+            name = stem + rng.choice(["診所", "內科診所", "牙醫診所", "中醫診所", "耳鼻喉科診所"])
+            k = rng.randint(1, 3)
+        chosen = list(dict.fromkeys(rng.choices(depts, dept_w, k=k)))
+        yield [
+            f"{rng.randint(1, 9)}{i:09d}",
+            name,
+            raw_city + district,
+            f"{raw_city}{district}{rng.choice(ROADS)}{rng.randint(1, 400)}號",
+            f"0{rng.randint(2, 8)}{rng.randint(1000000, 9999999)}",
+            ",".join(chosen),
+        ]
+
+
+def _cell(value: str) -> str:
+    return f'<table:table-cell office:value-type="string"><text:p>{escape(value)}</text:p></table:table-cell>'
+
+
+def write_ods(path: Path, rows) -> int:
+    ns = ('xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+          'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+          'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"')
+    count = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("mimetype", "application/vnd.oasis.opendocument.spreadsheet", compress_type=zipfile.ZIP_STORED)
+        with z.open("content.xml", "w") as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?><office:document-content {ns}>'
+                    '<office:body><office:spreadsheet><table:table table:name="醫療機構">'.encode("utf-8"))
+            f.write(("<table:table-row>" + "".join(map(_cell, HEADER)) + "</table:table-row>").encode("utf-8"))
+            for row in rows:
+                f.write(("<table:table-row>" + "".join(map(_cell, row))
+                         + '<table:table-cell table:number-columns-repeated="1018"/></table:table-row>').encode("utf-8"))
+                count += 1
+            f.write(('<table:table-row table:number-rows-repeated="1048000">'
+                     '<table:table-cell table:number-columns-repeated="1024"/></table:table-row>'
+                     "</table:table></office:spreadsheet></office:body></office:document-content>").encode("utf-8"))
+    return count
+
+
+def write_csv(path: Path, rows) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_xlsx(path: Path, rows) -> int:
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("醫療機構")
+    ws.append(HEADER)
+    count = 0
+    for row in rows:
+        ws.append(row)
+        count += 1
+    wb.save(path)
+    return count
+
+
+WRITERS = {".ods": write_ods, ".csv": write_csv, ".xlsx": write_xlsx}
+
+
+def write_registry(path: Path, rows) -> int:
+    """Write `rows` in the format named by the suffix of `path`."""
+    return WRITERS[path.suffix.lower()](path, rows)
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    parser = argparse.ArgumentParser(description="Write a synthetic MOHW registry (.ods / .csv / .xlsx)")
+    parser.add_argument("--scale", type=int, default=1, help=f"rows = scale × {BASE_ROWS} ({BASE_HOSPITALS} of them hospitals)")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    n = write_registry(args.out, synth_rows(args.scale * BASE_ROWS, args.seed))
+    print(f"Wrote {args.out}: {n} rows")
+
+
+if __name__ == "__main__":
+    main()
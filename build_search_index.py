@@ -0,0 +1,172 @@
+"""
+Build the n-gram inverted index used by GET /api/hospitals?q=.
+
+Each hospital gets one folded search key (full name, city, district,
+address; full-width → half-width, 臺 → 台, lowercased, spaces removed).
+The name is indexed in full, so "衛生福利部" or "財團法人" still find every
+hospital they used to; the prefix-stripped form is a suffix of it and adds
+a field only when it is not. Queries are folded the same way but never
+stripped. Every character unigram and bigram of the key gets a posting
+list of hospital indices, so the route answers a substring query by
+intersecting postings and checking only the surviving keys.
+Usage:
+  python build_search_index.py            # write src/data/search_index.json
+  python build_search_index.py --verify   # also check query() against the route's original filter
+
+File format (version 2):
+  {"v": 2, "keys": [<key>, ...], "grams": {<gram>: [first id, delta, delta, ...], ...}}
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+from name_index import fold, normalize_name
+
+HOSPITALS_JSON = Path("src/data/hospitals.json")
+INDEX_JSON = Path("src/data/search_index.json")
+
+FORMAT_VERSION = 2
+FIELD_SEP = "\x1f"   # keeps a query from matching across two fields
+
+
+# ─── Keys ────────────────────────────────────────────────────────────────────
+def fold_query(text: str) -> str:
+    """Fold text the same way as the keys; legal-entity prefixes are kept."""
+    return fold(text).replace(" ", "")
+
+
+def search_key(h: dict) -> str:
+    name = fold(h["name"]).replace(" ", "")
+    fields = [name] + [fold(h.get(key, "")).replace(" ", "") for key in ("city", "district", "address")]
+    stripped = normalize_name(h["name"])
+    if stripped not in name:
+        fields.append(stripped)
+    return FIELD_SEP.join(fields)
+
+
+def grams_of(key: str) -> set[str]:
+    grams = set()
+    for part in key.split(FIELD_SEP):
+        grams.update(part)
+        grams.update(part[i:i + 2] for i in range(len(part) - 1))
+    return grams
+
+
+# ─── Build ───────────────────────────────────────────────────────────────────
+def build_index(hospitals: list[dict]) -> dict:
+    keys = [search_key(h) for h in hospitals]
+    postings: dict[str, list[int]] = {}
+    for doc_id, key in enumerate(keys):
+        for gram in grams_of(key):
+            postings.setdefault(gram, []).append(doc_id)
+
+    grams = {}
+    for gram in sorted(postings):
+        ids = postings[gram]
+        grams[gram] = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+    return {
+        "v": FORMAT_VERSION,
+        "keys": keys,
+        "grams": grams,
+    }
+
+
+def write_index(hospitals: list[dict], path: Path = INDEX_JSON) -> None:
+    index = build_index(hospitals)
+    blob = json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    path.write_bytes(blob)
+    print(f"Wrote {path} ({len(index['grams']):,} grams, {len(blob):,} B)")
+
+
+# ─── Reference query ─────────────────────────────────────────────────────────
+class SearchIndex:
+    def __init__(self, index: dict):
+        if index["v"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported search index version {index['v']}")
+        self.keys = index["keys"]
+        self.postings = {}
+        for gram, deltas in index["grams"].items():
+            ids, doc_id = [], 0
+            for d in deltas:
+                doc_id += d
+                ids.append(doc_id)
+            self.postings[gram] = ids
+
+    def query(self, text: str) -> list[int]:
+        """Indices of hospitals whose key contains the folded query, in dataset order."""
+        q = fold_query(text)
+        if not q:
+            return list(range(len(self.keys)))
+        if len(q) == 1:
+            return list(self.postings.get(q, []))
+        lists = [self.postings.get(q[i:i + 2], []) for i in range(len(q) - 1)]
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            candidates.intersection_update(ids)
+            if not candidates:
+                return []
+        if len(q) == 2:
+            return sorted(candidates)
+        return [i for i in sorted(candidates) if q in self.keys[i]]
+
+
+SEARCH_FIELDS = ("name", "city", "district", "address")
+
+
+def linear_filter(hospitals: list[dict], text: str) -> list[int]:
+    """The route's original filter: case-insensitive substring of name / city / district / address."""
+    q = text.lower()
+    return [i for i, h in enumerate(hospitals) if any(q in h.get(key, "").lower() for key in SEARCH_FIELDS)]
+
+
+def folded_match(h: dict, q: str) -> bool:
+    return any(q in fold(h.get(key, "")).replace(" ", "") for key in SEARCH_FIELDS)
+
+
+def verify(hospitals: list[dict], index: SearchIndex, samples: int = 3000) -> int:
+    """Check query() against linear_filter() on substrings of the real data.
+
+    Every hospital the original filter returns must come back. Extra hits
+    are allowed only when folding explains them (臺/台, full-width, spaces).
+    """
+    rng = random.Random(0)
+    texts = [h[key] for h in hospitals for key in ("name", "address", "district") if h.get(key)]
+    queries = ["", "台", "臺北", "長庚", "中山", "ＡＢＣ", "xyz",
+               "衛生福利部", "臺北市立", "醫療財團法人", "財團法人", "市立"]
+    for _ in range(samples):
+        t = rng.choice(texts)
+        start = rng.randrange(len(t))
+        queries.append(t[start:start + rng.randint(1, 6)])
+    failures = 0
+    for q in queries:
+        got = set(index.query(q))
+        missing = set(linear_filter(hospitals, q)) - got
+        q_folded = fold_query(q)
+        extra = [i for i in got if q_folded and not folded_match(hospitals[i], q_folded)]
+        if missing or extra:
+            failures += 1
+            print(f"  MISMATCH: {q!r} ({len(missing)} missing, {len(extra)} unexplained)")
+    print(f"Verified {len(queries)} queries, {failures} mismatches.")
+    return failures
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    parser = argparse.ArgumentParser(description="Build the /api/hospitals search index")
+    parser.add_argument("--verify", action="store_true", help="check query() against the route's original filter")
+    args = parser.parse_args()
+
+    with open(HOSPITALS_JSON, encoding="utf-8") as f:
+        hospitals = json.load(f)
+    write_index(hospitals)
+    if args.verify:
+        with open(INDEX_JSON, encoding="utf-8") as f:
+            index = SearchIndex(json.load(f))
+        sys.exit(1 if verify(hospitals, index) else 0)
+
+
+if __name__ == "__main__":
+    main()
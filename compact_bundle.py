@@ -0,0 +1,179 @@
+"""
+Compact, column-wise encoding of hospitals.json for the client.
+
+city / district / services are integer-coded against shared dictionaries,
+URLs are split into scheme and host tables plus a path column, addresses
+into a coded city/district prefix plus the remainder, and every
+field is stored as one array (column) instead of one object per hospital.
+Usage:
+  python compact_bundle.py      # rebuild src/data/hospitals.compact.json from hospitals.json
+
+Format (version 1):
+  {
+    "v": 1, "n": <count>, "fields": [<key order of a decoded record>],
+    "dict": {"city": [...], "district": [...], "services": [...],
+             "address": ["", "臺北市松山區", ...],
+             "scheme": ["", "http://", "https://"], "host": ["", ...]},
+    "cols": {
+      "id": [...], "name": [...], "phone": [...],                     # plain strings
+      "city": [int], "district": [int], "services": [[int, ...]],     # dictionary codes
+      "address": [[prefix, rest]],
+      "website": [[scheme, host, path] | null], ...                   # null = key absent
+      <other key>: [value | null]                                     # copied as-is
+    }
+  }
+Decoding is `record[key] = dict[key][col[i]]` for coded columns,
+`dict.address[p] + rest` for addresses and `scheme[s] + host[h] + path`
+for URL columns; see decode() below.
+"""
+import gzip
+import json
+import sys
+from pathlib import Path
+
+from location_resolver import location_prefix
+
+HOSPITALS_JSON = Path("src/data/hospitals.json")
+COMPACT_JSON = Path("src/data/hospitals.compact.json")
+
+FORMAT_VERSION = 1
+CODED_FIELDS = ("city", "district")
+LIST_CODED_FIELDS = ("services",)
+PREFIX_FIELDS = ("address",)
+URL_FIELDS = ("website", "appointmentUrl")
+SCHEMES = ["", "http://", "https://"]
+
+
+# ─── Encode ──────────────────────────────────────────────────────────────────
+class _Table:
+    """Value → index dictionary that remembers first-seen order."""
+
+    def __init__(self, initial: list[str] | None = None):
+        self.values: list[str] = []
+        self.index: dict[str, int] = {}
+        for v in initial or []:
+            self.code(v)
+
+    def code(self, value: str) -> int:
+        if value not in self.index:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+        return self.index[value]
+
+
+def split_url(url: str) -> tuple[str, str, str]:
+    for scheme in SCHEMES[1:]:
+        if url.startswith(scheme):
+            rest = url[len(scheme):]
+            host, slash, path = rest.partition("/")
+            return scheme, host, slash + path
+    return "", "", url
+
+
+def encode(hospitals: list[dict]) -> dict:
+    fields: list[str] = []
+    for h in hospitals:
+        for key in h:
+            if key not in fields:
+                fields.append(key)
+
+    tables = {key: _Table() for key in CODED_FIELDS + LIST_CODED_FIELDS}
+    tables.update({key: _Table([""]) for key in PREFIX_FIELDS})
+    schemes = _Table(SCHEMES)
+    hosts = _Table([""])
+    cols: dict[str, list] = {}
+    for key in fields:
+        column = []
+        for h in hospitals:
+            if key not in h:
+                column.append(None)
+            elif key in CODED_FIELDS:
+                column.append(tables[key].code(h[key]))
+            elif key in LIST_CODED_FIELDS:
+                column.append([tables[key].code(v) for v in h[key]])
+            elif key in PREFIX_FIELDS:
+                prefix = location_prefix(h[key])
+                column.append([tables[key].code(prefix), h[key][len(prefix):]])
+            elif key in URL_FIELDS:
+                scheme, host, path = split_url(h[key])
+                column.append([schemes.code(scheme), hosts.code(host), path])
+            else:
+                column.append(h[key])
+        cols[key] = column
+
+    return {
+        "v": FORMAT_VERSION,
+        "n": len(hospitals),
+        "fields": fields,
+        "dict": {
+            **{key: t.values for key, t in tables.items()},
+            "scheme": schemes.values,
+            "host": hosts.values,
+        },
+        "cols": cols,
+    }
+
+
+# ─── Decode (reference implementation) ───────────────────────────────────────
+def decode(bundle: dict) -> list[dict]:
+    if bundle["v"] != FORMAT_VERSION:
+        raise ValueError(f"unsupported compact bundle version {bundle['v']}")
+    d = bundle["dict"]
+    cols = bundle["cols"]
+    hospitals = []
+    for i in range(bundle["n"]):
+        h = {}
+        for key in bundle["fields"]:
+            value = cols[key][i]
+            if value is None:
+                continue
+            if key in CODED_FIELDS:
+                value = d[key][value]
+            elif key in LIST_CODED_FIELDS:
+                value = [d[key][c] for c in value]
+            elif key in PREFIX_FIELDS:
+                prefix, rest = value
+                value = d[key][prefix] + rest
+            elif key in URL_FIELDS:
+                scheme, host, path = value
+                value = d["scheme"][scheme] + d["host"][host] + path
+            h[key] = value
+        hospitals.append(h)
+    return hospitals
+
+
+# ─── Write + size report ─────────────────────────────────────────────────────
+def dumps_compact(bundle: dict) -> bytes:
+    return json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def size_report(hospitals: list[dict], compact: bytes) -> list[tuple[str, int, int]]:
+    """(encoding, raw bytes, gzip bytes) for each representation."""
+    encodings = {
+        "hospitals.json (indent=2)": json.dumps(hospitals, ensure_ascii=False, indent=2).encode("utf-8"),
+        "hospitals.json (minified)": json.dumps(hospitals, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        "compact bundle": compact,
+    }
+    return [(name, len(blob), len(gzip.compress(blob, mtime=0))) for name, blob in encodings.items()]
+
+
+def write_compact(hospitals: list[dict], path: Path = COMPACT_JSON) -> None:
+    bundle = encode(hospitals)
+    if decode(bundle) != hospitals:
+        raise ValueError("compact bundle does not round-trip")
+    blob = dumps_compact(bundle)
+    path.write_bytes(blob)
+    print(f"Wrote {path}")
+    for name, raw, gz in size_report(hospitals, blob):
+        print(f"  {name:<28}{raw:>10,} B  gzip {gz:>9,} B")
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    with open(HOSPITALS_JSON, encoding="utf-8") as f:
+        hospitals = json.load(f)
+    write_compact(hospitals)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,41 @@
 """
-Convert ODS hospital data to hospitals.json format.
-Usage: python convert_hospitals.py
+Convert the MOHW registry (ODS, XLSX or CSV release) to hospitals.json format.
+Usage:
+  python convert_hospitals.py                 # full rebuild from the fastest available format
+  python convert_hospitals.py --incremental   # rebuild only rows changed since the last run
+  python convert_hospitals.py --input PATH    # use another snapshot (.ods / .xlsx / .csv)
+  python convert_hospitals.py --workers 8     # convert rows on a process pool
+  python convert_hospitals.py --profile       # per-stage timings → convert_profile.json
 """
-import zipfile
-import xml.etree.ElementTree as ET
+import argparse
+import hashlib
+import itertools
 import sys
 import json
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from build_search_index import INDEX_JSON, write_index
+from compact_bundle import COMPACT_JSON, write_compact
+from dataset_writer import write_dataset
+from department_index import extract_services, load_department_rows, parse_departments, write_departments
+from geocode_hospitals import GAZETTEER_CSV, GEO_FIELDS, SPATIAL_JSON, Gazetteer, apply_geocodes, write_spatial_index
+from location_resolver import resolve_location
+from name_index import NameIndex
+from pipeline_profile import PROFILE, add_profile_arguments
+from registry_readers import find_source, read_records
 
 sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
-ODS_PATH = "醫療機構與人員基本資料_20241231.ods"
+SOURCE_STEM = "醫療機構與人員基本資料_20241231"   # .csv / .ods / .xlsx, fastest present wins
 EXISTING_JSON = "src/data/hospitals.json"
 OUTPUT_JSON = "src/data/hospitals.json"
-
-NS = {
-    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
-    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
-    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
-}
-
-# ─── City name normalization (ODS uses 臺, types use 台) ─────────────────────
-CITY_NORMALIZE = {
-    "臺北市": "台北市",
-    "臺中市": "台中市",
-    "臺南市": "台南市",
-    "臺東縣": "台東縣",
-}
-
-ALL_CITIES = {
-    "台北市", "新北市", "桃園市", "台中市", "台南市", "高雄市",
-    "基隆市", "新竹市", "新竹縣", "嘉義市", "嘉義縣",
-    "苗栗縣", "彰化縣", "南投縣", "雲林縣", "屏東縣",
-    "宜蘭縣", "花蓮縣", "台東縣", "澎湖縣", "金門縣", "連江縣",
-}
-
-# ─── Service tags derived from 科別 ─────────────────────────────────────────
-SERVICE_MAP = [
-    (["急診科"],                                    "急診"),
-    (["精神科", "精神醫學科", "兒童青少年精神科"], "精神科"),
-    (["中醫一般科", "中醫科", "針灸科", "傷科"],  "中醫"),
-    (["復健科", "物理治療科"],                     "復健"),
-    (["腫瘤科", "放射腫瘤科", "血液腫瘤科"],       "癌症中心"),
-    (["安寧緩和醫療科", "安寧療護"],               "安寧療護"),
-    (["腎臟科"],                                    "透析"),
-    (["牙科", "牙科一般科", "口腔外科"],           "牙科"),
-    (["中醫傷科", "骨科"],                         "骨科"),
-]
+STATE_JSON = "convert_state.json"          # 機構代碼 → row hash from the previous run
+CHANGELOG_JSON = "convert_changelog.json"  # delta written by --incremental
+CHUNK_SIZE = 500                           # records per --workers task
 
 # ─── Phone formatter ─────────────────────────────────────────────────────────
 THREE_DIGIT_AREA = {"037", "038", "039", "049", "055", "056",
@@ -72,61 +61,8 @@ def format_phone(raw: str) -> str:
         return f"{digits[:4]}-{digits[4:]}"
     return raw.strip()
 
-# ─── Service extractor ───────────────────────────────────────────────────────
-def extract_services(dept_str: str, dept_count: int) -> list[str]:
-    services: list[str] = []
-    depts = {d.strip() for d in dept_str.split(",") if d.strip()}
-
-    # 急診 first if present
-    if "急診科" in depts:
-        services.append("急診")
-
-    # 門診 always (all hospitals)
-    services.append("門診")
-
-    # 住院 if enough departments (indicates inpatient capability)
-    if dept_count >= 6:
-        services.append("住院")
-
-    # Specialty services
-    for keywords, label in SERVICE_MAP:
-        if label in ("急診",):
-            continue  # Already handled
-        if any(kw in depts for kw in keywords):
-            if label not in services:
-                services.append(label)
-        if len(services) >= 4:
-            break
-
-    return services[:4]
-
-# ─── Parse ODS ───────────────────────────────────────────────────────────────
-def parse_ods(path: str) -> list[dict]:
-    with zipfile.ZipFile(path, 'r') as z:
-        with z.open('content.xml') as f:
-            content = f.read().decode('utf-8')
-
-    root = ET.fromstring(content)
-    body = root.find('.//office:spreadsheet', NS)
-    table = body.findall('table:table', NS)[0]
-    rows = table.findall('table:table-row', NS)
-
-    def cell_val(cell):
-        texts = cell.findall('.//text:p', NS)
-        return ' '.join(t.text or '' for t in texts).strip()
-
-    header = [cell_val(c) for c in rows[0].findall('table:table-cell', NS)]
-
-    records = []
-    for row in rows[1:]:
-        vals = [cell_val(c) for c in row.findall('table:table-cell', NS)]
-        if len(vals) >= 5:
-            records.append(dict(zip(header, vals)))
-
-    return records
-
 # ─── Build hospital entry ─────────────────────────────────────────────────────
-def build_entry(rec: dict, existing_map: dict) -> dict | None:
+def build_entry(rec: dict, name_index: NameIndex) -> dict | None:
     name = rec.get("機構名稱", "").strip()
     if not name or "醫院" not in name:
         return None
@@ -137,40 +73,15 @@ def build_entry(rec: dict, existing_map: dict) -> dict | None:
     phone_raw = rec.get("電話", "").strip()
     dept_str = rec.get("科別", "").strip()
 
-    # Parse city and district from 縣市區名 (e.g. "臺北市松山區")
-    city_raw = ""
-    district = ""
-    for length in (3, 4):
-        candidate = raw_loc[:length]
-        normalized = CITY_NORMALIZE.get(candidate, candidate)
-        if normalized in ALL_CITIES:
-            city_raw = normalized
-            district = raw_loc[length:]
-            break
-
-    if not city_raw:
-        # Fallback: try to extract from address
-        for city in ALL_CITIES:
-            tc_city = {v: k for k, v in CITY_NORMALIZE.items()}.get(city, city)
-            if address.startswith(city) or address.startswith(tc_city):
-                city_raw = city
-                break
-        if not city_raw:
-            return None  # Skip unknown cities
-
-    # Department count for service inference
-    dept_count = len([d for d in dept_str.split(",") if d.strip()])
-
-    # Look up existing entry for website URL
-    existing = existing_map.get(name)
-    if not existing:
-        # Try partial match
-        for ex_name, ex_data in existing_map.items():
-            if ex_name in name or name in ex_name:
-                existing = ex_data
-                break
-
-    website = (existing or {}).get("website", "")
+    # Parse city and district from 縣市區名 (e.g. "臺北市松山區"), else the address
+    location = resolve_location(raw_loc, address)
+    if not location:
+        return None  # Skip unknown cities
+    city_raw, district = location
+
+    # Look up existing entry for website URL (exact name, else fuzzy match in the same city)
+    match = name_index.best_match(name, city=city_raw)
+    website = match[0].get("website", "") if match else ""
 
     return {
         "id": code,
@@ -180,38 +91,157 @@ def build_entry(rec: dict, existing_map: dict) -> dict | None:
         "address": address,
         "phone": format_phone(phone_raw),
         "website": website,
-        "services": extract_services(dept_str, dept_count),
+        "services": extract_services(parse_departments(dept_str)),
     }
 
+# ─── Incremental state ────────────────────────────────────────────────────────
+def row_hash(rec: dict) -> str:
+    """Content hash of one registry row, independent of column order and file format."""
+    blob = json.dumps(rec, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def load_state() -> dict:
+    try:
+        with open(STATE_JSON, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"rows": {}}
+
+
+def save_state(source: str, row_hashes: dict) -> None:
+    with open(STATE_JSON, 'w', encoding='utf-8') as f:
+        json.dump({"source": source, "rows": row_hashes}, f, ensure_ascii=False, indent=2)
+
+
+# ─── Row conversion (serial or process pool) ─────────────────────────────────
+class RowConverter:
+    """Per-process conversion context: the name index plus incremental state."""
+
+    def __init__(self, existing_list: list[dict], prev_hashes: dict, incremental: bool):
+        self.name_index = NameIndex(existing_list)
+        self.existing_by_id = {h["id"]: h for h in existing_list}
+        self.prev_hashes = prev_hashes
+        self.incremental = incremental
+
+    def convert(self, rec: dict) -> tuple[str, str, str, dict | None, tuple | None]:
+        """(code, row hash, status, entry, facility); status is reused/built/skipped_city/ignored.
+
+        facility is the departments.json row (city, in hospitals.json, 科別 set) for every
+        record with a 機構代碼, hospital or not; None for reused rows and records without a code.
+        """
+        code = rec.get("機構代碼", "").strip()
+        digest = row_hash(rec)
+        if self.incremental and self.prev_hashes.get(code) == digest and code in self.existing_by_id:
+            return code, digest, "reused", None, None
+        depts = parse_departments(rec.get("科別", ""))
+        entry = build_entry(rec, self.name_index)
+        if entry:
+            # Coordinates come from geocode_hospitals.py; keep them while the address is unchanged
+            old = self.existing_by_id.get(code)
+            if old and "lat" in old and old.get("address") == entry["address"]:
+                entry.update({key: old[key] for key in GEO_FIELDS if key in old})
+            return code, digest, "built", entry, (entry["city"], True, depts)
+        location = resolve_location(rec.get("縣市區名", ""), rec.get("地址", ""))
+        facility = (location[0] if location else "", False, depts) if code else None
+        if rec.get("機構名稱") and "醫院" in rec.get("機構名稱", ""):
+            return code, digest, "skipped_city", None, facility
+        return code, digest, "ignored", None, facility
+
+
+_worker: RowConverter | None = None
+
+
+def _init_worker(existing_list: list[dict], prev_hashes: dict, incremental: bool) -> None:
+    global _worker
+    _worker = RowConverter(existing_list, prev_hashes, incremental)
+
+
+def _convert_chunk(chunk: list[dict]) -> list[tuple]:
+    return [_worker.convert(rec) for rec in chunk]
+
+
+def convert_records(records: Iterator[dict], converter_args: tuple, workers: int) -> Iterator[tuple]:
+    """Yield RowConverter.convert results in input order.
+
+    With workers > 1, records are sent to a process pool in chunks of
+    CHUNK_SIZE; at most 2×workers chunks are in flight so the stream from
+    the record stream is never fully materialised.
+    """
+    if workers <= 1:
+        converter = RowConverter(*converter_args)
+        for rec in records:
+            yield converter.convert(rec)
+        return
+
+    chunks = iter(lambda: list(itertools.islice(records, CHUNK_SIZE)), [])
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=converter_args) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_convert_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
 # ─── Main ─────────────────────────────────────────────────────────────────────
 def main():
+    parser = argparse.ArgumentParser(description="Convert the MOHW registry release to hospitals.json")
+    parser.add_argument("--input", "--ods", dest="input", default=None,
+                        help=f"snapshot to convert (default: {SOURCE_STEM}.csv/.ods/.xlsx, fastest present)")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"reuse entries whose row hash matches {STATE_JSON}")
+    parser.add_argument("--changelog", default=CHANGELOG_JSON,
+                        help="where --incremental writes the added/changed/removed ids")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="convert rows on N processes (output is identical to the serial run)")
+    add_profile_arguments(parser, "convert_profile.json")
+    args = parser.parse_args()
+    PROFILE.configure(args)
+
     print("Reading existing hospitals.json …")
-    with open(EXISTING_JSON, encoding='utf-8') as f:
+    with PROFILE.stage("json.read"), open(EXISTING_JSON, encoding='utf-8') as f:
         existing_list = json.load(f)
-    existing_map = {h["name"]: h for h in existing_list}
-    # Also index by partial/normalized name
-    existing_map_norm = {}
-    for h in existing_list:
-        n = h["name"]
-        # Remove common legal entity prefixes for fuzzy match
-        short = re.sub(r'^(衛生福利部|臺北市立|新北市立|桃園市立|臺中市立|臺南市立|高雄市立|基隆市立)', '', n)
-        existing_map_norm[short] = h
+    existing_by_id = {h["id"]: h for h in existing_list}
+    prev_hashes = load_state()["rows"] if args.incremental else {}
+    prev_departments = load_department_rows() if args.incremental else {}
+    department_rows = []
+    row_hashes = {}
+    changes = {"added": [], "changed": [], "removed": [], "unchanged": 0}
 
     print(f"  Loaded {len(existing_list)} existing entries.")
 
-    print("Parsing ODS …")
-    records = parse_ods(ODS_PATH)
-    print(f"  {len(records)} total records.")
-
+    source = str(find_source(SOURCE_STEM) if args.input is None else args.input)
+    fmt = source.rsplit(".", 1)[-1].lower()
+    print(f"Parsing {source} …")
     hospitals = []
     skipped_city = 0
-    for rec in records:
-        entry = build_entry(rec, existing_map)
-        if entry:
+    total_records = 0
+    # Rows can only be reused when their 科別 set survives in departments.json
+    reusable = {k: v for k, v in prev_hashes.items() if k in prev_departments}
+    converter_args = (existing_list, reusable, args.incremental)
+    records = PROFILE.iterate(f"{fmt}.parse", read_records(source))
+    converted = PROFILE.iterate("entry.build", convert_records(records, converter_args, args.workers))
+    for code, digest, status, entry, facility in converted:
+        total_records += 1
+        if status == "reused":
+            facility = prev_departments[code]
+        if facility:
+            department_rows.append((code, *facility))
+        if status == "reused":
+            hospitals.append(existing_by_id[code])
+            row_hashes[code] = digest
+            changes["unchanged"] += 1
+        elif status == "built":
             hospitals.append(entry)
-        elif rec.get("機構名稱") and "醫院" in rec.get("機構名稱", ""):
+            row_hashes[code] = digest
+            changes["changed" if code in prev_hashes else "added"].append(code)
+        elif status == "skipped_city":
             skipped_city += 1
+    changes["removed"] = sorted(set(prev_hashes) - set(row_hashes))
 
+    print(f"  {total_records} total records.")
     print(f"  Built {len(hospitals)} hospital entries.")
     print(f"  Skipped {skipped_city} due to unknown city.")
 
@@ -226,9 +256,40 @@ def main():
     for city, count in sorted(city_dist.items()):
         print(f"  {city}: {count}")
 
+    # New or moved hospitals have no coordinates yet: geocode them when the gazetteer is at hand
+    ungeocoded = [h for h in hospitals if "lat" not in h]
+    if ungeocoded and GAZETTEER_CSV.exists():
+        with PROFILE.stage("geocode", items=len(ungeocoded)):
+            apply_geocodes(ungeocoded, Gazetteer(GAZETTEER_CSV))
+        ungeocoded = [h for h in ungeocoded if "lat" not in h]
+
     print(f"\nWriting {OUTPUT_JSON} …")
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump(hospitals, f, ensure_ascii=False, indent=2)
+    with PROFILE.stage("json.write", items=len(hospitals)):
+        changed = write_dataset(hospitals, Path(OUTPUT_JSON))
+        save_state(source, row_hashes)
+    # Both are derived from hospitals.json alone, so an unchanged dataset needs neither
+    if changed or not COMPACT_JSON.exists():
+        with PROFILE.stage("compact.write", items=len(hospitals)):
+            write_compact(hospitals)
+    if changed or not INDEX_JSON.exists():
+        with PROFILE.stage("search_index.write", items=len(hospitals)):
+            write_index(hospitals)
+    with PROFILE.stage("departments.write", items=len(department_rows)):
+        write_departments(department_rows)
+    if SPATIAL_JSON.exists() or len(ungeocoded) < len(hospitals):
+        if changed or not SPATIAL_JSON.exists():
+            with PROFILE.stage("spatial_index.write", items=len(hospitals)):
+                write_spatial_index(hospitals)
+        if ungeocoded:
+            print(f"  {len(ungeocoded)} entries have no coordinates; "
+                  f"run `python geocode_hospitals.py --gazetteer {GAZETTEER_CSV}`")
+
+    if args.incremental:
+        changelog = {"source": source, **changes}
+        with open(args.changelog, 'w', encoding='utf-8') as f:
+            json.dump(changelog, f, ensure_ascii=False, indent=2)
+        print(f"\nChangelog ({args.changelog}):")
+        print(json.dumps(changelog, ensure_ascii=False))
     print("Done!")
 
 if __name__ == "__main__":
@@ -0,0 +1,473 @@
+"""
+Async HTTP client used by find_hospital_urls.py.
+
+Requests go through one asyncio front end with a global concurrency limit
+and, per host, a slot count plus a token bucket, so hospitals.tw sees one
+request at a time while hundreds of distinct hospital homepages are
+fetched in parallel. The blocking work is done by `requests` on a thread
+pool (one Session per thread); each call is timed as the `http.<phase>`
+profile stage on its worker thread.
+
+Each bucket adapts to how its host behaves:
+  healthy responses      → the rate grows additively toward the policy's max_rate
+  429 / 503, timeouts    → the rate halves (down to min_rate); Retry-After
+                           blocks the host for that long, and the request is retried
+  robots.txt Crawl-delay → caps max_rate at 1 / delay (robots.txt is fetched once
+                           per host, through the response cache when one is attached,
+                           and takes a slot and a token like any other request)
+
+Within one run, successful responses are memoised in memory by a
+normalised request key (lower-cased scheme and host, no default port or
+fragment, sorted and whitespace-normalised params), and concurrent GETs
+for the same key share one in-flight request, so hospitals that share a
+short name or a homepage cost one fetch between them.
+
+With a `budget`, at most that many network requests are started; the
+request that would exceed it raises BudgetExhausted instead, however many
+coroutines are in flight. Refusals are also counted on the BudgetScope
+active in the calling task (and the tasks it spawns), so a caller can tell
+whether its own unit of work lost a request:
+    with BudgetScope() as scope:
+        ...
+    if scope.refused: ...
+
+With an HttpCache attached, fresh responses are served from disk without
+waiting for a host slot, stale ones are revalidated with a conditional
+GET, and `offline=True` serves whatever is stored (misses raise
+OfflineMiss) so extraction can be rerun without any network access.
+Usage:
+    client = CrawlClient(concurrency=16, policies={"hospitals.tw": HostPolicy(1, rate=0.4, max_rate=1.0)})
+    resp = await client.get("https://hospitals.tw/", params={"s": "臺安醫院"}, phase="search")
+    resp.text, resp.url, resp.status
+    client.close()
+"""
+import asyncio
+import contextvars
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode, urlparse, urlunparse
+
+import requests
+
+from crawl_telemetry import TELEMETRY, Telemetry
+from http_cache import CacheEntry, HttpCache, key_for
+from pipeline_profile import PROFILE
+
+REQUEST_TIMEOUT = 15
+DEFAULT_CONCURRENCY = 16
+DEFAULT_HOST_CONCURRENCY = 2
+DEFAULT_HOST_RATE = 2.0           # requests per second a host starts at
+DEFAULT_HOST_MAX_RATE = 8.0
+RATE_STEP = 0.1                   # additive increase per healthy response, as a fraction of the start rate
+BACKOFF_FACTOR = 0.5              # multiplicative decrease on 429 / 503 / errors
+THROTTLE_STATUS = {429, 503}
+THROTTLE_RETRIES = 2
+MAX_RETRY_AFTER = 300.0           # seconds; longer Retry-After values are clamped
+MEMO_MAX_BYTES = 64 << 20         # in-memory response memo, least recently used dropped first
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+}
+
+
+@dataclass
+class HostPolicy:
+    concurrency: int = DEFAULT_HOST_CONCURRENCY
+    rate: float = DEFAULT_HOST_RATE           # requests per second to start at
+    max_rate: float = DEFAULT_HOST_MAX_RATE   # ceiling reached while the host stays healthy
+    burst: int = 1                            # tokens that can accumulate while idle
+    min_rate: float | None = None             # floor after backoffs (default: rate / 8)
+
+    def scaled(self, factor: float) -> "HostPolicy":
+        """The same policy with every rate multiplied by `factor` (e.g. 1 / worker processes)."""
+        return HostPolicy(self.concurrency, self.rate * factor, self.max_rate * factor, self.burst,
+                          self.min_rate * factor if self.min_rate else None)
+
+
+@dataclass
+class Response:
+    url: str                   # final URL after redirects
+    status: int
+    headers: dict[str, str]
+    content: bytes
+    encoding: str | None = None
+    history: list[str] = field(default_factory=list)   # redirect chain before `url`
+    source: str = "network"    # network / cache / revalidated
+
+    @property
+    def text(self) -> str:
+        return str(self.content, self.encoding or "utf-8", errors="replace")
+
+
+class OfflineMiss(Exception):
+    """Raised in offline mode for a URL that is not in the response cache."""
+
+
+class BudgetExhausted(Exception):
+    """The client's request budget is spent; the request was not sent."""
+
+
+_budget_scope: contextvars.ContextVar["BudgetScope | None"] = contextvars.ContextVar("budget_scope", default=None)
+
+
+class BudgetScope:
+    """Counts the budget refusals of the current task and the tasks it starts."""
+
+    def __init__(self):
+        self.refused = 0
+
+    def __enter__(self) -> "BudgetScope":
+        self._token = _budget_scope.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _budget_scope.reset(self._token)
+
+
+def host_of(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _norm_text(value) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", str(value))).strip()
+
+
+def memo_key(url: str, params: dict | None = None) -> str:
+    """Normalised request key: equivalent spellings of one URL and query map to the same key."""
+    p = urlparse(url)
+    host = (p.hostname or "").lower()
+    if p.port and (p.scheme, p.port) not in {("http", 80), ("https", 443)}:
+        host = f"{host}:{p.port}"
+    query = urlencode(sorted((k, _norm_text(v)) for k, v in (params or {}).items()))
+    base = urlunparse((p.scheme.lower(), host, p.path or "/", p.params, p.query, ""))
+    return f"{base} {query}"
+
+
+def retry_after(headers: dict[str, str]) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), clamped to MAX_RETRY_AFTER."""
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def crawl_delay(robots_txt: str, user_agent: str = HEADERS["User-Agent"]) -> float | None:
+    """Crawl-delay for `user_agent` (else for `*`) from a robots.txt body.
+
+    urllib.robotparser only accepts whole seconds, so fractional delays are parsed here.
+    """
+    ua = user_agent.lower()
+    delays: dict[str, float] = {}
+    agents: list[str] = []
+    in_rules = False
+    for line in robots_txt.splitlines():
+        key, _, value = line.split("#", 1)[0].partition(":")
+        key, value = key.strip().lower(), value.strip()
+        if key == "user-agent":
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value.lower())
+        elif key:
+            in_rules = True
+            if key == "crawl-delay":
+                try:
+                    for agent in agents:
+                        delays.setdefault(agent, float(value))
+                except ValueError:
+                    pass
+    for agent, delay in delays.items():
+        if agent != "*" and agent in ua:
+            return delay
+    return delays.get("*")
+
+
+class _Host:
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.slots = asyncio.Semaphore(policy.concurrency)
+        self.lock = asyncio.Lock()
+        self.rate = policy.rate
+        self.ceiling = max(policy.rate, policy.max_rate)
+        self.floor = policy.min_rate or policy.rate / 8
+        self.tokens = float(policy.burst)
+        self.updated: float | None = None
+        self.blocked_until = 0.0
+        self.robots: asyncio.Future | None = None   # resolves once robots.txt has been applied
+
+    def _refill(self, now: float) -> None:
+        if self.updated is not None:
+            self.tokens = min(float(self.policy.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def wait_turn(self) -> None:
+        """Take one token, sleeping until one is available and any Retry-After block has passed."""
+        loop = asyncio.get_running_loop()
+        async with self.lock:       # waiters are served in arrival order
+            while True:
+                now = loop.time()
+                self._refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+
+    def cap(self, crawl_delay: float) -> None:
+        """Apply a robots.txt Crawl-delay: never more than one request per `crawl_delay` seconds."""
+        if crawl_delay > 0:
+            self.ceiling = min(self.ceiling, 1 / crawl_delay)
+            self.floor = min(self.floor, self.ceiling)
+            self.rate = min(self.rate, self.ceiling)
+
+    def feedback(self, status: int | None, wait: float | None = None) -> None:
+        """Adapt the rate to a response (status None for a timeout or connection error)."""
+        if status is None or status in THROTTLE_STATUS:
+            self.rate = max(self.floor, self.rate * BACKOFF_FACTOR)
+            self.tokens = min(self.tokens, 0.0)
+            if wait:
+                self.blocked_until = max(self.blocked_until, asyncio.get_running_loop().time() + wait)
+        elif status < 500:
+            self.rate = min(self.ceiling, self.rate + self.policy.rate * RATE_STEP)
+
+
+class CrawlClient:
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY,
+                 host_concurrency: int = DEFAULT_HOST_CONCURRENCY,
+                 policies: dict[str, HostPolicy] | None = None,
+                 timeout: float = REQUEST_TIMEOUT,
+                 cache: HttpCache | None = None, offline: bool = False, robots: bool = True,
+                 memo: bool = True, telemetry: Telemetry | None = TELEMETRY, budget: int | None = None):
+        if offline and cache is None:
+            raise ValueError("offline mode needs a response cache")
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.robots = robots
+        self.requests = 0          # network requests started (cache hits excluded)
+        self.budget = budget
+        self.refused = 0           # requests not sent because the budget was spent
+        self.default_policy = HostPolicy(concurrency=host_concurrency)
+        self.policies = dict(policies or {})   # host (no "www.") → HostPolicy
+        self._global = asyncio.Semaphore(concurrency)
+        self._hosts: dict[str, _Host] = {}
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="http")
+        self._local = threading.local()
+        self.telemetry = telemetry
+        self.memo = memo
+        self._memo: OrderedDict[str, Response] = OrderedDict()
+        self._memo_bytes = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.memo_hits = self.coalesced = 0
+
+    def _host(self, url: str) -> _Host:
+        name = host_of(url)
+        if name not in self._hosts:
+            self._hosts[name] = _Host(self.policies.get(name, self.default_policy))
+        return self._hosts[name]
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(HEADERS)
+        return session
+
+    def _from_cache(self, entry: CacheEntry, source: str) -> Response:
+        return Response(
+            url=entry.final_url,
+            status=entry.status,
+            headers=entry.headers,
+            content=self.cache.read_body(entry),
+            encoding=entry.encoding,
+            history=entry.history,
+            source=source,
+        )
+
+    def _timed(self, url: str, phase: str, fn):
+        """Run fn() as the `http.<phase>` profile stage and report it to the telemetry."""
+        start = time.perf_counter()
+        try:
+            with PROFILE.stage(f"http.{phase}"):
+                result = fn()
+        except Exception as e:
+            if self.telemetry:
+                self.telemetry.request(host_of(url), phase, time.perf_counter() - start,
+                                       error=type(e).__name__, timeout=isinstance(e, requests.Timeout))
+            raise
+        if self.telemetry:
+            if isinstance(result, requests.Response):
+                status, size, error = result.status_code, len(result.content), None
+            else:                      # call(): whatever fn reports about itself
+                status, size, error = getattr(result, "status", None), 0, getattr(result, "error", None)
+            self.telemetry.request(host_of(url), phase, time.perf_counter() - start, status=status, size=size,
+                                   error=error, timeout=bool(error and "Timeout" in error))
+        return result
+
+    def _fetch(self, url: str, params: dict | None, phase: str, key: str, stale: CacheEntry | None) -> Response:
+        headers = stale.validators() if stale else {}
+        resp = self._timed(url, phase, lambda: self._session().get(
+            url, params=params, headers=headers, timeout=self.timeout, allow_redirects=True))
+        if resp.status_code == 304 and stale:
+            self.cache.touch(stale)
+            return self._from_cache(stale, "revalidated")
+        response = Response(
+            url=resp.url,
+            status=resp.status_code,
+            headers=dict(resp.headers),
+            content=resp.content,
+            encoding=resp.encoding or resp.apparent_encoding,
+            history=[r.url for r in resp.history],
+        )
+        if self.cache and 200 <= resp.status_code < 300:
+            self.cache.put(key, url, response.url, response.status, response.headers,
+                           response.history, response.encoding, response.content)
+        return response
+
+    async def _apply_robots(self, url: str, host: _Host) -> None:
+        """Cap the host's rate by its robots.txt Crawl-delay; fetched once, concurrent callers wait."""
+        if host.robots is not None:
+            await asyncio.shield(host.robots)
+            return
+        host.robots = asyncio.get_running_loop().create_future()
+        try:
+            p = urlparse(url)
+            resp = await self._get(f"{p.scheme}://{p.netloc}/robots.txt", None, "robots", robots=False)
+            if resp.status == 200:
+                host.cap(crawl_delay(resp.text) or 0.0)
+        except Exception:
+            pass                       # no usable robots.txt: keep the policy as configured
+        finally:
+            host.robots.set_result(None)
+
+    async def _scheduled(self, url: str, fn, *args, robots: bool = True):
+        """Run fn(*args) on the pool once `url`'s host slot, a token and a global slot are held.
+
+        robots=False skips applying the host's robots.txt first (the robots.txt fetch itself).
+        """
+        loop = asyncio.get_running_loop()
+        if self.budget is not None and self.requests >= self.budget:
+            self.refused += 1
+            scope = _budget_scope.get()
+            if scope is not None:
+                scope.refused += 1
+            raise BudgetExhausted(url)
+        self.requests += 1             # checked and reserved with no await in between
+        host = self._host(url)
+        if robots and self.robots and not self.offline:
+            await self._apply_robots(url, host)
+        async with host.slots:
+            await host.wait_turn()
+            async with self._global:
+                try:
+                    return await loop.run_in_executor(self._executor, fn, *args)
+                except requests.RequestException:
+                    host.feedback(None)
+                    raise
+
+    async def call(self, url: str, fn, *args, phase: str = "get"):
+        """Run fn(session, *args) under the same limits as get(), bypassing the response cache.
+
+        Only exceptions raised by fn feed the host's adaptive rate; statuses it handles itself do not.
+        """
+        return await self._scheduled(url, self._timed, url, phase, lambda: fn(self._session(), *args))
+
+    async def get(self, url: str, *, params: dict | None = None, phase: str = "get") -> Response:
+        """GET `url`; waits for a host slot first so one slow host cannot hold the global ones.
+
+        Repeats within the run are served from the memo, and a GET for a key that is already
+        in flight waits for that request instead of sending its own.
+        """
+        if not self.memo:
+            return await self._get(url, params, phase)
+        key = memo_key(url, params)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.memo_hits += 1
+            self._served(phase, "memo")
+            return self._memo[key]
+        if key in self._inflight:
+            self.coalesced += 1
+            self._served(phase, "coalesced")
+            return await asyncio.shield(self._inflight[key])
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            resp = await self._get(url, params, phase)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()         # retrieved here; waiters re-raise it themselves
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(resp)
+        if resp.status < 400:
+            self._remember(key, resp)
+        return resp
+
+    def _served(self, phase: str, source: str) -> None:
+        if self.telemetry:
+            self.telemetry.served(phase, source)
+
+    def _remember(self, key: str, resp: Response) -> None:
+        self._memo[key] = resp
+        self._memo_bytes += len(resp.content)
+        while self._memo_bytes > MEMO_MAX_BYTES and len(self._memo) > 1:
+            _, old = self._memo.popitem(last=False)
+            self._memo_bytes -= len(old.content)
+
+    async def _get(self, url: str, params: dict | None, phase: str, robots: bool = True) -> Response:
+        loop = asyncio.get_running_loop()
+        key = key_for("GET", url, params)
+        stale = None
+        if self.cache:
+            entry = await loop.run_in_executor(self._executor, self.cache.get, key)
+            if entry and (self.offline or self.cache.is_fresh(entry)):
+                self.cache.hits += 1
+                self._served(phase, "cache")
+                return await loop.run_in_executor(self._executor, self._from_cache, entry, "cache")
+            stale = entry
+            if self.offline:
+                self.cache.misses += 1
+                raise OfflineMiss(url)
+
+        for attempt in range(THROTTLE_RETRIES + 1):
+            resp = await self._scheduled(url, self._fetch, url, params, phase, key, stale, robots=robots)
+            self._host(url).feedback(resp.status, retry_after(resp.headers))
+            if resp.status not in THROTTLE_STATUS:
+                break
+        self._served(phase, resp.source)
+        if self.cache:
+            if resp.source == "revalidated":
+                self.cache.revalidated += 1
+            else:
+                self.cache.misses += 1
+        return resp
+
+    def rates(self) -> dict[str, float]:
+        """Current requests-per-second of every host seen so far."""
+        return {name: host.rate for name, host in self._hosts.items()}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self.cache:
+            self.cache.close()
@@ -0,0 +1,181 @@
+"""
+HTTP telemetry for the crawler: what every request cost and how it ended.
+
+CrawlClient reports each request here. Requests that reach the network
+record latency (a cumulative histogram), response bytes, status code,
+timeouts and exception types, per (host, phase). Requests served without
+the network are counted by source (cache, revalidated, memo, coalesced),
+which gives the cache hit ratios. At the end of a run the totals are
+written as JSON, and as a Prometheus textfile for node_exporter's
+textfile collector (written to a temporary file and renamed, as the
+collector requires). Only the PROM_MAX_HOSTS busiest hosts keep their own
+label there; the rest are summed under host="other".
+Usage (CrawlClient reports to the shared TELEMETRY unless given another):
+    from crawl_telemetry import TELEMETRY
+    ...
+    TELEMETRY.write_json(Path("crawl_telemetry.json"))
+    TELEMETRY.write_prometheus(Path("crawl_telemetry.prom"))
+"""
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)   # seconds
+PROM_MAX_HOSTS = 20
+
+
+def labels(**kv) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in kv.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(kv, escaped)) + "}"
+
+
+def _new_series() -> dict:
+    return {"count": 0, "sum": 0.0, "buckets": [0] * (len(BUCKETS) + 1), "bytes": 0,
+            "status": Counter(), "errors": Counter(), "timeouts": 0}
+
+
+def _merge_series(into: dict, other: dict) -> None:
+    into["count"] += other["count"]
+    into["sum"] += other["sum"]
+    into["buckets"] = [a + b for a, b in zip(into["buckets"], other["buckets"])]
+    into["bytes"] += other["bytes"]
+    into["status"].update(other["status"])
+    into["errors"].update(other["errors"])
+    into["timeouts"] += other["timeouts"]
+
+
+class Telemetry:
+    def __init__(self):
+        self._lock = threading.Lock()            # requests are recorded from the pool threads
+        self.reset()
+
+    def reset(self) -> None:
+        self.series: dict[tuple[str, str], dict] = {}
+        self.sources: Counter = Counter()        # (phase, source) → requests
+
+    # ─── Recording ───────────────────────────────────────────────────────────
+    def request(self, host: str, phase: str, seconds: float, status: int | None = None, size: int = 0,
+                error: str | None = None, timeout: bool = False) -> None:
+        """One request that went to the network; `error` is the exception type name when it failed."""
+        bucket = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+        with self._lock:
+            s = self.series.get((host, phase))
+            if s is None:
+                s = self.series[(host, phase)] = _new_series()
+            s["count"] += 1
+            s["sum"] += seconds
+            s["buckets"][bucket] += 1
+            s["bytes"] += size
+            if status is not None:
+                s["status"][str(status)] += 1
+            if error is not None:
+                s["errors"][error] += 1
+            s["timeouts"] += timeout
+
+    def served(self, phase: str, source: str) -> None:
+        """One GET answered by `source` (network / revalidated / cache / memo / coalesced)."""
+        with self._lock:
+            self.sources[(phase, source)] += 1
+
+    # ─── Summaries ───────────────────────────────────────────────────────────
+    def hit_ratios(self) -> dict[str, float]:
+        """Share of GETs per phase (and overall) that needed no full network fetch."""
+        totals: Counter = Counter()
+        saved: Counter = Counter()
+        for (phase, source), n in self.sources.items():
+            for key in (phase, "all"):
+                totals[key] += n
+                saved[key] += n if source != "network" else 0
+        return {key: round(saved[key] / totals[key], 4) for key in totals}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "buckets": list(BUCKETS),
+                "series": [
+                    {"host": host, "phase": phase, **{k: dict(v) if isinstance(v, Counter) else v
+                                                      for k, v in s.items()}}
+                    for (host, phase), s in sorted(self.series.items())
+                ],
+                "sources": [{"phase": phase, "source": source, "count": n}
+                            for (phase, source), n in sorted(self.sources.items())],
+                "hitRatio": self.hit_ratios(),
+            }
+
+    def merge(self, doc: dict) -> None:
+        """Add another process's to_dict() (the --workers processes report back this way)."""
+        with self._lock:
+            for row in doc["series"]:
+                key = (row["host"], row["phase"])
+                other = {k: Counter(row[k]) if k in ("status", "errors") else row[k] for k in _new_series()}
+                _merge_series(self.series.setdefault(key, _new_series()), other)
+            for row in doc["sources"]:
+                self.sources[(row["phase"], row["source"])] += row["count"]
+
+    # ─── Output ──────────────────────────────────────────────────────────────
+    def write_json(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def prometheus(self, max_hosts: int = PROM_MAX_HOSTS) -> str:
+        with self._lock:
+            per_host = Counter()
+            for (host, _), s in self.series.items():
+                per_host[host] += s["count"]
+            keep = {host for host, _ in per_host.most_common(max_hosts)}
+            series: dict[tuple[str, str], dict] = {}
+            for (host, phase), s in self.series.items():
+                key = (host if host in keep else "other", phase)
+                _merge_series(series.setdefault(key, _new_series()), s)
+            sources = dict(self.sources)
+
+        lines = [
+            "# HELP crawl_http_request_duration_seconds Latency of crawler HTTP requests that reached the network.",
+            "# TYPE crawl_http_request_duration_seconds histogram",
+        ]
+        for (host, phase), s in sorted(series.items()):
+            running = 0
+            for bound, n in zip([*map(str, BUCKETS), "+Inf"], s["buckets"]):
+                running += n
+                lines.append(f"crawl_http_request_duration_seconds_bucket{labels(host=host, phase=phase, le=bound)} {running}")
+            lines.append(f"crawl_http_request_duration_seconds_sum{labels(host=host, phase=phase)} {s['sum']:.6f}")
+            lines.append(f"crawl_http_request_duration_seconds_count{labels(host=host, phase=phase)} {s['count']}")
+        lines += ["# HELP crawl_http_response_bytes_total Response body bytes received.",
+                  "# TYPE crawl_http_response_bytes_total counter"]
+        lines += [f"crawl_http_response_bytes_total{labels(host=host, phase=phase)} {s['bytes']}"
+                  for (host, phase), s in sorted(series.items())]
+        lines += ["# HELP crawl_http_responses_total Responses by status code.",
+                  "# TYPE crawl_http_responses_total counter"]
+        lines += [f"crawl_http_responses_total{labels(host=host, phase=phase, code=code)} {n}"
+                  for (host, phase), s in sorted(series.items()) for code, n in sorted(s["status"].items())]
+        lines += ["# HELP crawl_http_errors_total Requests that raised, by exception type.",
+                  "# TYPE crawl_http_errors_total counter"]
+        lines += [f"crawl_http_errors_total{labels(host=host, phase=phase, type=name)} {n}"
+                  for (host, phase), s in sorted(series.items()) for name, n in sorted(s["errors"].items())]
+        lines += ["# HELP crawl_http_timeouts_total Requests that timed out.",
+                  "# TYPE crawl_http_timeouts_total counter"]
+        lines += [f"crawl_http_timeouts_total{labels(host=host, phase=phase)} {s['timeouts']}"
+                  for (host, phase), s in sorted(series.items())]
+        lines += ["# HELP crawl_http_served_total GETs by how they were answered (network, cache, memo, ...).",
+                  "# TYPE crawl_http_served_total counter"]
+        lines += [f"crawl_http_served_total{labels(phase=phase, source=source)} {n}"
+                  for (phase, source), n in sorted(sources.items())]
+        lines += ["# HELP crawl_http_hit_ratio Share of GETs answered without a full network fetch.",
+                  "# TYPE crawl_http_hit_ratio gauge"]
+        lines += [f"crawl_http_hit_ratio{labels(phase=phase)} {ratio}" for phase, ratio in sorted(self.hit_ratios().items())]
+        lines += ["# HELP crawl_last_run_timestamp_seconds When this file was written.",
+                  "# TYPE crawl_last_run_timestamp_seconds gauge",
+                  f"crawl_last_run_timestamp_seconds {datetime.now(timezone.utc).timestamp():.0f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+TELEMETRY = Telemetry()
@@ -0,0 +1,138 @@
+"""
+Canonical writer for src/data/hospitals.json, shared by every script that rewrites it.
+
+The dataset is serialised the same way every time: one hospital per line,
+keys in FIELD_ORDER (then any other keys alphabetically), no insignificant
+whitespace inside a record. Record order is left as given, since it is the
+order the site lists hospitals in. Next to the JSON the writer puts
+precompressed `.gz` and (when the brotli module is installed) `.br`
+variants, and a manifest with the SHA-256 of the canonical bytes and the
+record count. /api/hospitals uses the hash as its ETag, and callers skip
+rebuilding derived files when write_dataset() reports no change.
+Every file is written to a temporary name and renamed into place, the
+manifest last, so a reader never sees a truncated file and a manifest is
+only ever published for data that is already complete on disk.
+Usage:
+    from dataset_writer import write_dataset
+    if write_dataset(hospitals):        # False → byte-identical to the last run
+        write_compact(hospitals)
+  python dataset_writer.py              # canonicalise the current hospitals.json in place
+
+Manifest (version 1):
+  {"v": 1, "sha256": <hex>, "etag": <first 16 hex>, "count": <records>,
+   "files": {"hospitals.json": <bytes>, "hospitals.json.gz": <bytes>, ...}}
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:       # optional: .br is skipped without it
+    brotli = None
+
+HOSPITALS_JSON = Path("src/data/hospitals.json")
+MANIFEST_JSON = Path("src/data/hospitals.manifest.json")
+
+FORMAT_VERSION = 1
+FIELD_ORDER = ("id", "name", "city", "district", "address", "phone", "website",
+               "appointmentUrl", "logoUrl", "services", "lat", "lon", "geoPrecision")
+ETAG_CHARS = 16
+
+
+# ─── Canonical form ──────────────────────────────────────────────────────────
+def canonical_record(h: dict) -> dict:
+    known = [key for key in FIELD_ORDER if key in h]
+    return {key: h[key] for key in known + sorted(set(h) - set(known))}
+
+
+def dumps_canonical(hospitals: list[dict]) -> bytes:
+    lines = [json.dumps(canonical_record(h), ensure_ascii=False, separators=(",", ":")) for h in hospitals]
+    return ("[\n" + ",\n".join(lines) + "\n]\n").encode("utf-8")
+
+
+def variants(blob: bytes) -> dict[str, bytes]:
+    """Suffix → precompressed bytes. gzip has mtime 0 so the output is reproducible."""
+    out = {".gz": gzip.compress(blob, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out[".br"] = brotli.compress(blob, quality=11)
+    return out
+
+
+# ─── Manifest ────────────────────────────────────────────────────────────────
+def load_manifest(path: Path = MANIFEST_JSON) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# ─── Write ───────────────────────────────────────────────────────────────────
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace `path` with `data` in one rename; a crash leaves the old file intact."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_dataset(hospitals: list[dict], path: Path = HOSPITALS_JSON,
+                  manifest_path: Path = MANIFEST_JSON) -> bool:
+    """Write the canonical JSON, its compressed variants and the manifest.
+
+    Returns False (and touches nothing) when hospitals.json on disk is
+    already byte-identical and the manifest and its variants match it.
+    """
+    blob = dumps_canonical(hospitals)
+    digest = hashlib.sha256(blob).hexdigest()
+    suffixes = [".gz", ".br"] if brotli is not None else [".gz"]
+    names = [path.name] + [path.name + suffix for suffix in suffixes]
+
+    previous = load_manifest(manifest_path)
+    if (previous.get("sha256") == digest
+            and list(previous.get("files", {})) == names
+            and all((path.parent / name).exists() for name in names)
+            and path.read_bytes() == blob):
+        print(f"{path} unchanged ({digest[:ETAG_CHARS]}), {len(hospitals)} records")
+        return False
+
+    compressed = variants(blob)
+    files = {path.name: blob, **{path.name + suffix: data for suffix, data in compressed.items()}}
+    for name, data in files.items():
+        write_atomic(path.parent / name, data)
+    stale_br = path.with_name(path.name + ".br")
+    if ".br" not in compressed and stale_br.exists():
+        stale_br.unlink()   # would no longer match the JSON
+
+    manifest = {
+        "v": FORMAT_VERSION,
+        "sha256": digest,
+        "etag": digest[:ETAG_CHARS],
+        "count": len(hospitals),
+        "files": {name: len(data) for name, data in files.items()},
+    }
+    write_atomic(manifest_path, (json.dumps(manifest, ensure_ascii=False, indent=2) + "\n").encode("utf-8"))
+    sizes = "  ".join(f"{name} {size:,} B" for name, size in manifest["files"].items())
+    print(f"Wrote {path} ({len(hospitals)} records, {digest[:ETAG_CHARS]}): {sizes}")
+    return True
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    with open(HOSPITALS_JSON, encoding="utf-8") as f:
+        hospitals = json.load(f)
+    write_dataset(hospitals)
+
+
+if __name__ == "__main__":
+    main()
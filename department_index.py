@@ -0,0 +1,226 @@
+"""
+Department (科別) bitmap index and facet queries.
+
+convert_hospitals.py keeps the full 科別 set of every facility in the
+registry (clinics included, not only the hospitals written to
+hospitals.json). Each set is stored as a bitmap over a global department
+dictionary, and the query side builds one bitmap per department and per
+city over facility rows, so a faceted question is a handful of integer
+ANDs plus popcounts.
+Usage:
+  python department_index.py --city 台中市 --dept 急診科 --dept 腎臟科
+  python department_index.py --dept 精神科 --facets 20 --hospitals
+
+File format (src/data/departments.json, version 2):
+  {"v": 2, "departments": [<name>, ...], "ids": [<機構代碼>, ...],
+   "cities": [<city or "">, ...],                        # one per id, same order
+   "hospitals": <hex bitmap over rows: entries of hospitals.json>,
+   "bitmaps": [<hex bitmap over departments>, ...]}      # one per id, same order
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from location_resolver import match_prefix
+
+DEPARTMENTS_JSON = Path("src/data/departments.json")
+FORMAT_VERSION = 2
+
+# ─── Service tags derived from 科別 ─────────────────────────────────────────
+SERVICE_MAP = [
+    (["急診科"],                                    "急診"),
+    (["精神科", "精神醫學科", "兒童青少年精神科"], "精神科"),
+    (["中醫一般科", "中醫科", "針灸科", "傷科"],  "中醫"),
+    (["復健科", "物理治療科"],                     "復健"),
+    (["腫瘤科", "放射腫瘤科", "血液腫瘤科"],       "癌症中心"),
+    (["安寧緩和醫療科", "安寧療護"],               "安寧療護"),
+    (["腎臟科"],                                    "透析"),
+    (["牙科", "牙科一般科", "口腔外科"],           "牙科"),
+    (["中醫傷科", "骨科"],                         "骨科"),
+]
+
+
+def parse_departments(dept_str: str) -> set[str]:
+    return {d.strip() for d in dept_str.split(",") if d.strip()}
+
+
+def extract_services(depts: set[str]) -> list[str]:
+    """The (at most 4) display tags shown on a hospital card."""
+    services: list[str] = []
+
+    # 急診 first if present
+    if "急診科" in depts:
+        services.append("急診")
+
+    # 門診 always (all hospitals)
+    services.append("門診")
+
+    # 住院 if enough departments (indicates inpatient capability)
+    if len(depts) >= 6:
+        services.append("住院")
+
+    # Specialty services
+    for keywords, label in SERVICE_MAP:
+        if label in ("急診",):
+            continue  # Already handled
+        if any(kw in depts for kw in keywords):
+            if label not in services:
+                services.append(label)
+        if len(services) >= 4:
+            break
+
+    return services[:4]
+
+
+# ─── Build / write ───────────────────────────────────────────────────────────
+def encode_bitmap(depts: set[str], codes: dict[str, int]) -> int:
+    bitmap = 0
+    for d in depts:
+        bitmap |= 1 << codes[d]
+    return bitmap
+
+
+def decode_bitmap(bitmap: int, departments: list[str]) -> set[str]:
+    return {name for bit, name in enumerate(departments) if bitmap >> bit & 1}
+
+
+def write_departments(rows: list[tuple[str, str, bool, set[str]]], path: Path = DEPARTMENTS_JSON) -> None:
+    """rows: (機構代碼, city, in hospitals.json, department set) in registry order."""
+    departments = sorted(set().union(*(depts for *_, depts in rows)))
+    codes = {name: bit for bit, name in enumerate(departments)}
+    hospitals = 0
+    for r, (_, _, is_hospital, _) in enumerate(rows):
+        hospitals |= is_hospital << r
+    index = {
+        "v": FORMAT_VERSION,
+        "departments": departments,
+        "ids": [fid for fid, *_ in rows],
+        "cities": [city for _, city, *_ in rows],
+        "hospitals": format(hospitals, "x"),
+        "bitmaps": [format(encode_bitmap(depts, codes), "x") for *_, depts in rows],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Wrote {path} ({len(departments)} departments, {len(rows)} facilities, "
+          f"{hospitals.bit_count()} hospitals)")
+
+
+def load_department_rows(path: Path = DEPARTMENTS_JSON) -> dict[str, tuple[str, bool, set[str]]]:
+    """機構代碼 → (city, in hospitals.json, department set), for reusing rows in incremental runs.
+
+    An index in an older format yields nothing, so every row is rebuilt.
+    """
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+    if index.get("v") != FORMAT_VERSION:
+        return {}
+    hospitals = int(index["hospitals"], 16)
+    return {
+        fid: (city, bool(hospitals >> r & 1), decode_bitmap(int(bitmap, 16), index["departments"]))
+        for r, (fid, city, bitmap) in enumerate(zip(index["ids"], index["cities"], index["bitmaps"]))
+    }
+
+
+# ─── Query ───────────────────────────────────────────────────────────────────
+@dataclass
+class FacetResult:
+    ids: list[str]
+    department_counts: dict[str, int]
+    city_counts: dict[str, int]
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+
+class DepartmentIndex:
+    def __init__(self, index: dict):
+        if index["v"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported department index version {index['v']}")
+        self.departments: list[str] = index["departments"]
+        self.ids: list[str] = index["ids"]
+        self.rows = [int(b, 16) for b in index["bitmaps"]]
+        self.all = (1 << len(self.ids)) - 1
+        self.hospitals = int(index["hospitals"], 16)
+
+        # Column bitmaps: bit r set when facility row r has the department / city
+        self.by_department = [0] * len(self.departments)
+        self.by_city: dict[str, int] = {}
+        for r, (city, bitmap) in enumerate(zip(index["cities"], self.rows)):
+            bit = 1 << r
+            while bitmap:
+                low = bitmap & -bitmap
+                self.by_department[low.bit_length() - 1] |= bit
+                bitmap ^= low
+            self.by_city[city] = self.by_city.get(city, 0) | bit
+        self.codes = {name: i for i, name in enumerate(self.departments)}
+        self.row_of = {hid: r for r, hid in enumerate(self.ids)}
+
+    @classmethod
+    def load(cls, path: Path = DEPARTMENTS_JSON) -> "DepartmentIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def departments_of(self, hid: str) -> set[str]:
+        return decode_bitmap(self.rows[self.row_of[hid]], self.departments)
+
+    def services_of(self, hid: str) -> list[str]:
+        return extract_services(self.departments_of(hid))
+
+    def match(self, city: str | None = None, departments: list[str] | None = None,
+              hospitals_only: bool = False) -> int:
+        """Row bitmap of facilities in `city` having every department in `departments`."""
+        result = self.hospitals if hospitals_only else self.all
+        if city:
+            canonical = match_prefix(city)
+            result &= self.by_city.get(canonical[0] if canonical else city, 0)
+        for name in departments or []:
+            code = self.codes.get(name)
+            result &= self.by_department[code] if code is not None else 0
+        return result
+
+    def query(self, city: str | None = None, departments: list[str] | None = None, facets: int = 10,
+              hospitals_only: bool = False) -> FacetResult:
+        """Matching facility ids plus per-department and per-city counts within the match."""
+        result = self.match(city, departments, hospitals_only)
+        bits = bin(result)[:1:-1]   # bit r → character r
+        ids = [self.ids[r] for r, b in enumerate(bits) if b == "1"]
+        dept_counts = {
+            name: (result & col).bit_count()
+            for name, col in zip(self.departments, self.by_department)
+        }
+        top = sorted((item for item in dept_counts.items() if item[1]), key=lambda kv: (-kv[1], kv[0]))
+        city_counts = {c: (result & col).bit_count() for c, col in self.by_city.items()}
+        return FacetResult(
+            ids=ids,
+            department_counts=dict(top[:facets]),
+            city_counts={c: n for c, n in sorted(city_counts.items()) if n},
+        )
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    parser = argparse.ArgumentParser(description="Faceted 科別 queries over the department bitmap index")
+    parser.add_argument("--city", default=None)
+    parser.add_argument("--dept", action="append", default=[], help="required 科別 (repeatable)")
+    parser.add_argument("--facets", type=int, default=10, help="number of department facets to list")
+    parser.add_argument("--hospitals", action="store_true", help="only facilities listed in hospitals.json")
+    args = parser.parse_args()
+
+    index = DepartmentIndex.load()
+    start = time.perf_counter()
+    result = index.query(args.city, args.dept, args.facets, hospitals_only=args.hospitals)
+    elapsed = time.perf_counter() - start
+
+    print(f"{result.count} {'hospitals' if args.hospitals else 'facilities'}  ({elapsed * 1e6:.0f} µs)")
+    print("科別:", "  ".join(f"{k} {v}" for k, v in result.department_counts.items()))
+    print("縣市:", "  ".join(f"{k} {v}" for k, v in result.city_counts.items()))
+
+
+if __name__ == "__main__":
+    main()
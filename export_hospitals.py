@@ -3,8 +3,11 @@
 export_hospitals.py
 將 hospitals.json 匯出為 Excel 檔案（hospitals.xlsx）
 
-用法: python export_hospitals.py
+用法:
+  python export_hospitals.py             # 匯出 hospitals.xlsx
+  python export_hospitals.py --profile   # 各階段（讀取、寫入列、樣式、存檔）耗時 → export_profile.json
 """
+import argparse
 import sys
 import json
 from collections import Counter
@@ -14,6 +17,9 @@ import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
+from location_resolver import resolve_location
+from pipeline_profile import PROFILE, add_profile_arguments
+
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
 
 HOSPITALS_JSON = Path("src/data/hospitals.json")
@@ -51,9 +57,23 @@ def apply_header_style(ws) -> None:
         cell.border    = BORDER
 
 
+def normalize_location(h: dict) -> None:
+    """以共用 resolver 正規化縣市／行政區（行政區空白時改由地址判斷）"""
+    location = resolve_location(h.get("city", "") + h.get("district", ""), h.get("address", ""))
+    if location:
+        h["city"], h["district"] = location
+
+
 def main():
-    with open(HOSPITALS_JSON, encoding="utf-8") as f:
-        hospitals = json.load(f)
+    parser = argparse.ArgumentParser(description="將 hospitals.json 匯出為 Excel")
+    add_profile_arguments(parser, "export_profile.json")
+    PROFILE.configure(parser.parse_args())
+
+    with PROFILE.stage("json.read"):
+        with open(HOSPITALS_JSON, encoding="utf-8") as f:
+            hospitals = json.load(f)
+        for h in hospitals:
+            normalize_location(h)
 
     wb = openpyxl.Workbook()
     ws = wb.active
@@ -65,35 +85,38 @@ def main():
     apply_header_style(ws)
 
     # ── 資料列 ────────────────────────────────────────────────────────
-    for row_idx, h in enumerate(hospitals, start=2):
-        row_data = []
-        for _, key, _ in COLUMNS:
-            if key == "services":
-                val = "、".join(h.get("services", []))
-            else:
-                val = h.get(key) or ""
-            row_data.append(val)
-        ws.append(row_data)
-
-        # 套用樣式
-        fill = ALT_FILL if row_idx % 2 == 0 else None
-        for col_idx, cell in enumerate(ws[row_idx], start=1):
-            cell.font      = DATA_FONT
-            cell.alignment = DATA_ALIGN
-            cell.border    = BORDER
-            if fill:
-                cell.fill  = fill
-
-            # 官網 / 掛號欄位加超連結
-            col_key = COLUMNS[col_idx - 1][1]
-            if col_key in ("website", "appointmentUrl") and cell.value:
-                is_odd_row = row_idx % 2 == 1
-                cell.hyperlink = cell.value
-                cell.font = Font(
-                    name="微軟正黑體", size=10,
-                    color="2563EB", underline="single",
-                    bold=is_odd_row,
-                )
+    with PROFILE.stage("xlsx.rows", items=len(hospitals)):
+        for h in hospitals:
+            row_data = []
+            for _, key, _ in COLUMNS:
+                if key == "services":
+                    val = "、".join(h.get("services", []))
+                else:
+                    val = h.get(key) or ""
+                row_data.append(val)
+            ws.append(row_data)
+
+    # ── 套用樣式 ──────────────────────────────────────────────────────
+    with PROFILE.stage("xlsx.style", items=len(hospitals)):
+        for row_idx in range(2, len(hospitals) + 2):
+            fill = ALT_FILL if row_idx % 2 == 0 else None
+            for col_idx, cell in enumerate(ws[row_idx], start=1):
+                cell.font      = DATA_FONT
+                cell.alignment = DATA_ALIGN
+                cell.border    = BORDER
+                if fill:
+                    cell.fill  = fill
+
+                # 官網 / 掛號欄位加超連結
+                col_key = COLUMNS[col_idx - 1][1]
+                if col_key in ("website", "appointmentUrl") and cell.value:
+                    is_odd_row = row_idx % 2 == 1
+                    cell.hyperlink = cell.value
+                    cell.font = Font(
+                        name="微軟正黑體", size=10,
+                        color="2563EB", underline="single",
+                        bold=is_odd_row,
+                    )
 
     # ── 欄寬 ─────────────────────────────────────────────────────────
     for col_idx, (_, _, width) in enumerate(COLUMNS, start=1):
@@ -141,7 +164,8 @@ def main():
             cell.font = DATA_FONT
             cell.alignment = DATA_ALIGN
 
-    wb.save(OUTPUT_FILE)
+    with PROFILE.stage("xlsx.save", items=total):
+        wb.save(OUTPUT_FILE)
     print(f"✓ 匯出完成：{OUTPUT_FILE}")
     print(f"  共 {total} 間醫院 | 有官網 {has_web} 間 | 有掛號連結 {has_appt} 間")
 
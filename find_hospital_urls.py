@@ -5,49 +5,60 @@ find_hospital_urls.py
 
 用法:
   python find_hospital_urls.py             # 處理全部未填的醫院
-  python find_hospital_urls.py --start 50  # 從第 50 筆開始
-  python find_hospital_urls.py --count 10  # 只處理 10 筆
+  python find_hospital_urls.py --count 10  # 只處理 10 筆（其餘留在工作佇列，下次續行）
+  python find_hospital_urls.py --workers 4 # 4 個行程共用 crawl_queue.sqlite 工作佇列
   python find_hospital_urls.py --merge     # 合併快取到 hospitals.json
   python find_hospital_urls.py --stats     # 顯示統計
   python find_hospital_urls.py --force     # 忽略快取，強制重搜
+  python find_hospital_urls.py --refresh --budget 200
+                                           # 只重新驗證過期欄位（失敗／失效優先），最多 200 個請求
+  python find_hospital_urls.py --changelog convert_changelog.json
+                                           # 只處理 convert --incremental 新增/變更的醫院
+  python find_hospital_urls.py --profile   # 各階段（各類 HTTP 請求、HTML 解析）耗時 → crawl_profile.json
+  python find_hospital_urls.py --concurrency 32
+                                           # 並行請求上限（hospitals.tw 仍逐一，依令牌桶自動調速）
+  python find_hospital_urls.py --check-links
+                                           # 檢查現有連結（狀態、轉址鏈）→ link_check.json，--merge 時套用
+  python find_hospital_urls.py --directory  # 先以本地 hospitals.tw 目錄比對名稱，省去逐間搜尋
+  python find_hospital_urls.py --force --offline
+                                           # 只用 .http_cache 中的頁面重新擷取（不連網）
 """
 import sys
 import json
-import time
 import re
+import asyncio
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import MutableMapping
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
-
-import requests
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+
+from appt_discovery import APPT_TEXT_KW, discover_appointment
+from compact_bundle import write_compact
+from crawl_client import (DEFAULT_CONCURRENCY, DEFAULT_HOST_CONCURRENCY, BudgetExhausted, BudgetScope, CrawlClient,
+                          HostPolicy)
+from crawl_telemetry import TELEMETRY
+from dataset_writer import write_dataset
+from http_cache import DEFAULT_DIR as DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, DEFAULT_TTL, HttpCache
+from hw_directory import DIRECTORY_JSON, Directory, is_hospital_page, load_or_crawl
+from link_checker import (LINK_CHECK_JSON, apply_link_checks, check_link, check_links, load_results,
+                          save_results, summarize)
+from link_extractor import iter_anchors
+from pipeline_profile import PROFILE, add_profile_arguments
+from refresh_schedule import FIELD_TTL_DAYS, FIELDS, now_iso, plan, stamp
+from url_cache import UrlCache
+from work_queue import QUEUE_DB, WorkQueue, worker_name
 
 sys.stdout.reconfigure(encoding="utf-8", errors="replace")
 
 # ── 設定 ──────────────────────────────────────────────────────────────
-CACHE_FILE = Path("hospital_urls_cache.json")
+CACHE_FILE = Path("hospital_urls_cache.json")   # 實際寫入 hospital_urls_cache.sqlite，定期壓實回此檔
 HOSPITALS_JSON = Path("src/data/hospitals.json")
-SEARCH_DELAY = 2.5   # 每次搜尋間隔（秒）
-REQUEST_TIMEOUT = 15
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    ),
-    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
-}
-
-# hospitals.tw 需跳過的路徑（非醫院頁面）
-SKIP_PATHS = [
-    "/page/", "/doctor/", "/emergency/", "/progress/", "/register/",
-    "/about", "/terms", "/privacy", "/symptom", "/clinic", "/animal",
-    "chinese-new-year", "holiday-", "-holiday", "er/", "twedr.com", "#",
-]
-
-# 掛號文字關鍵字
-APPT_TEXT_KW = ["網路掛號", "線上掛號", "掛號", "預約掛號", "網路預約", "線上預約"]
+SEARCH_DELAY = 2.5       # hospitals.tw 起始的請求間隔（秒）；回應正常時逐步加快
+MIN_SEARCH_DELAY = 1.0   # hospitals.tw 最快的請求間隔（robots.txt 的 Crawl-delay 較長時以其為準）
+TELEMETRY_JSON = Path("crawl_telemetry.json")
+TELEMETRY_PROM = Path("crawl_telemetry.prom")
+IDLE_WAIT = 120      # 佇列沒有可租用項目時，最多等這麼久讓退避中的重試到期（秒）
 
 
 # ── URL 工具 ─────────────────────────────────────────────────────────
@@ -79,54 +90,43 @@ def extract_short_name(full_name: str) -> str:
 
 
 # ── hospitals.tw 搜尋 ────────────────────────────────────────────────
-def search_hospitals_tw(full_name: str, short_name: str) -> str:
+async def search_hospitals_tw(client: CrawlClient, full_name: str, short_name: str) -> str:
     """
     在 hospitals.tw 搜尋醫院，回傳該醫院的 hospitals.tw 頁面 URL。
     例: "臺安醫院" → "https://hospitals.tw/tahsda/"
+    兩個查詢都失敗（連線錯誤、5xx）時拋出最後的錯誤，讓工作佇列稍後重試，而不是記成「找不到」。
     """
-    for query in [full_name, short_name]:
+    queries = list(dict.fromkeys([full_name, short_name]))   # 短名與全名相同時只搜一次
+    errors = []
+    for query in queries:
         try:
-            resp = requests.get(
-                "https://hospitals.tw/",
-                params={"s": query},
-                headers=HEADERS,
-                timeout=REQUEST_TIMEOUT,
-            )
-            soup = BeautifulSoup(resp.text, "html.parser")
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                text = a.get_text(strip=True)
-                # 必須是 hospitals.tw 的頁面
-                if "hospitals.tw/" not in href:
-                    continue
-                # 跳過已知的非醫院頁面
-                if any(bad in href for bad in SKIP_PATHS):
-                    continue
-                # 必須有 slug（不是根路徑）
-                slug = href.rstrip("/").split("/")[-1]
-                if not slug:
+            resp = await client.get("https://hospitals.tw/", params={"s": query}, phase="search")
+            if resp.status >= 500 or resp.status == 429:
+                raise RuntimeError(f"HTTP {resp.status}")
+            for href, text in PROFILE.iterate("html.parse", iter_anchors(resp.content, resp.encoding)):
+                # 必須是 hospitals.tw 的醫院頁面（有 slug、非已知的站內頁面）
+                if not is_hospital_page(href):
                     continue
                 # 確認是醫院頁面（含門診/掛號關鍵字，或名稱包含中文）
                 if "門診" in text or "掛號" in text or "看診" in text:
                     return href
         except Exception as e:
-            print(f"    [搜尋失敗] {e}")
-        time.sleep(SEARCH_DELAY)
+            print(f"    [搜尋失敗] {query}: {e}")
+            errors.append(e)
+    if len(errors) == len(queries):
+        raise errors[-1]
     return ""
 
 
 # ── 從 hospitals.tw 頁面抓取官網和掛號 URL ───────────────────────────
-def get_info_from_hw_page(hw_url: str) -> tuple[str, str]:
+async def get_info_from_hw_page(client: CrawlClient, hw_url: str) -> tuple[str, str]:
     """
     抓取 hospitals.tw 的醫院頁面，回傳 (官網 URL, 掛號 URL)。
     """
     try:
-        resp = requests.get(hw_url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-        soup = BeautifulSoup(resp.text, "html.parser")
+        resp = await client.get(hw_url, phase="hw_page")
         website, appt = "", ""
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            text = a.get_text(strip=True)
+        for href, text in PROFILE.iterate("html.parse", iter_anchors(resp.content, resp.encoding)):
             if "hospitals.tw" in href or not href.startswith("http"):
                 continue
             if "官方網站" in text and not website:
@@ -134,176 +134,504 @@ def get_info_from_hw_page(hw_url: str) -> tuple[str, str]:
             if any(kw in text for kw in APPT_TEXT_KW) and not appt:
                 if href != website:  # 掛號連結應該與官網不同
                     appt = href
+            if website and appt:
+                break   # 兩者都找到就不必解析頁面其餘部分
         # 若掛號連結不存在，但官網有，嘗試同一網域下的掛號路徑
         if not appt and website:
-            appt = find_appt_from_homepage(website)
+            appt = await find_appt_from_homepage(client, website)
         return website, appt
     except Exception as e:
-        print(f"    [解析失敗] {e}")
+        print(f"    [解析失敗] {hw_url}: {e}")
         return "", ""
 
 
-# ── 從官網首頁找掛號連結（備用） ─────────────────────────────────────
-def find_appt_from_homepage(website_url: str) -> str:
-    APPT_URL_RE = re.compile(r"(appointment|register|booking|netreg|regist|預約|掛號)", re.I)
-    try:
-        resp = requests.get(
-            website_url, headers=HEADERS, timeout=REQUEST_TIMEOUT, allow_redirects=True
-        )
-        soup = BeautifulSoup(resp.text, "html.parser")
-        for a in soup.find_all("a", href=True):
-            text = a.get_text(strip=True)
-            href = a["href"]
-            if not href or href.startswith("#") or href.startswith("javascript"):
-                continue
-            if any(kw in text for kw in APPT_TEXT_KW):
-                return href if href.startswith("http") else urljoin(website_url, href)
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if APPT_URL_RE.search(href) and not any(
-                bad in href for bad in [".pdf", ".jpg", ".png", "mailto:", "#"]
-            ):
-                return href if href.startswith("http") else urljoin(website_url, href)
-    except Exception:
-        pass
-    return ""
-
-
-# ── 快取 ──────────────────────────────────────────────────────────────
-def load_cache() -> dict:
-    if CACHE_FILE.exists():
-        with open(CACHE_FILE, encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-
-def save_cache(cache: dict):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
+# ── 從官網找掛號連結（備用） ─────────────────────────────────────
+async def find_appt_from_homepage(client: CrawlClient, website_url: str) -> str:
+    """從官網首頁起，沿站內選單（就醫服務、門診資訊…）最多深入 MAX_DEPTH 層找掛號頁"""
+    found = await discover_appointment(client, website_url)
+    return found.url if found else ""
 
 
 # ── 處理單間醫院 ─────────────────────────────────────────────────────
-def process_hospital(hospital: dict, cache: dict) -> dict:
-    hid = hospital["id"]
+async def discover(client: CrawlClient, hospital: dict, result: dict, need: set[str],
+                   directory: Directory | None, log: list[str]) -> None:
+    """為 result 中 need 所列欄位（website / appointmentUrl）找連結，找到即填入"""
     name = hospital["name"]
     short = extract_short_name(name)
 
-    if hid in cache:
-        print(f"  [快取] {short}")
-        return cache[hid]
-
-    result = {
-        "website": hospital.get("website") or "",
-        "appointmentUrl": hospital.get("appointmentUrl") or "",
-    }
-
-    need_website = not result["website"]
-    need_appt = not result["appointmentUrl"]
-
-    if not need_website and not need_appt:
-        cache[hid] = result
-        return result
-
-    # ── 從 hospitals.tw 搜尋 ─────────────────────────────────────────
-    print(f"  搜尋: {short}")
-    hw_url = search_hospitals_tw(name, short)
+    # ── 先查本地 hospitals.tw 目錄，比對不到才線上搜尋 ────────────────
+    hw_url = ""
+    if directory is not None:
+        ranked = directory.candidates(name, short)
+        log.append("  目錄候選: " + ("、".join(f"{e['name']} {s:.2f}" for e, s in ranked[:3]) or "（無）"))
+        match = directory.best(name, short)
+        if match:
+            hw_url = match[0]["url"]
+    if not hw_url:
+        log.append(f"  搜尋: {short}")
+        hw_url = await search_hospitals_tw(client, name, short)
     if hw_url:
-        print(f"  → 頁面: {hw_url}")
-        web, appt = get_info_from_hw_page(hw_url)
-        if need_website and web:
+        log.append(f"  → 頁面: {hw_url}")
+        web, appt = await get_info_from_hw_page(client, hw_url)
+        if "website" in need and web:
             result["website"] = base_url(web)   # 只保留根網址
-            print(f"    官網: {result['website']}")
-        if need_appt and appt:
+            log.append(f"    官網: {result['website']}")
+        if "appointmentUrl" in need and appt:
             result["appointmentUrl"] = appt
-            print(f"    掛號: {appt}")
+            log.append(f"    掛號: {appt}")
     else:
-        print(f"  → 未在 hospitals.tw 找到")
+        log.append(f"  → 未在 hospitals.tw 找到")
         # 如果有官網但無掛號，直接從官網抓
-        if not need_website and need_appt and result["website"]:
-            appt = find_appt_from_homepage(result["website"])
+        if "website" not in need and "appointmentUrl" in need and result["website"]:
+            appt = await find_appt_from_homepage(client, result["website"])
             if appt:
                 result["appointmentUrl"] = appt
-                print(f"    掛號(官網): {appt}")
+                log.append(f"    掛號(官網): {appt}")
+
 
-    cache[hid] = result
-    return result
+async def process_hospital(client: CrawlClient, hospital: dict, cache: MutableMapping,
+                           directory: Directory | None = None) -> list[str]:
+    """查詢一間醫院並寫入 cache，回傳要印出的紀錄（並行時整間一起印，避免交錯）"""
+    hid = hospital["id"]
+    log = [f"{hospital['name']} ({hospital['city']})"]
+
+    if hid in cache:
+        log.append(f"  [快取] {extract_short_name(hospital['name'])}")
+        return log
+
+    found = {field: hospital.get(field) or "" for field in FIELDS}
+    need = {field for field in FIELDS if not found[field]}
+    if need:
+        await discover(client, hospital, found, need, directory, log)
+
+    now = now_iso()
+    record = {field: hospital.get(field) or "" for field in FIELDS}   # 只有新找到的欄位記為變更
+    for field in FIELDS:
+        stamp(record, field, found[field], now)
+        if hospital.get(field):
+            record.setdefault("lastMerged", {})[field] = now   # 取自 hospitals.json，本來就一致
+    cache[hid] = record
+    return log
+
+
+async def refresh_hospital(client: CrawlClient, hospital: dict, cache: MutableMapping, fields: list[str],
+                           directory: Directory | None = None) -> list[str]:
+    """重新驗證一筆快取紀錄中到期的欄位：連結仍有效只更新檢查時間，失效或空白則重新尋找"""
+    hid = hospital["id"]
+    record = cache.get(hid) or {}
+    log = [f"{hospital['name']} ({hospital['city']})  更新: {', '.join(fields)}"]
+    found = {field: record.get(field) or "" for field in FIELDS}
+    broken = set()
+    for field in fields:
+        url = found[field]
+        if not url:
+            continue
+        check = await client.call(url, check_link, url, field, client.timeout, phase="check")
+        if check.alive:
+            log.append(f"  [有效] {field}: {url}")
+        else:
+            log.append(f"  [失效] {field}: {url}（{check.status or check.error}）")
+            broken.add(field)
+            found[field] = ""
+    need = {field for field in fields if not found[field]}
+    if need:
+        with BudgetScope() as scope:
+            await discover(client, hospital, found, need, directory, log)
+        if scope.refused:
+            # 這間被拒的請求可能已被搜尋流程當成「找不到」吞掉，整間不寫入，下次重來
+            raise BudgetExhausted(hospital["name"])
+
+    now = now_iso()
+    for field in fields:
+        if field in broken and not found[field]:
+            stamp(record, field, record.get(field) or "", now, broken=True)   # 保留原值，等找到替代
+        elif stamp(record, field, found[field], now):
+            log.append(f"  [變更] {field}: {found[field]}")
+    cache[hid] = record
+    return log
+
+
+def make_client(args, http_cache: HttpCache | None = None) -> CrawlClient:
+    """hospitals.tw 由 host policy 保持單一連線，從每 SEARCH_DELAY 秒一次起步，最快每 MIN_SEARCH_DELAY 秒一次"""
+    hw_policy = HostPolicy(concurrency=1, rate=1 / SEARCH_DELAY, max_rate=1 / MIN_SEARCH_DELAY)
+    return CrawlClient(
+        concurrency=args.concurrency,
+        host_concurrency=args.host_concurrency,
+        # 每個 --workers 行程各自限速，速率除以行程數，合計不變
+        policies={"hospitals.tw": hw_policy.scaled(1 / args.workers)},
+        cache=http_cache,
+        offline=args.offline and http_cache is not None,
+        memo=not args.no_memo,
+    )
+
+
+def open_http_cache(args) -> HttpCache | None:
+    if args.no_http_cache:
+        return None
+    return HttpCache(args.http_cache, ttl=args.http_ttl * 3600, max_bytes=args.http_cache_mb << 20)
+
+
+def print_http_stats(client: CrawlClient, http_cache: HttpCache | None) -> None:
+    if client.memo:
+        print(f"\n重複請求：記憶體重用 {client.memo_hits} 次，與進行中的請求合併 {client.coalesced} 次")
+    hw_rate = client.rates().get("hospitals.tw")
+    if hw_rate:
+        print(f"\nhospitals.tw 結束時速率：每 {1 / hw_rate:.1f} 秒一次")
+    if http_cache:
+        st = http_cache.stats()
+        print(f"\nHTTP 快取：命中 {st['hits']}  重新驗證 {st['revalidated']}  未命中 {st['misses']}"
+              f"  （{st['entries']} 筆，{st['bytes'] / 1e6:.1f} MB）")
+
+
+async def crawl(by_id: dict[str, dict], cache: MutableMapping, queue: WorkQueue, args, owner: str,
+                limit: int | None = None) -> int:
+    """
+    從工作佇列逐筆租用醫院並行處理（同時 args.concurrency 間），回傳處理筆數。
+    成功標記 done；拋出例外則記錄失敗，依退避時間稍後重試。
+    沒有可租用的項目時，等待 IDLE_WAIT 秒內到期的重試，否則結束。
+    """
+    http_cache = open_http_cache(args)
+    client = make_client(args, http_cache)
+    done = 0
+    remaining = limit
+
+    async def run() -> None:
+        nonlocal done, remaining
+        while remaining is None or remaining > 0:
+            leased = queue.lease(owner)
+            if not leased:
+                wait = queue.next_retry()
+                if wait is None or wait > IDLE_WAIT:
+                    return
+                await asyncio.sleep(wait + 0.1)
+                continue
+            if remaining is not None:
+                remaining -= 1
+            hid = leased[0]
+            hospital = by_id.get(hid)
+            if hospital is None:       # 已不在 hospitals.json
+                queue.done(hid)
+                continue
+            if args.force:
+                cache.pop(hid, None)
+            try:
+                log = await process_hospital(client, hospital, cache, directory)
+                queue.done(hid)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                state = queue.fail(hid, error)
+                log = [f"{hospital['name']} ({hospital['city']})",
+                       f"  [失敗] {error}（{'稍後重試' if state == 'pending' else '已放棄'}）"]
+            done += 1
+            print(f"\n[{owner} #{done}] " + "\n".join(log))
+
+    try:
+        directory = None
+        if args.directory or args.refresh_directory:
+            with PROFILE.stage("directory"):
+                directory = await load_or_crawl(client, args.directory_file, refresh=args.refresh_directory)
+        with PROFILE.stage("crawl"):
+            await asyncio.gather(*(run() for _ in range(args.concurrency)))
+    finally:
+        queue.release(owner)
+        print_http_stats(client, http_cache)
+        client.close()
+    return done
+
+
+async def refresh(by_id: dict[str, dict], cache: MutableMapping, work: list[tuple[str, list[str]]], args) -> int:
+    """依 plan() 的優先順序重新驗證到期欄位
+
+    每個網路請求送出前先向 client 的預算（args.budget）預留，並行中的醫院合計也不會超出；
+    預留數達到預算後不再開始新的醫院，進行中的醫院照常寫入，只有自己的請求被拒的才留待下次。
+    """
+    http_cache = open_http_cache(args)
+    client = make_client(args, http_cache)
+    pending = list(reversed(work))
+    done = 0
+
+    async def run() -> None:
+        nonlocal done
+        while pending and client.requests < client.budget:
+            hid, fields = pending.pop()
+            hospital = by_id[hid]
+            try:
+                log = await refresh_hospital(client, hospital, cache, fields, directory)
+            except BudgetExhausted:
+                pending.append((hid, fields))
+                return
+            except Exception as e:
+                log = [f"{hospital['name']} ({hospital['city']})", f"  [失敗] {type(e).__name__}: {e}"]
+            done += 1
+            print(f"\n[{done}/{len(work)}] " + "\n".join(log))
+
+    try:
+        directory = None
+        if args.directory or args.refresh_directory:
+            with PROFILE.stage("directory"):
+                directory = await load_or_crawl(client, args.directory_file, refresh=args.refresh_directory)
+        client.budget = args.budget            # 目錄的請求也已計入
+        with PROFILE.stage("refresh"):
+            await asyncio.gather(*(run() for _ in range(args.concurrency)))
+    finally:
+        print(f"\n網路請求 {client.requests} 次（預算 {args.budget}），未處理 {len(pending)} 間留待下次")
+        print_http_stats(client, http_cache)
+        client.close()
+    return done
+
+
+async def prepare_directory(args) -> None:
+    client = make_client(args)
+    try:
+        await load_or_crawl(client, args.directory_file, refresh=args.refresh_directory)
+    finally:
+        client.close()
+
+
+def run_worker(by_id: dict[str, dict], args, index: int, limit: int | None,
+               only: set[str] | None = None) -> tuple[int, dict]:
+    """--workers 子行程：各自開啟快取與佇列（SQLite WAL 可多行程共用），回傳處理筆數與遙測資料"""
+    TELEMETRY.reset()              # fork 時複製了主行程的數字
+    cache = UrlCache(CACHE_FILE)
+    queue = WorkQueue(args.queue, only=only)
+    try:
+        done = asyncio.run(crawl(by_id, cache, queue, args, worker_name(index), limit))
+        return done, TELEMETRY.to_dict()
+    finally:
+        queue.close()
+        cache.close()
+
+
+# ── 連結檢查 ─────────────────────────────────────────────────────────
+async def check_all_links(hospitals: list, args) -> None:
+    """檢查 hospitals.json 內所有官網／掛號連結（不經 HTTP 快取），結果寫入 args.link_check"""
+    client = make_client(args)
+    try:
+        with PROFILE.stage("check", items=len(hospitals)):
+            doc = await check_links(client, hospitals)
+    finally:
+        client.close()
+    save_results(doc, args.link_check)
+    c = summarize(doc)
+    print(f"\n檢查 {c['checked']} 個連結：正常 {c['alive']}  失效 {c['dead']}"
+          f"  經轉址 {c['redirected']}  可改寫 {c['rewrite']} → {args.link_check}")
 
 
 # ── 統計 ─────────────────────────────────────────────────────────────
-def show_stats(hospitals: list, cache: dict):
+def show_stats(hospitals: list, cache: UrlCache):
     total = len(hospitals)
     has_web  = sum(1 for h in hospitals if h.get("website"))
     has_appt = sum(1 for h in hospitals if h.get("appointmentUrl"))
-    c_web  = sum(1 for v in cache.values() if v.get("website"))
-    c_appt = sum(1 for v in cache.values() if v.get("appointmentUrl"))
+    c = cache.stats()
     print(f"hospitals.json  : {total} 間  官網={has_web}  掛號={has_appt}")
-    print(f"快取 (cache)    : {len(cache)} 筆  官網={c_web}  掛號={c_appt}")
+    print(f"快取 (cache)    : {c['records']} 筆  官網={c['website']}  掛號={c['appointmentUrl']}")
 
 
 # ── 合併快取 ─────────────────────────────────────────────────────────
-def merge_cache(hospitals: list, cache: dict) -> list:
+def merge_cache(hospitals: list, cache: MutableMapping) -> list:
+    """逐筆以 id 查快取（UrlCache 不會整份載入記憶體）
+
+    空白欄位直接補上；已有值的欄位只在快取於上次合併（lastMerged）之後
+    才變更時覆寫，hospitals.json 的手動修改與連結檢查的改寫因此不會被舊值蓋回。
+    """
     updated = 0
+    kept = []
+    stamped = {}
+    now = now_iso()
     for h in hospitals:
         hid = h["id"]
-        if hid in cache:
-            c = cache[hid]
-            if c.get("website") and not h.get("website"):
-                h["website"] = c["website"]
-                updated += 1
-            if c.get("appointmentUrl") and not h.get("appointmentUrl"):
-                h["appointmentUrl"] = c["appointmentUrl"]
-                updated += 1
+        if hid not in cache:
+            continue
+        c = cache[hid]
+        merged = c.get("lastMerged", {})
+        touched = False
+        for field in FIELDS:
+            changed_at = c.get("lastChanged", {}).get(field, "")
+            if field in merged and changed_at <= merged[field]:
+                continue                                  # 上次合併後快取沒有變更
+            if c.get(field) and c[field] != h.get(field):
+                if not h.get(field) or field in merged:
+                    h[field] = c[field]
+                    updated += 1
+                else:                                     # 從未合併過：不確定哪邊較新，保留 hospitals.json
+                    kept.append((hid, field, h[field]))
+            c.setdefault("lastMerged", {})[field] = now
+            touched = True
+        if touched:
+            stamped[hid] = c
+    cache.update(stamped)                                 # UrlCache：單一交易寫回
     print(f"合併完成：更新 {updated} 個欄位。")
+    for hid, field, value in kept:
+        print(f"  [保留] {hid} {field}: {value}（與快取不同，沿用 hospitals.json）")
     return hospitals
 
 
 # ── 主程式 ────────────────────────────────────────────────────────────
 def main():
     parser = argparse.ArgumentParser(description="從 hospitals.tw 抓取醫院官網及掛號連結")
-    parser.add_argument("--start", type=int, default=0)
-    parser.add_argument("--count", type=int, default=None)
+    parser.add_argument("--count", type=int, default=None, help="本次最多處理 N 間（其餘留在佇列）")
     parser.add_argument("--merge",  action="store_true", help="合併快取到 hospitals.json")
     parser.add_argument("--stats",  action="store_true", help="顯示統計")
     parser.add_argument("--force",  action="store_true", help="忽略快取，重新搜尋")
+    parser.add_argument("--queue", type=Path, default=QUEUE_DB,
+                        help="工作佇列檔（依醫院 id 記錄 待處理／處理中／完成／失敗，中斷後續行）")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="同時執行的爬蟲行程數（共用佇列與快取；hospitals.tw 總速率不變）")
+    parser.add_argument("--retry-failed", action="store_true", help="把已放棄（失敗）的項目放回待處理")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="同時進行的 HTTP 請求上限")
+    parser.add_argument("--host-concurrency", type=int, default=DEFAULT_HOST_CONCURRENCY,
+                        help="每個網站（醫院官網）同時請求上限；hospitals.tw 固定為 1")
+    parser.add_argument("--http-cache", type=Path, default=DEFAULT_CACHE_DIR,
+                        help="HTTP 回應快取目錄（搜尋頁、醫院頁、官網首頁）")
+    parser.add_argument("--http-ttl", type=float, default=DEFAULT_TTL / 3600,
+                        help="快取回應多久（小時）後以條件式請求重新驗證")
+    parser.add_argument("--http-cache-mb", type=int, default=DEFAULT_MAX_BYTES >> 20,
+                        help="快取容量上限（MB），超過時淘汰最久未用的回應")
+    parser.add_argument("--no-http-cache", action="store_true", help="不使用 HTTP 回應快取")
+    parser.add_argument("--no-memo", action="store_true",
+                        help="不在本次執行中重用相同請求的回應（預設重用，並合併同時進行的相同請求）")
+    parser.add_argument("--offline", action="store_true",
+                        help="只用 HTTP 快取中的頁面重新擷取（不連網；搭配 --force 在改動解析規則後重跑）")
+    parser.add_argument("--directory", action="store_true",
+                        help="先以本地 hospitals.tw 目錄比對醫院名稱（沒有快照時先抓一次），比對不到才線上搜尋")
+    parser.add_argument("--refresh-directory", action="store_true",
+                        help="重新抓取 hospitals.tw 目錄列表頁並更新快照（隱含 --directory）")
+    parser.add_argument("--directory-file", type=Path, default=DIRECTORY_JSON,
+                        help="hospitals.tw 目錄快照檔（可指定固定快照離線測試比對）")
+    parser.add_argument("--check-links", action="store_true",
+                        help="檢查 hospitals.json 的官網／掛號連結（狀態、延遲、轉址鏈），結果寫入 --link-check")
+    parser.add_argument("--link-check", type=Path, default=LINK_CHECK_JSON,
+                        help="連結檢查結果檔；--merge 時據以改寫為最終 HTTPS 網址並列出失效連結")
+    parser.add_argument("--refresh", action="store_true",
+                        help="只重新驗證過期的快取欄位（失敗與失效連結優先），受 --budget 限制")
+    parser.add_argument("--budget", type=int, default=300, help="--refresh 每次最多發出的網路請求數")
+    parser.add_argument("--website-ttl", type=float, default=FIELD_TTL_DAYS["website"],
+                        help="官網連結多久（天）後重新驗證")
+    parser.add_argument("--appt-ttl", type=float, default=FIELD_TTL_DAYS["appointmentUrl"],
+                        help="掛號連結多久（天）後重新驗證")
+    parser.add_argument("--changelog", type=Path, default=None,
+                        help="只處理 convert_hospitals.py --incremental 產生的新增/變更項目")
+    parser.add_argument("--telemetry", type=Path, default=TELEMETRY_JSON,
+                        help="HTTP 遙測（各網站／階段延遲分布、位元組、狀態碼、逾時、例外、快取命中率）JSON 輸出")
+    parser.add_argument("--prom-textfile", type=Path, default=TELEMETRY_PROM,
+                        help="同上，Prometheus textfile 格式（可指向 node_exporter 的 textfile 目錄）")
+    add_profile_arguments(parser, "crawl_profile.json")
     args = parser.parse_args()
+    PROFILE.configure(args)
+    if args.offline and args.no_http_cache:
+        parser.error("--offline 需要 HTTP 快取")
 
     with open(HOSPITALS_JSON, encoding="utf-8") as f:
         hospitals = json.load(f)
-    cache = load_cache()
+    cache = UrlCache(CACHE_FILE)
+    try:
+        run_command(args, hospitals, cache)
+    finally:
+        cache.close()
+        write_telemetry(args)
+
+
+def write_telemetry(args) -> None:
+    """有發出 HTTP 請求的執行（爬取、--refresh、--check-links）結束時輸出遙測，中斷時也寫"""
+    if not TELEMETRY.series and not TELEMETRY.sources:
+        return
+    TELEMETRY.write_json(args.telemetry)
+    TELEMETRY.write_prometheus(args.prom_textfile)
+    ratio = TELEMETRY.hit_ratios().get("all")
+    print(f"HTTP 遙測 → {args.telemetry}、{args.prom_textfile}"
+          + (f"（免重新下載比例 {ratio:.0%}）" if ratio is not None else ""))
+
 
+def run_command(args, hospitals: list, cache: UrlCache) -> None:
     if args.stats:
         show_stats(hospitals, cache)
+        if args.queue.exists():
+            with WorkQueue(args.queue) as queue:
+                q = queue.counts()
+            print(f"工作佇列        : 待處理 {q['pending']}  處理中 {q['in_flight']}  完成 {q['done']}  失敗 {q['failed']}")
+        return
+
+    if args.check_links:
+        asyncio.run(check_all_links(hospitals, args))
+        return
+
+    if args.refresh:
+        failed = set()
+        if args.queue.exists():
+            with WorkQueue(args.queue) as queue:
+                failed = {hid for hid, _, _ in queue.failures()}
+        dead = set()
+        if args.link_check.exists():
+            for hid, record in load_results(args.link_check)["links"].items():
+                dead |= {(hid, field) for field, check in record.items() if not check["alive"]}
+        ttl = {"website": args.website_ttl, "appointmentUrl": args.appt_ttl}
+        work = plan(hospitals, cache, failed, dead, ttl)
+        print(f"到期待驗證: {len(work)} 間（失敗／失效優先），本次請求預算 {args.budget}")
+        print("=" * 60)
+        processed = asyncio.run(refresh({h["id"]: h for h in hospitals}, cache, work, args))
+        print("\n" + "=" * 60)
+        print(f"完成！本次驗證 {processed} 間。執行 --merge 將變更合併到 hospitals.json")
         return
 
     if args.merge:
-        hospitals = merge_cache(hospitals, cache)
-        with open(HOSPITALS_JSON, "w", encoding="utf-8") as f:
-            json.dump(hospitals, f, ensure_ascii=False, indent=2)
+        with PROFILE.stage("merge", items=len(hospitals)):
+            hospitals = merge_cache(hospitals, cache)
+            if args.link_check.exists():
+                rewritten, dead = apply_link_checks(hospitals, load_results(args.link_check))
+                print(f"連結檢查（{args.link_check}）：改寫 {rewritten} 個網址，失效 {len(dead)} 個")
+                for hid, field, url in dead:
+                    print(f"  [失效] {hid} {field}: {url}")
+        with PROFILE.stage("json.write", items=len(hospitals)):
+            if write_dataset(hospitals, HOSPITALS_JSON):
+                write_compact(hospitals)
         show_stats(hospitals, cache)
         return
 
     need = [h for h in hospitals if not h.get("website") or not h.get("appointmentUrl")]
-    subset = need[args.start:]
-    if args.count:
-        subset = subset[: args.count]
-
-    print(f"待處理: {len(subset)} 間（從索引 {args.start} 開始）")
-    print(f"快取已有: {len(cache)} 筆")
-    print("=" * 60)
-
-    for i, hospital in enumerate(subset):
-        print(f"\n[{i+1}/{len(subset)}] {hospital['name']} ({hospital['city']})")
+    if args.changelog:
+        with open(args.changelog, encoding="utf-8") as f:
+            changelog = json.load(f)
+        delta = set(changelog["added"]) | set(changelog["changed"])
+        need = [h for h in need if h["id"] in delta]
+    # 指定 --changelog 時只租用這次異動的醫院，佇列中先前未完成的項目留待完整執行
+    only = {h["id"] for h in need} if args.changelog else None
+
+    with WorkQueue(args.queue, only=only) as queue:
+        added = queue.enqueue(h["id"] for h in need)
         if args.force:
-            cache.pop(hospital["id"], None)
-        process_hospital(hospital, cache)
-        if (i + 1) % 10 == 0:
-            save_cache(cache)
-            print(f"  [已儲存快取 {len(cache)} 筆]")
-
-    save_cache(cache)
-    print("\n" + "=" * 60)
-    print(f"完成！共處理 {len(subset)} 間，快取 {len(cache)} 筆。")
-    print("執行 --merge 將結果合併到 hospitals.json")
+            queue.requeue(h["id"] for h in need)
+        elif args.retry_failed:
+            queue.requeue(states=("failed",))
+        q = queue.counts()
+        print(f"佇列（{args.queue}）：新增 {added}  待處理 {q['pending']}  處理中 {q['in_flight']}"
+              f"  完成 {q['done']}  失敗 {q['failed']}")
+        print(f"快取已有: {len(cache)} 筆")
+        print("=" * 60)
+
+        by_id = {h["id"]: h for h in hospitals}
+        if args.workers > 1:
+            if args.directory or args.refresh_directory:
+                asyncio.run(prepare_directory(args))   # 只抓一次，子行程讀快照
+                args.directory, args.refresh_directory = True, False
+            limit = -(-args.count // args.workers) if args.count else None
+            with ProcessPoolExecutor(args.workers) as pool:
+                futures = [pool.submit(run_worker, by_id, args, i, limit, only) for i in range(args.workers)]
+                processed = 0
+                for future in futures:
+                    done, telemetry = future.result()
+                    processed += done
+                    TELEMETRY.merge(telemetry)
+        else:
+            processed = asyncio.run(crawl(by_id, cache, queue, args, worker_name(), args.count))
+
+        q = queue.counts()
+        print("\n" + "=" * 60)
+        print(f"完成！本次處理 {processed} 間，快取 {len(cache)} 筆。")
+        print(f"佇列：待處理 {q['pending']}  處理中 {q['in_flight']}  完成 {q['done']}  失敗 {q['failed']}")
+        for hid, attempts, error in queue.failures():
+            print(f"  [放棄] {hid}（{attempts} 次）{error}")
+    print("執行 --merge 將結果合併到 hospitals.json；中斷後直接重跑即可從佇列續行")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,302 @@
+"""
+Offline geocoding of hospital addresses and a grid spatial index for
+nearest-hospital queries.
+
+The gazetteer is a local CSV (not fetched from any service):
+    city,district,road,lat,lon
+    臺北市,松山區,,25.0500,121.5776          ← district centroid (road empty)
+    臺北市,松山區,八德路四段,25.0488,121.5660  ← road segment
+Addresses are matched road → district → city (city = mean of its district
+centroids); the precision used is kept in `geoPrecision`.
+Usage:
+  python geocode_hospitals.py --gazetteer gazetteer.csv     # add lat/lon, write spatial index
+  python geocode_hospitals.py --near 25.04,121.56 --n 5 --service 急診
+  python geocode_hospitals.py --near 25.04,121.56 --km 3
+  python geocode_hospitals.py --bench                       # query latency benchmark
+"""
+import argparse
+import csv
+import heapq
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+from compact_bundle import write_compact
+from dataset_writer import write_dataset
+from location_resolver import location_prefix, resolve_location
+from name_index import fold
+
+HOSPITALS_JSON = Path("src/data/hospitals.json")
+SPATIAL_JSON = Path("src/data/spatial_index.json")
+GAZETTEER_CSV = Path("gazetteer.csv")
+GEO_FIELDS = ("lat", "lon", "geoPrecision")
+
+FORMAT_VERSION = 1
+CELL_DEG = 0.05                  # grid cell size (~5 km)
+EARTH_KM = 6371.0088
+
+
+# ─── Gazetteer ───────────────────────────────────────────────────────────────
+class Gazetteer:
+    def __init__(self, path: Path):
+        self.roads: dict[tuple[str, str], dict[str, tuple[float, float]]] = {}
+        self.districts: dict[tuple[str, str], tuple[float, float]] = {}
+        city_points: dict[str, list[tuple[float, float]]] = {}
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                location = resolve_location(row["city"] + row["district"])
+                if not location:
+                    continue
+                key = (location[0], fold(location[1]))
+                point = (float(row["lat"]), float(row["lon"]))
+                road = fold(row.get("road") or "").replace(" ", "")
+                if road:
+                    self.roads.setdefault(key, {})[road] = point
+                else:
+                    self.districts[key] = point
+                    city_points.setdefault(location[0], []).append(point)
+        self.cities = {
+            city: (sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts))
+            for city, pts in city_points.items()
+        }
+        self.max_road = max((len(r) for roads in self.roads.values() for r in roads), default=0)
+
+    def locate(self, h: dict) -> tuple[float, float, str] | None:
+        """(lat, lon, precision) for a hospital record, or None."""
+        location = resolve_location(h["city"] + h.get("district", ""), h.get("address", ""))
+        if not location:
+            return None
+        key = (location[0], fold(location[1]))
+        address = h.get("address", "")
+        rest = fold(address[len(location_prefix(address)):]).replace(" ", "")
+        roads = self.roads.get(key, {})
+        for n in range(min(len(rest), self.max_road), 1, -1):
+            if rest[:n] in roads:
+                return (*roads[rest[:n]], "road")
+        if key in self.districts:
+            return (*self.districts[key], "district")
+        if location[0] in self.cities:
+            return (*self.cities[location[0]], "city")
+        return None
+
+
+# ─── Geometry ────────────────────────────────────────────────────────────────
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_KM * math.asin(math.sqrt(a))
+
+
+def cell_of(lat: float, lon: float) -> tuple[int, int]:
+    return math.floor(lat / CELL_DEG), math.floor(lon / CELL_DEG)
+
+
+def beyond_ring_km(lat: float, cell: float, r: int) -> float:
+    """Lower bound on the distance from a query at `lat` to any point outside rings 0..r-1.
+
+    Such a point is at least r-1 cells away in latitude or in longitude. A
+    longitude gap is shortest on the most poleward parallel it can lie on,
+    r cells from the query, so the bound holds at any latitude.
+    """
+    if r <= 1:
+        return 0.0
+    gap = math.radians((r - 1) * cell)
+    pole = math.radians(min(90.0, abs(lat) + r * cell))
+    return 2 * EARTH_KM * math.asin(min(1.0, math.cos(pole) * math.sin(gap / 2)))
+
+
+# ─── Spatial index ───────────────────────────────────────────────────────────
+def build_spatial_index(hospitals: list[dict]) -> dict:
+    ids, lats, lons, cells = [], [], [], {}
+    for h in hospitals:
+        if "lat" not in h:
+            continue
+        row = len(ids)
+        ids.append(h["id"])
+        lats.append(h["lat"])
+        lons.append(h["lon"])
+        i, j = cell_of(h["lat"], h["lon"])
+        cells.setdefault(f"{i},{j}", []).append(row)
+    return {"v": FORMAT_VERSION, "cell": CELL_DEG, "ids": ids, "lat": lats, "lon": lons, "cells": cells}
+
+
+class _Grid:
+    """Occupied cells → rows, plus the cell-coordinate bounds."""
+
+    def __init__(self, cells: dict[tuple[int, int], list[int]]):
+        self.cells = cells
+        if cells:
+            self.bounds = (min(i for i, _ in cells), max(i for i, _ in cells),
+                           min(j for _, j in cells), max(j for _, j in cells))
+
+    def max_ring(self, ci: int, cj: int) -> int:
+        """Ring beyond which no occupied cell exists, seen from (ci, cj)."""
+        if not self.cells:
+            return -1
+        imin, imax, jmin, jmax = self.bounds
+        return max(abs(ci - imin), abs(ci - imax), abs(cj - jmin), abs(cj - jmax))
+
+    def ring(self, ci: int, cj: int, r: int):
+        """Rows in the square ring of cells at Chebyshev distance r."""
+        if r == 0:
+            yield from self.cells.get((ci, cj), [])
+            return
+        for di in range(-r, r + 1):
+            for dj in (-r, r) if abs(di) != r else range(-r, r + 1):
+                yield from self.cells.get((ci + di, cj + dj), [])
+
+
+class SpatialIndex:
+    def __init__(self, index: dict, hospitals: list[dict]):
+        if index["v"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported spatial index version {index['v']}")
+        self.cell = index["cell"]
+        self.ids = index["ids"]
+        self.lat = index["lat"]
+        self.lon = index["lon"]
+        self.grid = _Grid({tuple(map(int, k.split(","))): rows for k, rows in index["cells"].items()})
+        by_id = {h["id"]: h for h in hospitals}
+        self.services = [by_id.get(hid, {}).get("services", []) for hid in self.ids]
+        self._service_grids: dict[str, _Grid] = {}
+
+    @classmethod
+    def load(cls, path: Path = SPATIAL_JSON, hospitals_path: Path = HOSPITALS_JSON) -> "SpatialIndex":
+        with open(path, encoding="utf-8") as f:
+            index = json.load(f)
+        with open(hospitals_path, encoding="utf-8") as f:
+            hospitals = json.load(f)
+        return cls(index, hospitals)
+
+    def _grid_for(self, service: str | None) -> _Grid:
+        """The full grid, or a (cached) grid holding only rows tagged `service`."""
+        if not service:
+            return self.grid
+        if service not in self._service_grids:
+            cells: dict[tuple[int, int], list[int]] = {}
+            for key, rows in self.grid.cells.items():
+                tagged = [row for row in rows if service in self.services[row]]
+                if tagged:
+                    cells[key] = tagged
+            self._service_grids[service] = _Grid(cells)
+        return self._service_grids[service]
+
+    def nearest(self, lat: float, lon: float, n: int = 5, service: str | None = None) -> list[tuple[str, float]]:
+        """The n closest (id, km) pairs, optionally only hospitals tagged `service`."""
+        grid = self._grid_for(service)
+        ci, cj = cell_of(lat, lon)
+        best: list[tuple[float, int]] = []   # max-heap of (-km, row)
+        for r in range(grid.max_ring(ci, cj) + 1):
+            if len(best) == n and beyond_ring_km(lat, self.cell, r) > -best[0][0]:
+                break
+            for row in grid.ring(ci, cj, r):
+                d = haversine_km(lat, lon, self.lat[row], self.lon[row])
+                if len(best) < n:
+                    heapq.heappush(best, (-d, row))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, row))
+        return [(self.ids[row], -neg) for neg, row in sorted(best, reverse=True)]
+
+    def within(self, lat: float, lon: float, km: float, service: str | None = None) -> list[tuple[str, float]]:
+        """All (id, km) pairs within `km`, closest first."""
+        grid = self._grid_for(service)
+        ci, cj = cell_of(lat, lon)
+        hits = []
+        for r in range(grid.max_ring(ci, cj) + 1):
+            if beyond_ring_km(lat, self.cell, r) > km:
+                break
+            for row in grid.ring(ci, cj, r):
+                d = haversine_km(lat, lon, self.lat[row], self.lon[row])
+                if d <= km:
+                    hits.append((d, row))
+        return [(self.ids[row], d) for d, row in sorted(hits)]
+
+
+# ─── Stages ──────────────────────────────────────────────────────────────────
+def apply_geocodes(hospitals: list[dict], gazetteer: Gazetteer) -> None:
+    """Set (or clear) lat/lon/geoPrecision on every entry in place."""
+    precision = {"road": 0, "district": 0, "city": 0, "none": 0}
+    for h in hospitals:
+        hit = gazetteer.locate(h)
+        if not hit:
+            precision["none"] += 1
+            for key in GEO_FIELDS:
+                h.pop(key, None)
+            continue
+        lat, lon, level = hit
+        h["lat"], h["lon"], h["geoPrecision"] = round(lat, 6), round(lon, 6), level
+        precision[level] += 1
+    print("Geocoded:", "  ".join(f"{k}={v}" for k, v in precision.items()))
+
+
+def write_spatial_index(hospitals: list[dict], path: Path = SPATIAL_JSON) -> None:
+    index = build_spatial_index(hospitals)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Wrote {path} ({len(index['ids'])} points, {len(index['cells'])} cells)")
+
+
+def geocode(gazetteer_path: Path) -> None:
+    with open(HOSPITALS_JSON, encoding="utf-8") as f:
+        hospitals = json.load(f)
+    apply_geocodes(hospitals, Gazetteer(gazetteer_path))
+    if write_dataset(hospitals, HOSPITALS_JSON):
+        write_compact(hospitals)
+    write_spatial_index(hospitals)
+
+
+def benchmark(index: SpatialIndex, queries: int = 20000) -> None:
+    rng = random.Random(0)
+    points = [(rng.uniform(22.0, 25.3), rng.uniform(120.1, 121.9)) for _ in range(queries)]
+    for label, fn in [
+        ("nearest(n=5)", lambda p: index.nearest(*p, n=5)),
+        ("nearest(n=5, 住院)", lambda p: index.nearest(*p, n=5, service="住院")),
+        ("within(5 km)", lambda p: index.within(*p, 5.0)),
+    ]:
+        timings = []
+        for p in points:
+            start = time.perf_counter()
+            fn(p)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        mean = sum(timings) / len(timings)
+        print(f"  {label:<20} mean {mean * 1e6:7.1f} µs   p99 {timings[int(len(timings) * 0.99)] * 1e6:7.1f} µs")
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    parser = argparse.ArgumentParser(description="Offline geocoding and nearest-hospital queries")
+    parser.add_argument("--gazetteer", type=Path, default=None, help=f"geocode against this CSV (e.g. {GAZETTEER_CSV})")
+    parser.add_argument("--near", default=None, help="query point as LAT,LON")
+    parser.add_argument("--n", type=int, default=5)
+    parser.add_argument("--km", type=float, default=None, help="radius query instead of n-nearest")
+    parser.add_argument("--service", default=None, help="only hospitals with this services tag (e.g. 急診)")
+    parser.add_argument("--bench", action="store_true")
+    args = parser.parse_args()
+
+    if args.gazetteer:
+        geocode(args.gazetteer)
+    if not (args.near or args.bench):
+        return
+
+    index = SpatialIndex.load(SPATIAL_JSON, HOSPITALS_JSON)
+    if args.bench:
+        print(f"Benchmark over {len(index.ids)} points:")
+        benchmark(index)
+    if args.near:
+        lat, lon = map(float, args.near.split(","))
+        if args.km is not None:
+            hits = index.within(lat, lon, args.km, args.service)
+        else:
+            hits = index.nearest(lat, lon, args.n, args.service)
+        with open(HOSPITALS_JSON, encoding="utf-8") as f:
+            names = {h["id"]: h["name"] for h in json.load(f)}
+        for hid, km in hits:
+            print(f"  {km:6.2f} km  {names.get(hid, hid)}")
+
+
+if __name__ == "__main__":
+    main()
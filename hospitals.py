@@ -1,15 +1,15 @@
-import pandas as pd
 import json
 import requests
 from urllib.parse import quote
 from bs4 import BeautifulSoup
 
+from registry_readers import find_source, read_records
+
 # --- 載入開放資料檔案 --- #
-file_path = "醫療機構與人員基本資料_20241231.ods"
-df = pd.read_excel(file_path, engine="odf")
+file_path = find_source("醫療機構與人員基本資料_20241231")
 
-# 篩選醫院
-hospital_df = df[df["醫療機構類別"].str.contains("醫院")]
+# 篩選醫院（逐列串流讀取，不載入整張表）
+hospital_rows = (row for row in read_records(file_path) if "醫院" in row.get("醫療機構類別", ""))
 
 def find_official_site(name):
     query = quote(name + " 官方網站")
@@ -34,7 +34,7 @@ def find_registration_url(site_url):
 
 hospitals = []
 
-for _, row in hospital_df.iterrows():
+for row in hospital_rows:
     name = row["醫療機構名稱"]
     address = row["機構地址"]
     phone = row["機構電話"]
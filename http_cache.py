@@ -0,0 +1,220 @@
+"""
+On-disk HTTP response cache for the crawler (see crawl_client.py).
+
+Entries are keyed by sha256(method, URL, sorted params) and hold the final
+URL, status, headers, redirect chain, ETag / Last-Modified and a pointer to
+the body. Bodies are stored content-addressed under `bodies/`, so identical
+pages fetched through different URLs are kept once. Metadata lives in one
+SQLite file (WAL mode, safe to share between the crawler's threads and
+between --workers processes; the disk budget is re-read from the shared
+index every RESYNC_EVERY puts, and whenever this process's running total
+gets within RESYNC_MARGIN of it, so it holds for all of them together).
+  fresh (younger than the TTL)  → served without touching the network
+  stale                         → revalidated with If-None-Match / If-Modified-Since;
+                                  a 304 refreshes the entry and serves the stored body
+  over the disk budget          → least recently used entries are evicted
+Usage:
+    cache = HttpCache(Path(".http_cache"), ttl=7 * 86400, max_bytes=512 << 20)
+    key = key_for("GET", url, params)
+    entry = cache.get(key)              # CacheEntry (fresh or stale) or None
+    if entry and cache.is_fresh(entry):
+        body = cache.read_body(entry)
+    cache.put(key, url, final_url, status, headers, history, encoding, content)
+CrawlClient does all of this; pass it `cache=HttpCache(...)`.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlencode
+
+DEFAULT_DIR = Path(".http_cache")
+DEFAULT_TTL = 7 * 86400            # seconds
+DEFAULT_MAX_BYTES = 512 << 20
+RESYNC_EVERY = 64                  # puts between re-reads of the shared byte total
+RESYNC_MARGIN = 0.9                # ...or sooner, once the local total passes this share of max_bytes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    final_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    history TEXT NOT NULL,
+    encoding TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_body ON entries (body, size);
+"""
+
+
+def key_for(method: str, url: str, params: dict | None = None) -> str:
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(f"{method.upper()} {url} {query}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    url: str
+    final_url: str
+    status: int
+    headers: dict[str, str]
+    history: list[str]
+    encoding: str | None
+    etag: str | None
+    last_modified: str | None
+    body: str                  # sha256 of the content
+    fetched_at: float
+
+    def age(self, now: float | None = None) -> float:
+        return (now or time.time()) - self.fetched_at
+
+    def validators(self) -> dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    def __init__(self, root: Path = DEFAULT_DIR, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        (self.root / "bodies").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "index.sqlite", timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._bytes = self._stored_bytes()
+        self._unsynced = 0                               # puts since _bytes was last read from the index
+        self.hits = self.revalidated = self.misses = 0   # counted by CrawlClient
+
+    # ─── Bodies ──────────────────────────────────────────────────────────────
+    def _body_path(self, digest: str) -> Path:
+        return self.root / "bodies" / digest[:2] / digest
+
+    def read_body(self, entry: CacheEntry) -> bytes:
+        return self._body_path(entry.body).read_bytes()
+
+    def _write_body(self, digest: str, content: bytes) -> None:
+        path = self._body_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            # thread ids repeat across the --workers processes sharing this directory
+            tmp = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(content)
+            tmp.replace(path)
+
+    def _release_body(self, digest: str, size: int) -> None:
+        """Delete a body no entry points to any more (caller holds the lock)."""
+        if not self._db.execute("SELECT 1 FROM entries WHERE body = ? LIMIT 1", (digest,)).fetchone():
+            self._body_path(digest).unlink(missing_ok=True)
+            self._bytes -= size
+
+    # ─── Entries ─────────────────────────────────────────────────────────────
+    def get(self, key: str) -> CacheEntry | None:
+        """The stored entry (fresh or not), or None; marks it as recently used."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, url, final_url, status, headers, history, encoding, etag, last_modified, body, fetched_at "
+                "FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        entry = CacheEntry(*row[:4], json.loads(row[4]), json.loads(row[5]), *row[6:])
+        if not self._body_path(entry.body).exists():
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def put(self, key: str, url: str, final_url: str, status: int, headers: dict[str, str],
+            history: list[str], encoding: str | None, content: bytes) -> CacheEntry:
+        digest = hashlib.sha256(content).hexdigest()
+        now = time.time()
+        lower = {k.lower(): v for k, v in headers.items()}
+        entry = CacheEntry(key, url, final_url, status, headers, history, encoding,
+                           lower.get("etag"), lower.get("last-modified"), digest, now)
+        with self._lock:
+            self._write_body(digest, content)
+            old = self._db.execute("SELECT body, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if not self._db.execute("SELECT 1 FROM entries WHERE body = ? LIMIT 1", (digest,)).fetchone():
+                self._bytes += len(content)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, final_url, status, json.dumps(headers, ensure_ascii=False),
+                 json.dumps(history), encoding, entry.etag, entry.last_modified, digest,
+                 len(content), now, now))
+            if old and old[0] != digest:
+                self._release_body(*old)
+            self._unsynced += 1
+            due = self._unsynced >= RESYNC_EVERY or self._bytes > self.max_bytes * RESYNC_MARGIN
+        if due:
+            self.evict()
+        return entry
+
+    def touch(self, entry: CacheEntry) -> None:
+        """Mark a revalidated (304) entry as fetched now."""
+        entry.fetched_at = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                             (entry.fetched_at, entry.fetched_at, entry.key))
+
+    # ─── Eviction ────────────────────────────────────────────────────────────
+    def _stored_bytes(self) -> int:
+        return self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY body)"
+        ).fetchone()[0]
+
+    def size(self) -> int:
+        """Bytes of distinct bodies still referenced."""
+        return self._bytes
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the bodies fit max_bytes; returns entries removed.
+
+        put() calls this only every RESYNC_EVERY puts or near the budget, since
+        re-reading the shared total scans the whole index.
+        """
+        removed = 0
+        with self._lock:
+            self._bytes = self._stored_bytes()     # other processes sharing the directory add bodies too
+            self._unsynced = 0
+            if self._bytes <= self.max_bytes:
+                return 0
+            rows = self._db.execute("SELECT key, body, size FROM entries ORDER BY accessed_at").fetchall()
+            for key, body, size in rows:
+                if self._bytes <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._release_body(body, size)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": entries, "bytes": self.size(), "hits": self.hits,
+                "revalidated": self.revalidated, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,143 @@
+"""
+Local index of the hospitals.tw directory (slug → display name).
+
+Instead of one or two live `?s=` searches per hospital, the listing pages
+(https://hospitals.tw/, /page/2/, …) are crawled once and every hospital
+page link on them is kept with its anchor text, cleaned down to the
+facility name. Matching then runs locally on a NameIndex (legal-entity
+prefixes stripped, 臺/台 and width folded, bigram scoring), for both the
+full and the short name, and returns ranked candidates rather than the
+first link that happens to mention 門診.
+The crawled directory is saved as a snapshot (DIRECTORY_JSON) and reused,
+so matching can be rerun or tested offline against a fixed file.
+Usage:
+    directory = await load_or_crawl(client, DIRECTORY_JSON, refresh=False)
+    directory.candidates("長庚醫療財團法人台北長庚紀念醫院", "台北長庚紀念醫院")
+    # → [({"url": "https://hospitals.tw/cgmh-taipei/", "name": "台北長庚紀念醫院"}, 1.0), ...]
+
+Snapshot format (version 1):
+  {"v": 1, "fetched": <ISO time>, "pages": <listing pages read>,
+   "entries": [{"url": ..., "name": ...}, ...]}
+"""
+import json
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+from link_extractor import iter_anchors
+from name_index import MATCH_THRESHOLD, NameIndex
+
+DIRECTORY_JSON = Path("hw_directory.json")
+FORMAT_VERSION = 1
+HOME_URL = "https://hospitals.tw/"
+LISTING_URL = "https://hospitals.tw/page/{n}/"
+MAX_PAGES = 60
+
+# hospitals.tw 需跳過的路徑（非醫院頁面）
+SKIP_PATHS = [
+    "/page/", "/doctor/", "/emergency/", "/progress/", "/register/",
+    "/about", "/terms", "/privacy", "/symptom", "/clinic", "/animal",
+    "chinese-new-year", "holiday-", "-holiday", "er/", "twedr.com", "#",
+]
+
+# Anchor texts read like "臺安醫院門診時間、看診進度" — the name ends where these start
+NAME_END_RE = re.compile(r"(門診|掛號|看診|[|｜]|\s-\s)")
+
+
+def is_hospital_page(href: str) -> bool:
+    """A hospitals.tw link with a slug that is not one of the site's own pages."""
+    if "hospitals.tw/" not in href or any(bad in href for bad in SKIP_PATHS):
+        return False
+    return bool(urlparse(href).path.strip("/"))     # not the home page itself
+
+
+def clean_name(text: str) -> str:
+    return NAME_END_RE.split(text, 1)[0].strip()
+
+
+# ─── Crawl ───────────────────────────────────────────────────────────────────
+def entries_from_listing(content: bytes, encoding: str | None) -> list[dict]:
+    entries = []
+    for href, text in iter_anchors(content, encoding):
+        name = clean_name(text)
+        if name and is_hospital_page(href):
+            entries.append({"url": href, "name": name})
+    return entries
+
+
+async def crawl_directory(client, max_pages: int = MAX_PAGES) -> dict:
+    """Read listing pages until one adds nothing new, errors out, or max_pages is reached."""
+    by_url: dict[str, dict] = {}
+    pages = 0
+    for n in range(1, max_pages + 1):
+        url = HOME_URL if n == 1 else LISTING_URL.format(n=n)
+        try:
+            resp = await client.get(url, phase="directory")
+        except Exception as e:
+            print(f"  [目錄] {url}: {e}")
+            break
+        pages += 1
+        if resp.status != 200:
+            break
+        new = 0
+        for entry in entries_from_listing(resp.content, resp.encoding):
+            if entry["url"] not in by_url:
+                by_url[entry["url"]] = entry
+                new += 1
+        if n > 1 and not new:
+            break
+    return {
+        "v": FORMAT_VERSION,
+        "fetched": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "pages": pages,
+        "entries": list(by_url.values()),
+    }
+
+
+def save_snapshot(snapshot: dict, path: Path = DIRECTORY_JSON) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+
+
+def load_snapshot(path: Path = DIRECTORY_JSON) -> dict:
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if snapshot.get("v") != FORMAT_VERSION:
+        raise ValueError(f"unsupported directory snapshot version {snapshot.get('v')}")
+    return snapshot
+
+
+# ─── Match ───────────────────────────────────────────────────────────────────
+class Directory:
+    def __init__(self, snapshot: dict):
+        self.snapshot = snapshot
+        self.index = NameIndex(snapshot["entries"])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def candidates(self, full_name: str, short_name: str, limit: int = 5) -> list[tuple[dict, float]]:
+        """Ranked (entry, score) over both names; an entry keeps its better score."""
+        best: dict[str, tuple[dict, float]] = {}
+        for query in dict.fromkeys((full_name, short_name)):
+            for entry, score in self.index.search(query, limit):
+                if entry["url"] not in best or score > best[entry["url"]][1]:
+                    best[entry["url"]] = (entry, score)
+        return sorted(best.values(), key=lambda c: -c[1])[:limit]
+
+    def best(self, full_name: str, short_name: str, threshold: float = MATCH_THRESHOLD) -> tuple[dict, float] | None:
+        ranked = self.candidates(full_name, short_name, limit=1)
+        return ranked[0] if ranked and ranked[0][1] >= threshold else None
+
+
+async def load_or_crawl(client, path: Path = DIRECTORY_JSON, refresh: bool = False) -> Directory:
+    """The saved snapshot, or a fresh crawl (saved to `path`) when missing or `refresh`."""
+    if path.exists() and not refresh:
+        snapshot = load_snapshot(path)
+        print(f"hospitals.tw 目錄：{len(snapshot['entries'])} 筆（{path}，{snapshot['fetched']}）")
+    else:
+        snapshot = await crawl_directory(client)
+        save_snapshot(snapshot, path)
+        print(f"hospitals.tw 目錄：讀取 {snapshot['pages']} 頁，{len(snapshot['entries'])} 筆 → {path}")
+    return Directory(snapshot)
@@ -0,0 +1,178 @@
+"""
+Liveness and redirect check for the website / appointmentUrl links in hospitals.json.
+
+Every distinct URL is requested once through CrawlClient (global and
+per-host limits, no response cache): HEAD first, following redirects, and a
+streamed GET when the server refuses or mishandles HEAD. For each URL the
+status, latency, error type and full redirect chain are recorded, and a
+canonical target is derived:
+  redirected to a live page   → the final URL (websites keep only the root)
+  live on plain http://       → the https:// form, if that answers as well
+  4xx / 5xx / connection error → flagged dead, never rewritten
+Results are written to a sidecar file (LINK_CHECK_JSON) keyed by hospital id,
+which `find_hospital_urls.py --merge` reads to rewrite links and list dead ones.
+Usage:
+    results = await check_links(client, hospitals)
+    save_results(results)
+    rewritten, dead = apply_link_checks(hospitals, load_results())
+
+Sidecar format (version 1):
+  {"v": 1, "checked": <ISO time>,
+   "links": {id: {"website": {url, status, finalUrl, chain: [[url, status], ...],
+                               latencyMs, error, method, alive, canonical}, ...}}}
+"""
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+LINK_CHECK_JSON = Path("link_check.json")
+FORMAT_VERSION = 1
+LINK_FIELDS = ("website", "appointmentUrl")
+HEAD_FALLBACK = {403, 404, 405, 406, 429, 500, 501, 503}   # statuses some servers only return for HEAD
+
+
+@dataclass
+class LinkCheck:
+    url: str
+    status: int | None = None
+    finalUrl: str = ""
+    chain: list[tuple[str, int]] = field(default_factory=list)   # every hop, final response last
+    latencyMs: int = 0
+    error: str | None = None
+    method: str = "HEAD"
+    alive: bool = False
+    canonical: str = ""        # rewrite target, "" when the link should stay as it is
+
+
+def _root(url: str) -> str:
+    p = urlparse(url)
+    return f"{p.scheme}://{p.netloc}/"
+
+
+def _request(session: requests.Session, method: str, url: str, timeout: float) -> requests.Response:
+    resp = session.request(method, url, timeout=timeout, allow_redirects=True, stream=method == "GET")
+    resp.close()    # status and headers are enough; never download the body
+    return resp
+
+
+def check_link(session: requests.Session, url: str, field_name: str, timeout: float) -> LinkCheck:
+    """Blocking check of one URL (run by CrawlClient.call on its thread pool)."""
+    result = LinkCheck(url)
+    start = time.perf_counter()
+    resp = None
+    for method in ("HEAD", "GET"):
+        result.method = method
+        try:
+            resp = _request(session, method, url, timeout)
+            result.error = None
+        except requests.RequestException as e:
+            resp, result.error = None, type(e).__name__
+        if resp is not None and resp.status_code not in HEAD_FALLBACK:
+            break
+    result.latencyMs = round((time.perf_counter() - start) * 1000)
+    if resp is None:
+        return result
+
+    result.status = resp.status_code
+    result.finalUrl = resp.url
+    result.chain = [(r.url, r.status_code) for r in resp.history] + [(resp.url, resp.status_code)]
+    result.alive = resp.status_code < 400
+    if not result.alive:
+        return result
+
+    target = resp.url
+    if target.startswith("http://"):
+        secure = "https://" + target[len("http://"):]
+        try:
+            upgraded = _request(session, "HEAD", secure, timeout)
+            if upgraded.status_code < 400 and upgraded.url.startswith("https://"):
+                target = upgraded.url
+        except requests.RequestException:
+            pass
+    if field_name == "website":
+        target = _root(target)
+        unchanged = _root(url) == target
+    else:
+        unchanged = url == target
+    result.canonical = "" if unchanged else target
+    return result
+
+
+async def check_links(client, hospitals: list[dict], fields: tuple[str, ...] = LINK_FIELDS) -> dict:
+    """Check every distinct (field, URL) once; returns the sidecar document."""
+    wanted: dict[tuple[str, str], list[str]] = {}
+    for h in hospitals:
+        for name in fields:
+            if h.get(name):
+                wanted.setdefault((name, h[name]), []).append(h["id"])
+    done = 0
+
+    async def run(name: str, url: str) -> LinkCheck:
+        nonlocal done
+        result = await client.call(url, check_link, url, name, client.timeout, phase="check")
+        done += 1
+        mark = "OK " if result.alive else "DEAD"
+        print(f"[{done}/{len(wanted)}] {mark} {result.status or result.error} "
+              f"{result.latencyMs}ms {url}" + (f" → {result.canonical}" if result.canonical else ""))
+        return result
+
+    results = await asyncio.gather(*(run(name, url) for name, url in wanted))
+    links: dict[str, dict] = {}
+    for (name, url), result in zip(wanted, results):
+        for hid in wanted[(name, url)]:
+            links.setdefault(hid, {})[name] = asdict(result)
+    return {
+        "v": FORMAT_VERSION,
+        "checked": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "links": links,
+    }
+
+
+def summarize(doc: dict) -> dict[str, int]:
+    counts = {"checked": 0, "alive": 0, "dead": 0, "redirected": 0, "rewrite": 0}
+    for record in doc["links"].values():
+        for check in record.values():
+            counts["checked"] += 1
+            counts["alive" if check["alive"] else "dead"] += 1
+            counts["redirected"] += len(check["chain"]) > 1
+            counts["rewrite"] += bool(check["canonical"])
+    return counts
+
+
+def save_results(doc: dict, path: Path = LINK_CHECK_JSON) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: Path = LINK_CHECK_JSON) -> dict:
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    if doc.get("v") != FORMAT_VERSION:
+        raise ValueError(f"unsupported link check version {doc.get('v')}")
+    return doc
+
+
+def apply_link_checks(hospitals: list[dict], doc: dict) -> tuple[int, list[tuple[str, str, str]]]:
+    """Rewrite links to their canonical targets; returns (rewritten, [(id, field, url) of dead links]).
+
+    A check only applies while the hospital still carries the URL that was checked.
+    """
+    rewritten = 0
+    dead = []
+    for h in hospitals:
+        record = doc["links"].get(h["id"], {})
+        for name, check in record.items():
+            if h.get(name) != check["url"]:
+                continue
+            if not check["alive"]:
+                dead.append((h["id"], name, check["url"]))
+            elif check["canonical"]:
+                h[name] = check["canonical"]
+                rewritten += 1
+    return rewritten, dead
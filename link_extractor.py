@@ -0,0 +1,85 @@
+"""
+Incremental <a href> extractor for the crawler.
+
+The body is decoded and fed to html.parser.HTMLParser CHUNK_BYTES at a
+time, and every anchor is yielded as soon as its </a> (or the next <a>)
+is seen, so a caller that stops iterating stops the parse: the rest of a
+multi-MB homepage is never decoded, tokenised or turned into a tree.
+Text matches BeautifulSoup's `a.get_text(strip=True)`: each text run inside
+the anchor is stripped and the runs are concatenated.
+Usage:
+    for href, text in iter_anchors(resp.content, resp.encoding):
+        if "官方網站" in text:
+            break
+"""
+import codecs
+from html.parser import HTMLParser
+from typing import Iterator
+
+CHUNK_BYTES = 16 << 10
+
+
+class _AnchorParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found: list[tuple[str, str]] = []
+        self._href: str | None = None
+        self._runs: list[str] = []
+        self._buf: list[str] = []
+
+    def _flush_run(self) -> None:
+        if self._buf:
+            self._runs.append("".join(self._buf).strip())
+            self._buf = []
+
+    def _close_anchor(self) -> None:
+        self._flush_run()
+        self.found.append((self._href, "".join(self._runs)))
+        self._href = None
+        self._runs = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._href is not None:
+            if tag == "a":
+                self._close_anchor()     # <a> cannot nest; the open one ends here
+            else:
+                self._flush_run()
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href is not None:
+                self._href = href
+
+    def handle_endtag(self, tag):
+        if self._href is None:
+            return
+        if tag == "a":
+            self._close_anchor()
+        else:
+            self._flush_run()
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._buf.append(data)
+
+    def finish(self) -> None:
+        self.close()
+        if self._href is not None:
+            self._close_anchor()
+
+
+def iter_anchors(content: bytes, encoding: str | None = None) -> Iterator[tuple[str, str]]:
+    """Yield (href, text) for every <a> with an href attribute, in document order."""
+    try:
+        decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = _AnchorParser()
+    view = memoryview(content)
+    for start in range(0, len(content), CHUNK_BYTES):
+        parser.feed(decoder.decode(view[start:start + CHUNK_BYTES]))
+        if parser.found:
+            yield from parser.found
+            parser.found = []
+    parser.feed(decoder.decode(b"", final=True))
+    parser.finish()
+    yield from parser.found
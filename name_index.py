@@ -0,0 +1,120 @@
+"""
+Character-bigram index for fuzzy hospital-name matching.
+
+Built once per run over the existing dataset so that joining a large
+facility list against it does not need a scan per record. A match must be
+in the same city when both sides know theirs, and names only count as the
+same facility when they are equal after legal-entity prefixes are
+stripped or their bigram Dice score reaches MATCH_THRESHOLD; a name that
+merely contains another (a branch, "…新竹附設醫院") is a different facility.
+Usage:
+    index = NameIndex(existing_list)
+    hit = index.best_match("臺北市立聯合醫院中興院區", city="臺北市")   # → (entry, score) | None
+"""
+import re
+import unicodedata
+from collections import Counter
+
+# ─── Normalization ───────────────────────────────────────────────────────────
+# Legal-entity and ownership prefixes that vary between releases of the same
+# facility name ("衛生福利部臺北醫院" vs "臺北醫院"). City prefixes such as
+# 臺北市立 are not among them: they tell 臺北市立聯合醫院 from 高雄市立聯合醫院.
+LEGAL_PREFIX_RES = [
+    re.compile(r"^[\u4e00-\u9fff\w]{0,15}醫療財團法人"),
+    re.compile(r"^[\u4e00-\u9fff\w]{0,10}財團法人"),
+    re.compile(r"^[\u4e00-\u9fff\w]{0,10}社團法人"),
+    re.compile(r"^衛生福利部"),
+]
+
+CHAR_FOLD = str.maketrans({"臺": "台"})
+
+
+def fold(text: str) -> str:
+    """Fold full-width forms to half-width, 臺 to 台, and lowercase."""
+    return unicodedata.normalize("NFKC", text).translate(CHAR_FOLD).lower()
+
+
+def normalize_name(name: str) -> str:
+    """Fold a facility name and strip legal-entity prefixes."""
+    key = fold(name).replace(" ", "")
+    for pattern in LEGAL_PREFIX_RES:
+        key = pattern.sub("", key)
+    return key or fold(name)
+
+
+def bigrams(text: str) -> set[str]:
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+# ─── Index ───────────────────────────────────────────────────────────────────
+MATCH_THRESHOLD = 0.9    # minimum score; one changed character in a short name stays below it
+CANDIDATE_LIMIT = 16     # candidates scored exactly per query
+STOP_GRAM_RATIO = 0.05   # bigrams in more than 5% of names ("醫院") are not used for lookup
+
+
+class NameIndex:
+    def __init__(self, entries: list[dict], key: str = "name", city_key: str = "city"):
+        self.entries = entries
+        self.exact: dict[str, list[int]] = {}
+        self.keys: list[str] = []
+        self.cities: list[str] = []          # folded; "" when the entry has none
+        self.grams: list[set[str]] = []
+        self.postings: dict[str, list[int]] = {}
+
+        for i, entry in enumerate(entries):
+            name = entry[key]
+            self.exact.setdefault(name, []).append(i)
+            self.cities.append(fold(entry.get(city_key) or ""))
+            norm = normalize_name(name)
+            grams = bigrams(norm)
+            self.keys.append(norm)
+            self.grams.append(grams)
+            for g in grams:
+                self.postings.setdefault(g, []).append(i)
+
+        self.stop_df = max(8, int(len(entries) * STOP_GRAM_RATIO))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _same_city(self, i: int, city: str) -> bool:
+        """`city` is folded; entries or queries without a city match any."""
+        return not city or not self.cities[i] or self.cities[i] == city
+
+    def _candidates(self, grams: set[str], city: str = "") -> list[int]:
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        selective = [p for p in lists if len(p) <= self.stop_df]
+        hits: Counter = Counter()
+        for postings in (selective or lists):
+            hits.update(postings)
+        ranked = (i for i, _ in hits.most_common() if self._same_city(i, city))
+        return [i for i, _ in zip(ranked, range(CANDIDATE_LIMIT))]
+
+    def score(self, i: int, norm: str, grams: set[str]) -> float:
+        """1.0 when the names differ only by legal-entity prefixes, otherwise the bigram Dice coefficient."""
+        if norm == self.keys[i]:
+            return 1.0
+        shared = len(grams & self.grams[i])
+        return 2 * shared / (len(grams) + len(self.grams[i]))
+
+    def search(self, name: str, limit: int = 5, city: str | None = None) -> list[tuple[dict, float]]:
+        """Ranked (entry, score) candidates for `name` (in `city`, when given), best first."""
+        norm = normalize_name(name)
+        grams = bigrams(norm)
+        scored = [(self.score(i, norm, grams), i) for i in self._candidates(grams, fold(city or ""))]
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [(self.entries[i], sc) for sc, i in scored[:limit]]
+
+    def best_match(self, name: str, threshold: float = MATCH_THRESHOLD,
+                   city: str | None = None) -> tuple[dict, float] | None:
+        """Exact name hit, else the highest-scoring candidate above `threshold`; both in `city` when given."""
+        folded_city = fold(city or "")
+        for i in self.exact.get(name, []):
+            if self._same_city(i, folded_city):
+                return self.entries[i], 1.0
+        ranked = self.search(name, limit=1, city=city)
+        if ranked and ranked[0][1] >= threshold:
+            return ranked[0]
+        return None
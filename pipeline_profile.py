@@ -0,0 +1,305 @@
+"""
+Per-stage timing for the data pipeline scripts (enabled with --profile).
+
+Each named stage records wall time, self time (wall minus nested stages),
+CPU time and item throughput; with --profile-memory also the tracemalloc
+peak above what was live when the stage started (tracemalloc slows the run
+several times over, so it is opt-in). Stages nest; generators and file
+reads that interleave with other work are timed only while they run, via
+iterate() / reader().
+Usage in a script:
+    from pipeline_profile import PROFILE, add_profile_arguments
+    add_profile_arguments(parser, "convert_profile.json")
+    PROFILE.configure(args)              # no-op unless --profile / --chrome-trace / --profile-memory
+    with PROFILE.stage("json.write", items=len(hospitals)):
+        ...
+    for rec in PROFILE.iterate("ods.parse", read_records(path)):
+        ...
+The trace is written at exit: a JSON summary plus, with --chrome-trace, a
+trace-event file for chrome://tracing or https://ui.perfetto.dev.
+Work done inside --workers processes is not traced; it shows up as the
+time the main process spends waiting in the enclosing stage.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+
+try:
+    import resource
+except ImportError:       # Windows
+    resource = None
+
+
+class _Frame:
+    __slots__ = ("name", "wall0", "cpu0", "base", "peak", "child", "items")
+
+    def __init__(self, name: str, items: int = 0):
+        self.name = name
+        self.items = items
+        self.child = 0.0
+
+
+class _Accumulator:
+    """Sums the timed slices of one iterate() / reader() into a single stage."""
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start: float | None = None
+        self.wall = self.self_wall = self.cpu = 0.0
+        self.peak = 0
+        self.items = 0
+        self.done = False
+
+    def add(self, frame: _Frame, wall: float, cpu: float, items: int) -> None:
+        if self.start is None:
+            self.start = frame.wall0
+        self.wall += wall
+        self.self_wall += wall - frame.child
+        self.cpu += cpu
+        self.peak = max(self.peak, frame.peak - frame.base)
+        self.items += items
+
+    def close(self) -> None:
+        if self.done or self.start is None:
+            return
+        self.done = True
+        self.profiler._record(self.name, self.start, self.wall, self.self_wall, self.cpu,
+                              self.peak, self.items, accumulated=True)
+
+
+class _TimedReader:
+    """File proxy whose read() calls are timed as one stage (items = bytes)."""
+
+    def __init__(self, profiler: "Profiler", name: str, raw):
+        self.profiler = profiler
+        self.raw = raw
+        self.acc = _Accumulator(profiler, name)
+
+    def read(self, size: int = -1) -> bytes:
+        frame = self.profiler._push(self.acc.name)
+        data = b""
+        try:
+            data = self.raw.read(size)
+        finally:
+            self.acc.add(frame, *self.profiler._pop(frame), len(data))
+        return data
+
+    def close(self) -> None:
+        self.acc.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.stats: dict[str, dict] = {}
+        self.events: list[dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lanes: dict[str, int] = {}
+        self._t0 = time.perf_counter()
+        self._started = ""
+        self._outputs: tuple[Path | None, Path | None] = (None, None)
+
+    # ─── Setup ───────────────────────────────────────────────────────────────
+    def enable(self, path: Path | None = None, chrome: Path | None = None, memory: bool = False) -> None:
+        """Start tracing; the trace is written to `path` / `chrome` at exit."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.memory = memory
+        self._t0 = time.perf_counter()
+        self._started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._outputs = (path, chrome)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        atexit.register(self.finish)
+
+    def configure(self, args) -> None:
+        """Enable from parsed add_profile_arguments() options."""
+        if args.profile or args.chrome_trace or args.profile_memory:
+            self.enable(args.profile or args.profile_default, args.chrome_trace, args.profile_memory)
+
+    # ─── Frames ──────────────────────────────────────────────────────────────
+    @property
+    def _stack(self) -> list[_Frame]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _fold_peak(self) -> None:
+        """Credit the tracemalloc peak since the last reset to every open frame."""
+        if not self.memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._stack:
+            if peak > frame.peak:
+                frame.peak = peak
+        tracemalloc.reset_peak()
+
+    def _push(self, name: str, items: int = 0) -> _Frame:
+        self._fold_peak()
+        frame = _Frame(name, items)
+        frame.base = frame.peak = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        self._stack.append(frame)
+        frame.cpu0 = time.process_time()
+        frame.wall0 = time.perf_counter()
+        return frame
+
+    def _pop(self, frame: _Frame) -> tuple[float, float]:
+        wall = time.perf_counter() - frame.wall0
+        cpu = time.process_time() - frame.cpu0
+        self._fold_peak()
+        stack = self._stack
+        stack.remove(frame)
+        if stack:
+            stack[-1].child += wall
+        return wall, cpu
+
+    def _record(self, name: str, start: float, wall: float, self_wall: float, cpu: float,
+                peak: int, items: int, accumulated: bool = False) -> None:
+        with self._lock:
+            s = self.stats.setdefault(name, {
+                "calls": 0, "wall_s": 0.0, "self_s": 0.0, "cpu_s": 0.0, "peak_mem_mb": 0.0, "items": 0,
+            })
+            s["calls"] += 1
+            s["wall_s"] += wall
+            s["self_s"] += self_wall
+            s["cpu_s"] += cpu
+            s["peak_mem_mb"] = max(s["peak_mem_mb"], peak / 1e6)
+            s["items"] += items
+            # Accumulated slices get a lane of their own so they don't break nesting
+            lane = f"{name} (accumulated)" if accumulated else threading.current_thread().name
+            tid = self._lanes.setdefault(lane, len(self._lanes) + 1)
+            self.events.append({
+                "name": name, "cat": "accumulated" if accumulated else "stage", "ph": "X",
+                "ts": round((start - self._t0) * 1e6, 1), "dur": round(wall * 1e6, 1),
+                "pid": os.getpid(), "tid": tid,
+                "args": {"items": items, "cpu_ms": round(cpu * 1e3, 3), "peak_mb": round(peak / 1e6, 3)},
+            })
+
+    # ─── Instrumentation API ─────────────────────────────────────────────────
+    @contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[_Frame]:
+        """Time a block; set `.items` on the yielded frame if the count is known only at the end."""
+        if not self.enabled:
+            yield _Frame(name, items)
+            return
+        frame = self._push(name, items)
+        try:
+            yield frame
+        finally:
+            wall, cpu = self._pop(frame)
+            self._record(name, frame.wall0, wall, wall - frame.child, cpu,
+                         frame.peak - frame.base, frame.items)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield from `iterable`, timing only the time spent producing items."""
+        if not self.enabled:
+            return iter(iterable)
+        return self._iterate(name, iter(iterable))
+
+    def _iterate(self, name: str, it: Iterator) -> Iterator:
+        acc = _Accumulator(self, name)
+        try:
+            while True:
+                frame = self._push(name)
+                try:
+                    item = next(it)
+                except StopIteration:
+                    acc.add(frame, *self._pop(frame), 0)
+                    return
+                except BaseException:
+                    acc.add(frame, *self._pop(frame), 0)
+                    raise
+                acc.add(frame, *self._pop(frame), 1)
+                yield item
+        finally:
+            acc.close()
+
+    def reader(self, name: str, raw):
+        """Wrap a binary file so its read() calls are timed as `name`."""
+        return _TimedReader(self, name, raw) if self.enabled else raw
+
+    # ─── Output ──────────────────────────────────────────────────────────────
+    def summary(self) -> dict:
+        total = time.perf_counter() - self._t0
+        peak_rss = None
+        if resource is not None:
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak_rss = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        stages = []
+        for name, s in self.stats.items():
+            stages.append({
+                "name": name,
+                **{k: round(v, 4) if isinstance(v, float) else v for k, v in s.items()},
+                "peak_mem_mb": round(s["peak_mem_mb"], 3) if self.memory else None,
+                "items_per_s": round(s["items"] / s["wall_s"], 1) if s["items"] and s["wall_s"] else None,
+            })
+        return {
+            "script": Path(sys.argv[0]).name,
+            "argv": sys.argv[1:],
+            "started": self._started,
+            "wall_s": round(total, 4),
+            "peak_rss_mb": peak_rss,
+            "stages": stages,
+        }
+
+    def chrome_trace(self) -> dict:
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": lane}}
+            for lane, tid in self._lanes.items()
+        ]
+        return {"traceEvents": meta + self.events, "displayTimeUnit": "ms"}
+
+    def finish(self) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        path, chrome = self._outputs
+        summary = self.summary()
+        print(f"\nProfile ({summary['wall_s']:.2f} s total):")
+        print(f"  {'stage':<22}{'calls':>7}{'wall s':>9}{'self s':>9}{'cpu s':>9}{'peak MB':>9}{'items/s':>14}")
+        for s in summary["stages"]:
+            rate = f"{s['items_per_s']:,.0f}" if s["items_per_s"] else "-"
+            peak = f"{s['peak_mem_mb']:.1f}" if self.memory else "-"
+            print(f"  {s['name']:<22}{s['calls']:>7}{s['wall_s']:>9.3f}{s['self_s']:>9.3f}"
+                  f"{s['cpu_s']:>9.3f}{peak:>9}{rate:>14}")
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            print(f"  → {path}")
+        if chrome:
+            with open(chrome, "w", encoding="utf-8") as f:
+                json.dump(self.chrome_trace(), f, ensure_ascii=False)
+            print(f"  → {chrome} (chrome://tracing)")
+
+
+PROFILE = Profiler()
+
+
+def add_profile_arguments(parser, default_path: str) -> None:
+    parser.add_argument("--profile", nargs="?", type=Path, const=Path(default_path), default=None,
+                        help=f"record per-stage timings to a JSON trace (default {default_path})")
+    parser.add_argument("--chrome-trace", type=Path, default=None,
+                        help="also write a Chrome trace-event file")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also record per-stage tracemalloc peaks (much slower)")
+    parser.set_defaults(profile_default=Path(default_path))
@@ -0,0 +1,83 @@
+"""
+Staleness bookkeeping for hospital_urls_cache.json records.
+
+Every record carries, per field, when it was last verified and when its
+value last changed, plus the fields whose link was found dead and has not
+been replaced yet:
+  {"website": ..., "appointmentUrl": ...,
+   "lastChecked": {"website": <ISO time>, "appointmentUrl": <ISO time>},
+   "lastChanged": {"website": <ISO time>, ...},
+   "broken": {"appointmentUrl": <ISO time>},
+   "lastMerged": {"website": <ISO time>, ...}}
+lastMerged is written by `find_hospital_urls.py --merge`: a filled field in
+hospitals.json is only overwritten when lastChanged is newer than it.
+A field is due for re-verification once it is older than its TTL (a field
+that was never found uses the shorter MISSING_TTL_DAYS); records written
+before timestamps existed count as never checked. plan() orders the work:
+failed hospitals and broken links first, then the stalest fields.
+Usage:
+    for hid, fields in plan(hospitals, cache, failed={...}, dead={(hid, "website")}):
+        ...
+        stamp(record, "website", new_value)
+"""
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+
+FIELDS = ("website", "appointmentUrl")
+FIELD_TTL_DAYS = {"website": 90, "appointmentUrl": 30}
+MISSING_TTL_DAYS = 14
+NEVER = "1970-01-01T00:00:00+00:00"
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def stamp(record: dict, field: str, value: str, now: str | None = None, broken: bool = False) -> bool:
+    """Record that `field` was verified now with `value`; returns True if the value changed."""
+    now = now or now_iso()
+    changed = (record.get(field) or "") != (value or "")
+    record[field] = value or ""
+    record.setdefault("lastChecked", {})[field] = now
+    if changed:
+        record.setdefault("lastChanged", {})[field] = now
+    if broken:
+        record.setdefault("broken", {})[field] = now
+    elif field in record.get("broken", {}):
+        del record["broken"][field]
+        if not record["broken"]:
+            del record["broken"]
+    return changed
+
+
+def due_fields(record: dict, now: datetime, ttl_days: Mapping[str, float] = FIELD_TTL_DAYS) -> list[str]:
+    due = []
+    for field in FIELDS:
+        checked = datetime.fromisoformat(record.get("lastChecked", {}).get(field, NEVER))
+        ttl = ttl_days[field] if record.get(field) else min(ttl_days[field], MISSING_TTL_DAYS)
+        if now - checked >= timedelta(days=ttl):
+            due.append(field)
+    return due
+
+
+def plan(hospitals: list[dict], cache: Mapping, failed: set[str] = frozenset(),
+         dead: set[tuple[str, str]] = frozenset(),
+         ttl_days: Mapping[str, float] = FIELD_TTL_DAYS) -> list[tuple[str, list[str]]]:
+    """(id, fields to re-verify) in priority order: failed / broken first, then oldest check first."""
+    now = datetime.now(timezone.utc)
+    work = []
+    for h in hospitals:
+        hid = h["id"]
+        record = cache.get(hid)
+        if record is None:
+            if hid in failed:        # never completed: search from scratch
+                work.append(((0, NEVER), hid, list(FIELDS)))
+            continue
+        urgent = {f for f in FIELDS if f in record.get("broken", {}) or (hid, f) in dead}
+        fields = [f for f in FIELDS if f in urgent or f in due_fields(record, now, ttl_days)]
+        if not fields:
+            continue
+        oldest = min(record.get("lastChecked", {}).get(f, NEVER) for f in fields)
+        work.append(((0 if urgent or hid in failed else 1, oldest), hid, fields))
+    work.sort(key=lambda w: w[0])
+    return [(hid, fields) for _, hid, fields in work]
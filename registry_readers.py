@@ -0,0 +1,234 @@
+"""
+Streaming readers for the MOHW 醫療機構 registry in ODS, XLSX and CSV form.
+
+Every reader yields the same header-keyed records (all values are stripped
+strings, short rows padded with ""), so row hashes and converted entries do
+not depend on which format a snapshot was downloaded in. None of them
+materialise the sheet:
+  ODS   content.xml is walked with iterparse, each row cleared once read
+  XLSX  openpyxl in read-only mode (optional dependency)
+  CSV   decoded in CSV_CHUNK-byte blocks and fed line by line to csv.reader
+Usage:
+    from registry_readers import find_source, read_records
+    path = find_source("醫療機構與人員基本資料_20241231")   # .csv if present, else .ods, else .xlsx
+    for rec in read_records(path):
+        ...
+"""
+import codecs
+import csv
+import importlib.util
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator
+
+from pipeline_profile import PROFILE
+
+CSV_CHUNK = 1 << 20        # bytes decoded per CSV read
+MIN_FIELDS = 5             # shorter rows are notes / totals, not institutions
+
+
+class RegistryReader:
+    """One input format. Subclasses implement rows(); records() is shared."""
+
+    suffix = ""
+
+    def available(self) -> bool:
+        return True
+
+    def rows(self, path: str) -> Iterator[list[str]]:
+        """Yield the non-blank rows of the first sheet as stripped strings."""
+        raise NotImplementedError
+
+    def records(self, path: str) -> Iterator[dict]:
+        """Yield header-keyed records, one row at a time."""
+        rows = self.rows(path)
+        header = next(rows, [])
+        width = len(header)
+        for vals in rows:
+            if len(vals) >= MIN_FIELDS:
+                yield dict(zip(header, vals + [""] * (width - len(vals))))
+
+
+# ─── ODS ─────────────────────────────────────────────────────────────────────
+NS = {
+    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
+}
+TABLE_TAG = f"{{{NS['table']}}}table"
+ROW_TAG = f"{{{NS['table']}}}table-row"
+CELL_TAGS = {f"{{{NS['table']}}}table-cell", f"{{{NS['table']}}}covered-table-cell"}
+P_TAG = f"{{{NS['text']}}}p"
+COLS_REPEATED = f"{{{NS['table']}}}number-columns-repeated"
+ROWS_REPEATED = f"{{{NS['table']}}}number-rows-repeated"
+
+
+def _ods_row_values(row) -> list[str]:
+    """Expand a <table:table-row> into cell strings.
+
+    Runs of empty cells are only materialised when a non-empty cell follows,
+    so the trailing `number-columns-repeated="1000"` padding that office
+    suites write after the last column never turns into real cells.
+    """
+    vals: list[str] = []
+    pending_empty = 0
+    for cell in row:
+        if cell.tag not in CELL_TAGS:
+            continue
+        repeat = int(cell.get(COLS_REPEATED, "1"))
+        val = ' '.join(''.join(p.itertext()) for p in cell.iter(P_TAG)).strip()
+        if not val:
+            pending_empty += repeat
+            continue
+        vals.extend([""] * pending_empty)
+        pending_empty = 0
+        vals.extend([val] * repeat)
+    return vals
+
+
+class OdsReader(RegistryReader):
+    suffix = ".ods"
+
+    def rows(self, path: str) -> Iterator[list[str]]:
+        """Stream the rows of the first sheet straight from the zip member.
+
+        Each row element is cleared as soon as its values are read, so memory
+        stays flat regardless of sheet size. Blank rows (including the huge
+        `number-rows-repeated` filler at the end of a sheet) are skipped.
+        """
+        with zipfile.ZipFile(path, 'r') as z, PROFILE.reader("ods.unzip", z.open('content.xml')) as f:
+            table = None
+            for event, elem in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == TABLE_TAG and table is None:
+                        table = elem
+                    continue
+                if elem.tag == ROW_TAG and table is not None:
+                    vals = _ods_row_values(elem)
+                    repeat = int(elem.get(ROWS_REPEATED, "1"))
+                    elem.clear()
+                    table.clear()
+                    if vals:
+                        for _ in range(repeat):
+                            yield vals
+                elif elem is table:
+                    return
+
+
+# ─── XLSX ────────────────────────────────────────────────────────────────────
+def _xlsx_cell(value) -> str:
+    """Render a cell the way it reads in the sheet: 1234.0 → "1234", dates as ISO."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+class XlsxReader(RegistryReader):
+    suffix = ".xlsx"
+
+    def available(self) -> bool:
+        return importlib.util.find_spec("openpyxl") is not None
+
+    def rows(self, path: str) -> Iterator[list[str]]:
+        """Stream the first sheet with openpyxl's read-only (lxml/iterparse) worksheet."""
+        import openpyxl
+
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            ws.reset_dimensions()   # exported sheets often claim 1024×1048576
+            for row in ws.iter_rows(values_only=True):
+                vals = [_xlsx_cell(v) for v in row]
+                while vals and not vals[-1]:
+                    vals.pop()
+                if vals:
+                    yield vals
+        finally:
+            wb.close()
+
+
+# ─── CSV ─────────────────────────────────────────────────────────────────────
+def _csv_lines(f, first: bytes, encoding: str) -> Iterator[str]:
+    """Decode the file in CSV_CHUNK blocks and yield \\n-terminated lines.
+
+    Only \\n splits lines here; csv.reader reassembles quoted fields that
+    span lines and treats a trailing \\r as part of the terminator.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ""
+    block = first
+    while block:
+        lines = (tail + decoder.decode(block)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line + "\n"
+        block = f.read(CSV_CHUNK)
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _csv_encoding(first: bytes) -> str:
+    """UTF-8 (with or without BOM) unless the first block is not valid UTF-8, then Big5 (cp950)."""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(first)
+    except UnicodeDecodeError:
+        return "cp950"
+    return "utf-8-sig"
+
+
+class CsvReader(RegistryReader):
+    suffix = ".csv"
+
+    def rows(self, path: str) -> Iterator[list[str]]:
+        with open(path, 'rb') as raw, PROFILE.reader("csv.read", raw) as f:
+            first = f.read(CSV_CHUNK)
+            for row in csv.reader(_csv_lines(f, first, _csv_encoding(first))):
+                vals = [v.strip() for v in row]
+                while vals and not vals[-1]:
+                    vals.pop()
+                if vals:
+                    yield vals
+
+
+# ─── Format selection ────────────────────────────────────────────────────────
+READERS: dict[str, RegistryReader] = {r.suffix: r for r in (CsvReader(), OdsReader(), XlsxReader())}
+FASTEST_FIRST = (".csv", ".ods", ".xlsx")   # 20× synthetic registry: CSV ~10× and XLSX ~0.4× the ODS rate
+
+
+def reader_for(path: str | Path) -> RegistryReader:
+    suffix = Path(path).suffix.lower()
+    if suffix not in READERS:
+        raise ValueError(f"unsupported registry format {suffix!r} (expected {', '.join(FASTEST_FIRST)})")
+    return READERS[suffix]
+
+
+def find_source(path: str | Path) -> Path:
+    """The fastest readable sibling of `path` (same stem, any supported suffix).
+
+    `path` may be given with or without a suffix. Raises FileNotFoundError
+    listing every candidate tried when none of them can be read.
+    """
+    path = Path(path)
+    stem = path.with_suffix("") if path.suffix.lower() in READERS else path
+    tried = [stem.with_name(stem.name + suffix) for suffix in FASTEST_FIRST]
+    for candidate in tried:
+        if candidate.exists() and READERS[candidate.suffix].available():
+            return candidate
+    unreadable = [str(c) for c in tried if c.exists()]
+    raise FileNotFoundError(
+        f"no readable registry file for {stem}; tried {', '.join(map(str, tried))}"
+        + (f" ({', '.join(unreadable)} found, but its reader's dependency is not installed)" if unreadable else ""))
+
+
+def read_records(path: str | Path) -> Iterator[dict]:
+    """Header-keyed records from a registry file, dispatched on its suffix."""
+    return reader_for(path).records(str(path))
@@ -1,18 +1,94 @@
 import { NextRequest, NextResponse } from "next/server";
 import type { Hospital, ApiResponse } from "@/types";
 import hospitalsData from "@/data/hospitals.json";
+import searchIndexData from "@/data/search_index.json";
+import manifest from "@/data/hospitals.manifest.json";
 
 export const dynamic = "force-dynamic";
 
 const hospitals = hospitalsData as Hospital[];
 
+// Written by dataset_writer.py: a response depends only on the dataset and the
+// URL, so the dataset hash is a valid ETag. Requests pinned to the current
+// hash with ?v= can be cached forever; a new dataset gets new URLs.
+const etag = `"${manifest.etag}"`;
+const cacheHeaders = (pinned: boolean) => ({
+  ETag: etag,
+  "Cache-Control": pinned
+    ? "public, max-age=31536000, immutable"
+    : "public, max-age=0, must-revalidate",
+});
+
+// Built by build_search_index.py: folded keys + delta-encoded n-gram postings
+interface SearchIndexFile {
+  v: number;
+  keys: string[];
+  grams: Record<string, number[]>;
+}
+
+const searchIndex = searchIndexData as SearchIndexFile;
+const postings = new Map<string, number[]>(
+  Object.entries(searchIndex.grams).map(([gram, deltas]) => {
+    let id = 0;
+    return [gram, deltas.map((d) => (id += d))];
+  })
+);
+
+const fold = (text: string) =>
+  text.normalize("NFKC").replace(/臺/g, "台").toLowerCase();
+
+// Same folding as build_search_index.fold_query: legal-entity prefixes are
+// part of the indexed name, so "衛生福利部" matches like it always did
+const foldQuery = (text: string) => fold(text).replace(/ /g, "");
+
+const intersect = (a: number[], b: number[]) => {
+  const out: number[] = [];
+  for (let i = 0, j = 0; i < a.length && j < b.length; ) {
+    if (a[i] === b[j]) {
+      out.push(a[i]);
+      i++;
+      j++;
+    } else if (a[i] < b[j]) i++;
+    else j++;
+  }
+  return out;
+};
+
+// Indices (in dataset order) of hospitals whose search key contains the query
+const searchIds = (query: string): number[] => {
+  const q = Array.from(foldQuery(query));
+  if (q.length === 0) return hospitals.map((_, i) => i);
+  if (q.length === 1) return postings.get(q[0]) ?? [];
+
+  const lists: number[][] = [];
+  for (let i = 0; i < q.length - 1; i++) {
+    lists.push(postings.get(q[i] + q[i + 1]) ?? []);
+  }
+  lists.sort((a, b) => a.length - b.length);
+  let ids = lists[0];
+  for (const list of lists.slice(1)) {
+    if (ids.length === 0) break;
+    ids = intersect(ids, list);
+  }
+  const needle = q.join("");
+  return q.length === 2
+    ? ids
+    : ids.filter((i) => searchIndex.keys[i].includes(needle));
+};
+
 export const GET = async (request: NextRequest) => {
   try {
     const { searchParams } = new URL(request.url);
     const city = searchParams.get("city");
     const query = searchParams.get("q");
+    const headers = cacheHeaders(searchParams.get("v") === manifest.etag);
 
-    let filtered = [...hospitals];
+    const ifNoneMatch = request.headers.get("if-none-match");
+    if (ifNoneMatch && ifNoneMatch.split(",").some((t) => t.trim().replace(/^W\//, "") === etag)) {
+      return new NextResponse(null, { status: 304, headers });
+    }
+
+    let filtered = query ? searchIds(query).map((i) => hospitals[i]) : [...hospitals];
 
     if (city) {
       filtered = filtered.filter((h) =>
@@ -20,23 +96,12 @@ export const GET = async (request: NextRequest) => {
       );
     }
 
-    if (query) {
-      const q = query.toLowerCase();
-      filtered = filtered.filter(
-        (h) =>
-          h.name.toLowerCase().includes(q) ||
-          h.city.toLowerCase().includes(q) ||
-          h.district.toLowerCase().includes(q) ||
-          h.address.toLowerCase().includes(q)
-      );
-    }
-
     const response: ApiResponse<Hospital[]> = {
       data: filtered,
       total: filtered.length,
     };
 
-    return NextResponse.json(response, { status: 200 });
+    return NextResponse.json(response, { status: 200, headers });
   } catch (error) {
     console.error("[API /hospitals] Error:", error);
     return NextResponse.json(
@@ -2,6 +2,7 @@
 
 import { useState, useEffect, useCallback, useRef } from "react";
 import type { Hospital } from "@/types";
+import manifest from "@/data/hospitals.manifest.json";
 
 interface UseHospitalSearchResult {
   hospitals: Hospital[];
@@ -28,6 +29,8 @@ export const useHospitalSearch = (): UseHospitalSearchResult => {
       const params = new URLSearchParams();
       if (query) params.set("q", query);
       if (city) params.set("city", city);
+      // Pin to the dataset version so the response can be cached as immutable
+      params.set("v", manifest.etag);
 
       const res = await fetch(`/api/hospitals?${params.toString()}`);
 
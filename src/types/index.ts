@@ -9,6 +9,9 @@ export interface Hospital {
   appointmentUrl?: string;
   logoUrl?: string;
   services: string[];
+  lat?: number;
+  lon?: number;
+  geoPrecision?: "road" | "district" | "city";
 }
 
 export type City =
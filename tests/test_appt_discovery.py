@@ -0,0 +1,53 @@
+"""
+discover_appointment() against an in-memory site.
+"""
+import asyncio
+
+from appt_discovery import discover_appointment
+from crawl_client import Response
+
+
+class FakeClient:
+    """Serves `pages` (URL → HTML); `redirects` maps a URL to the final URL it lands on."""
+
+    def __init__(self, pages: dict[str, str], redirects: dict[str, str] | None = None):
+        self.pages = pages
+        self.redirects = redirects or {}
+        self.fetched: list[str] = []
+
+    async def get(self, url, *, params=None, phase="get"):
+        self.fetched.append(url)
+        final = self.redirects.get(url, url)
+        if final not in self.pages:
+            return Response(final, 404, {}, b"")
+        return Response(final, 200, {}, self.pages[final].encode(), "utf-8")
+
+
+def test_homepage_link_stops_after_one_request():
+    client = FakeClient({"https://a.example/": '<a href="/reg">網路掛號</a>'})
+    found = asyncio.run(discover_appointment(client, "https://a.example/"))
+    assert found.url == "https://a.example/reg"
+    assert client.fetched == ["https://a.example/"]
+
+
+def test_follows_menu_links_on_the_redirected_host():
+    client = FakeClient(
+        {
+            "https://new.example/": '<a href="/service">就醫服務</a>',
+            "https://new.example/service": '<a href="/netreg">網路掛號</a>',
+        },
+        redirects={"http://old.example/": "https://new.example/"},
+    )
+    found = asyncio.run(discover_appointment(client, "http://old.example/"))
+    assert found is not None
+    assert found.url == "https://new.example/netreg"
+    assert found.depth == 1
+
+
+def test_does_not_follow_menu_links_off_site():
+    client = FakeClient({
+        "https://a.example/": '<a href="https://other.example/service">就醫服務</a>',
+        "https://other.example/service": '<a href="/reg">網路掛號</a>',
+    })
+    assert asyncio.run(discover_appointment(client, "https://a.example/")) is None
+    assert client.fetched == ["https://a.example/"]
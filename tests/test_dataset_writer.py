@@ -0,0 +1,50 @@
+"""
+write_dataset(): canonical output, the unchanged short-circuit, and
+interrupted writes leaving no partial files or premature manifest.
+"""
+import json
+
+import pytest
+
+import dataset_writer
+from dataset_writer import load_manifest, write_dataset
+
+HOSPITALS = [
+    {"name": "臺安醫院", "id": "0101090517", "city": "台北市", "services": ["急診", "門診"]},
+    {"id": "0401180014", "name": "長庚醫療財團法人台北長庚紀念醫院", "city": "台北市", "website": ""},
+]
+
+
+def test_write_then_unchanged(tmp_path):
+    path, manifest = tmp_path / "hospitals.json", tmp_path / "manifest.json"
+    assert write_dataset(HOSPITALS, path, manifest) is True
+    assert json.loads(path.read_text(encoding="utf-8")) == HOSPITALS
+    assert list(json.loads(path.read_text(encoding="utf-8"))[0]) == ["id", "name", "city", "services"]
+    assert load_manifest(manifest)["count"] == 2
+    assert write_dataset(HOSPITALS, path, manifest) is False
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")) == []
+
+
+def test_interrupted_write_keeps_the_old_manifest(tmp_path, monkeypatch):
+    path, manifest = tmp_path / "hospitals.json", tmp_path / "manifest.json"
+    write_dataset(HOSPITALS, path, manifest)
+    before = manifest.read_bytes()
+    gz_before = (tmp_path / "hospitals.json.gz").read_bytes()
+
+    real_replace = dataset_writer.os.replace
+
+    def failing_replace(src, dst):
+        if str(dst).endswith(".gz"):
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(dataset_writer.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        write_dataset(HOSPITALS[:1], path, manifest)
+    assert manifest.read_bytes() == before
+    assert (tmp_path / "hospitals.json.gz").read_bytes() == gz_before
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
+
+    monkeypatch.setattr(dataset_writer.os, "replace", real_replace)
+    assert write_dataset(HOSPITALS[:1], path, manifest) is True     # the next run completes it
+    assert load_manifest(manifest)["count"] == 1
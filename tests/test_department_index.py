@@ -0,0 +1,56 @@
+"""
+The department bitmap index: write / reload round trip and facet queries
+against a plain scan of the same rows.
+"""
+import random
+
+import pytest
+
+from department_index import DepartmentIndex, extract_services, load_department_rows, write_departments
+
+DEPARTMENTS = ["急診科", "腎臟科", "家醫科", "內科", "外科", "兒科", "精神科", "牙科", "中醫一般科", "復健科"]
+CITIES = ["台北市", "台中市", "高雄市", "花蓮縣"]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = random.Random(0)
+    return [(f"{k:010d}", rng.choice(CITIES), k % 5 == 0, set(rng.sample(DEPARTMENTS, rng.randint(0, 6))))
+            for k in range(300)]
+
+
+@pytest.fixture(scope="module")
+def path(rows, tmp_path_factory):
+    path = tmp_path_factory.mktemp("departments") / "departments.json"
+    write_departments(rows, path)
+    return path
+
+
+def test_round_trip(rows, path):
+    assert load_department_rows(path) == {fid: (city, hospital, depts) for fid, city, hospital, depts in rows}
+
+
+@pytest.mark.parametrize("city, departments, hospitals_only", [
+    (None, [], False),
+    ("台中市", ["急診科"], False),
+    ("臺中市", ["急診科", "腎臟科"], True),
+    (None, ["精神科"], True),
+    ("高雄市", ["不存在的科"], False),
+])
+def test_query_matches_scan(rows, path, city, departments, hospitals_only):
+    index = DepartmentIndex.load(path)
+    result = index.query(city, departments, facets=len(DEPARTMENTS), hospitals_only=hospitals_only)
+    wanted = city.replace("臺", "台") if city else None
+    expected = [(fid, c, depts) for fid, c, hospital, depts in rows
+                if (wanted is None or c == wanted) and set(departments) <= depts
+                and (hospital or not hospitals_only)]
+    assert result.ids == [fid for fid, _, _ in expected]
+    for name, count in result.department_counts.items():
+        assert count == sum(name in depts for _, _, depts in expected)
+    assert sum(result.city_counts.values()) == len(expected)
+
+
+def test_services_come_from_the_stored_set(rows, path):
+    index = DepartmentIndex.load(path)
+    for fid, _, _, depts in rows[:50]:
+        assert index.services_of(fid) == extract_services(depts)
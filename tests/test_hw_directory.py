@@ -0,0 +1,75 @@
+"""
+The hospitals.tw directory parser and local matching, against a saved listing page.
+"""
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from crawl_client import Response
+from find_hospital_urls import extract_short_name
+from hw_directory import Directory, crawl_directory, entries_from_listing, is_hospital_page
+
+LISTING_HTML = Path(__file__).resolve().parent / "fixtures" / "hospitals_tw_listing.html"
+
+
+@pytest.fixture(scope="module")
+def entries():
+    return entries_from_listing(LISTING_HTML.read_bytes(), "utf-8")
+
+
+@pytest.fixture(scope="module")
+def directory(entries):
+    return Directory({"entries": entries})
+
+
+def test_listing_keeps_only_hospital_pages(entries):
+    assert [e["url"] for e in entries] == [
+        "https://hospitals.tw/tahsda/",
+        "https://hospitals.tw/tungs/",
+        "https://hospitals.tw/tzuchi-yuli/",
+        "https://hospitals.tw/ntuh-jinshan/",
+        "https://hospitals.tw/hongke/",
+    ]
+
+
+def test_anchor_text_is_cut_to_the_name(entries):
+    assert [e["name"] for e in entries] == ["臺安醫院", "童綜合醫院", "玉里慈濟醫院", "台大醫院金山分院", "宏科醫院"]
+
+
+@pytest.mark.parametrize("href", ["https://hospitals.tw/", "https://hospitals.tw", "https://hospitals.tw/page/2/"])
+def test_site_pages_are_not_hospitals(href):
+    assert not is_hospital_page(href)
+
+
+@pytest.mark.parametrize("name, url", [
+    ("童綜合醫療社團法人童綜合醫院", "https://hospitals.tw/tungs/"),
+    ("佛教慈濟醫療財團法人玉里慈濟醫院", "https://hospitals.tw/tzuchi-yuli/"),
+    ("台安醫院", "https://hospitals.tw/tahsda/"),
+])
+def test_resolves_known_hospital(directory, name, url):
+    entry, score = directory.best(name, extract_short_name(name))
+    assert entry["url"] == url
+    assert score == 1.0
+
+
+def test_unlisted_hospital_has_no_match(directory):
+    assert directory.best("元復醫院", "元復醫院") is None
+
+
+def test_crawl_stops_when_a_page_adds_nothing():
+    page = LISTING_HTML.read_bytes()
+
+    class Client:
+        def __init__(self):
+            self.fetched = []
+
+        async def get(self, url, *, params=None, phase="get"):
+            self.fetched.append(url)
+            return Response(url, 200, {}, page, "utf-8")
+
+    client = Client()
+    snapshot = asyncio.run(crawl_directory(client, max_pages=10))
+    assert client.fetched == ["https://hospitals.tw/", "https://hospitals.tw/page/2/"]
+    assert snapshot["pages"] == 2
+    assert len(snapshot["entries"]) == 5
@@ -0,0 +1,158 @@
+"""
+link_checker against a local stand-in server (http.server on 127.0.0.1).
+
+Routes:
+  /old → 301 /mid → 302 /new (200)      redirect chain
+  /gone-404, /gone-410                  dead links
+  /no-head                              405 to HEAD, 200 to GET
+  /moved-site                           301 to the root of a second server
+"""
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from crawl_client import CrawlClient
+from link_checker import apply_link_checks, check_link, check_links
+
+TIMEOUT = 5
+
+
+class Handler(BaseHTTPRequestHandler):
+    redirects: dict[str, tuple[int, str]] = {}   # path → (status, Location)
+
+    def _reply(self, body: bool) -> None:
+        path = self.path
+        if path in self.redirects:
+            status, location = self.redirects[path]
+            self.send_response(status)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        status = {"/gone-404": 404, "/gone-410": 410}.get(path, 200)
+        if path == "/no-head" and not body:
+            status = 405
+        payload = b"<html>ok</html>"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+    def do_HEAD(self):
+        self._reply(body=False)
+
+    def do_GET(self):
+        self._reply(body=True)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(redirects: dict[str, tuple[int, str]]) -> ThreadingHTTPServer:
+    handler = type("RouteHandler", (Handler,), {"redirects": redirects})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture(scope="module")
+def servers():
+    other = _serve({})
+    other_base = f"http://127.0.0.1:{other.server_port}"
+    redirects = {}
+    main = _serve(redirects)
+    base = f"http://127.0.0.1:{main.server_port}"
+    redirects.update({
+        "/old": (301, f"{base}/mid"),
+        "/mid": (302, "/new"),
+        "/moved-site": (301, f"{other_base}/"),
+    })
+    yield base, other_base
+    for server in (main, other):
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+
+def test_redirect_chain_to_canonical(servers, session):
+    base, _ = servers
+    result = check_link(session, f"{base}/old", "appointmentUrl", TIMEOUT)
+    assert result.alive and result.status == 200
+    assert [url for url, _ in result.chain] == [f"{base}/old", f"{base}/mid", f"{base}/new"]
+    assert [status for _, status in result.chain] == [301, 302, 200]
+    assert result.finalUrl == result.canonical == f"{base}/new"
+
+
+def test_website_redirect_keeps_only_root(servers, session):
+    base, other_base = servers
+    result = check_link(session, f"{base}/moved-site", "website", TIMEOUT)
+    assert result.alive
+    assert result.canonical == f"{other_base}/"
+
+
+def test_live_link_without_redirect_is_not_rewritten(servers, session):
+    base, _ = servers
+    result = check_link(session, f"{base}/new", "appointmentUrl", TIMEOUT)
+    assert result.alive and result.canonical == ""
+    assert len(result.chain) == 1
+
+
+@pytest.mark.parametrize("status", [404, 410])
+def test_dead_status(servers, session, status):
+    base, _ = servers
+    result = check_link(session, f"{base}/gone-{status}", "appointmentUrl", TIMEOUT)
+    assert result.status == status
+    assert not result.alive
+    assert result.canonical == ""
+
+
+def test_head_405_falls_back_to_get(servers, session):
+    base, _ = servers
+    result = check_link(session, f"{base}/no-head", "appointmentUrl", TIMEOUT)
+    assert result.method == "GET"
+    assert result.status == 200 and result.alive
+    assert result.error is None
+
+
+def test_refused_connection(session):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]       # closed again before the request: nothing listens there
+    result = check_link(session, f"http://127.0.0.1:{port}/", "website", TIMEOUT)
+    assert result.status is None
+    assert result.error == "ConnectionError"
+    assert not result.alive and result.chain == []
+
+
+def test_check_links_and_apply(servers):
+    base, _ = servers
+    hospitals = [
+        {"id": "a", "website": "", "appointmentUrl": f"{base}/old"},
+        {"id": "b", "website": "", "appointmentUrl": f"{base}/gone-404"},
+        {"id": "c", "website": "", "appointmentUrl": f"{base}/old"},     # same URL, checked once
+    ]
+
+    async def run():
+        client = CrawlClient(robots=False, memo=False, telemetry=None, timeout=TIMEOUT)
+        try:
+            return await check_links(client, hospitals), client.requests
+        finally:
+            client.close()
+
+    doc, sent = asyncio.run(run())
+    assert sent == 2
+    rewritten, dead = apply_link_checks(hospitals, doc)
+    assert rewritten == 2
+    assert hospitals[0]["appointmentUrl"] == hospitals[2]["appointmentUrl"] == f"{base}/new"
+    assert dead == [("b", "appointmentUrl", f"{base}/gone-404")]
@@ -0,0 +1,66 @@
+"""
+NameIndex must not hand one facility's website to another.
+
+The pairs below were all accepted by the earlier matcher (city prefixes
+stripped, containment scored ≥ 0.9, Dice threshold 0.75).
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from name_index import NameIndex, normalize_name
+
+HOSPITALS_JSON = Path(__file__).resolve().parent.parent / "src/data/hospitals.json"
+
+FALSE_MATCHES = [
+    ("臺北市立聯合醫院", "高雄市立聯合醫院"),
+    ("新北市立聯合醫院", "臺北市立聯合醫院"),
+    ("博仁綜合醫院", "怡仁綜合醫院"),
+    ("洪外科醫院", "謝外科醫院"),
+    ("謝外科醫院", "邱外科醫院"),
+    ("童綜合醫療社團法人童綜合醫院", "郭綜合醫院"),
+    ("臺北醫學大學附設醫院", "中山醫學大學附設醫院"),
+    ("郵政醫院", "台南市立醫院"),
+    ("屏基醫療財團法人屏東基督教醫院", "東基醫療財團法人台東基督教醫院"),
+    ("中國醫藥大學新竹附設醫院", "中國醫藥大學附設醫院"),
+    ("中山醫學大學附設醫院中興分院", "中山醫學大學附設醫院"),
+]
+
+
+@pytest.fixture(scope="module")
+def hospitals():
+    with open(HOSPITALS_JSON, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("query, other", FALSE_MATCHES)
+def test_false_matches_rejected(query, other):
+    index = NameIndex([{"name": other}])
+    assert index.best_match(query) is None
+
+
+def test_city_prefix_is_kept():
+    assert normalize_name("臺北市立聯合醫院") != normalize_name("高雄市立聯合醫院")
+
+
+def test_legal_prefix_difference_matches():
+    index = NameIndex([{"name": "林口長庚紀念醫院", "city": "桃園市"}, {"name": "臺北醫院", "city": "新北市"}])
+    assert index.best_match("長庚醫療財團法人林口長庚紀念醫院", city="桃園市")[0]["name"] == "林口長庚紀念醫院"
+    assert index.best_match("衛生福利部臺北醫院", city="新北市")[1] == 1.0
+
+
+def test_same_name_other_city_rejected():
+    index = NameIndex([{"name": "仁愛醫院", "city": "台中市"}])
+    assert index.best_match("仁愛醫院", city="臺北市") is None
+    assert index.best_match("仁愛醫院", city="臺中市") is not None     # 臺/台 folded
+
+
+def test_leave_one_out_never_matches_another_hospital(hospitals):
+    wrong = []
+    for i, h in enumerate(hospitals):
+        index = NameIndex(hospitals[:i] + hospitals[i + 1:])
+        hit = index.best_match(h["name"], city=h["city"])
+        if hit and hit[0]["name"] != h["name"]:
+            wrong.append((h["name"], hit[0]["name"]))
+    assert wrong == []
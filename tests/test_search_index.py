@@ -0,0 +1,58 @@
+"""
+The /api/hospitals search index against the route's original linear filter,
+built from the committed dataset.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from build_search_index import SearchIndex, build_index, linear_filter, verify
+
+HOSPITALS_JSON = Path(__file__).resolve().parent.parent / "src/data/hospitals.json"
+
+
+@pytest.fixture(scope="module")
+def hospitals():
+    with open(HOSPITALS_JSON, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def index(hospitals):
+    # through JSON, as the route reads it
+    return SearchIndex(json.loads(json.dumps(build_index(hospitals), ensure_ascii=False)))
+
+
+def test_verify_has_no_mismatches(hospitals, index):
+    assert verify(hospitals, index, samples=500) == 0
+
+
+def test_empty_query_returns_everything(hospitals, index):
+    assert index.query("") == list(range(len(hospitals)))
+
+
+def test_single_character(hospitals, index):
+    assert index.query("院") == linear_filter(hospitals, "院")
+    assert set(linear_filter(hospitals, "台")) <= set(index.query("台"))
+
+
+def test_tai_variants_fold_together(hospitals, index):
+    both = index.query("臺北")
+    assert both == index.query("台北")
+    assert set(linear_filter(hospitals, "臺北")) | set(linear_filter(hospitals, "台北")) == set(both)
+
+
+def test_full_width_folds(index):
+    assert index.query("ＡＢＣ") == index.query("abc")
+
+
+@pytest.mark.parametrize("prefix", ["衛生福利部", "臺北市立", "醫療財團法人", "財團法人", "市立"])
+def test_legal_prefixes_are_searchable(hospitals, index, prefix):
+    expected = linear_filter(hospitals, prefix)
+    assert expected
+    assert set(expected) <= set(index.query(prefix))
+
+
+def test_no_match(index):
+    assert index.query("xyz不存在的醫院") == []
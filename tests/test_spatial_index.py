@@ -0,0 +1,47 @@
+"""
+SpatialIndex.nearest() / within() against a brute-force scan, in Taiwan and
+far north of it (where a longitude degree is much shorter).
+"""
+import random
+
+import pytest
+
+from geocode_hospitals import SpatialIndex, build_spatial_index, haversine_km
+
+
+def make_index(lat_range, lon_range, count=400, seed=0):
+    rng = random.Random(seed)
+    hospitals = [{"id": str(k), "lat": rng.uniform(*lat_range), "lon": rng.uniform(*lon_range),
+                  "services": ["急診"] if k % 3 == 0 else []}
+                 for k in range(count)]
+    return SpatialIndex(build_spatial_index(hospitals), hospitals), hospitals
+
+
+def brute(hospitals, lat, lon, service=None):
+    return sorted((haversine_km(lat, lon, h["lat"], h["lon"]), h["id"])
+                  for h in hospitals if service is None or service in h["services"])
+
+
+REGIONS = [((21.9, 25.3), (120.0, 122.0)), ((58.0, 62.0), (20.0, 26.0)), ((69.0, 71.0), (18.0, 30.0))]
+
+
+@pytest.mark.parametrize("lat_range, lon_range", REGIONS)
+def test_nearest_matches_brute_force(lat_range, lon_range):
+    index, hospitals = make_index(lat_range, lon_range)
+    rng = random.Random(1)
+    for _ in range(100):
+        lat, lon = rng.uniform(*lat_range), rng.uniform(*lon_range)
+        for service in (None, "急診"):
+            got = [hid for hid, _ in index.nearest(lat, lon, n=5, service=service)]
+            assert got == [hid for _, hid in brute(hospitals, lat, lon, service)[:5]]
+
+
+@pytest.mark.parametrize("lat_range, lon_range", REGIONS)
+def test_within_matches_brute_force(lat_range, lon_range):
+    index, hospitals = make_index(lat_range, lon_range)
+    rng = random.Random(2)
+    for _ in range(100):
+        lat, lon = rng.uniform(*lat_range), rng.uniform(*lon_range)
+        km = rng.choice([2.0, 10.0, 40.0])
+        got = [hid for hid, _ in index.within(lat, lon, km)]
+        assert got == [hid for d, hid in brute(hospitals, lat, lon) if d <= km]
@@ -0,0 +1,39 @@
+"""
+WorkQueue leasing, including a queue restricted to a subset of ids.
+"""
+from work_queue import WorkQueue
+
+
+def test_lease_in_enqueue_order(tmp_path):
+    with WorkQueue(tmp_path / "q.sqlite") as queue:
+        queue.enqueue(["a", "b", "c"])
+        assert queue.lease("w", n=2) == ["a", "b"]
+        assert queue.lease("w", n=2) == ["c"]
+        assert queue.lease("w") == []
+
+
+def test_only_leases_the_given_ids(tmp_path):
+    path = tmp_path / "q.sqlite"
+    with WorkQueue(path) as queue:
+        queue.enqueue(["old1", "old2"])          # left pending by an earlier run
+        queue.fail("old2", "Timeout")
+    with WorkQueue(path, only=["new1", "new2"]) as queue:
+        queue.enqueue(["new1", "new2"])
+        assert queue.lease("w", n=10) == ["new1", "new2"]
+        queue.done("new1")
+        queue.fail("new2", "Timeout")
+        assert queue.lease("w", n=10) == []
+        assert queue.next_retry() is not None     # new2's backoff, not old2's
+        assert queue.counts()["pending"] == 3
+    with WorkQueue(path, only=["new1"]) as queue:
+        assert queue.next_retry() is None         # nothing of its own is waiting
+    with WorkQueue(path) as queue:
+        assert queue.lease("w", n=10) == ["old1"]
+
+
+def test_only_does_not_affect_other_connections(tmp_path):
+    path = tmp_path / "q.sqlite"
+    with WorkQueue(path) as full, WorkQueue(path, only=["b"]) as scoped:
+        full.enqueue(["a", "b"])
+        assert scoped.lease("s") == ["b"]
+        assert full.lease("f") == ["a"]
@@ -0,0 +1,158 @@
+"""
+Crash-safe store behind hospital_urls_cache.json.
+
+Records live in SQLite (WAL mode); every assignment is its own transaction,
+so a finished hospital is durable the moment it is stored and a crash can
+lose at most the hospital in flight, never the file. The JSON file keeps
+its current shape ({id: {"website", "appointmentUrl"}}, indent=2) and is
+rewritten by compact() every COMPACT_EVERY writes and on close, through a
+temporary file and an atomic rename.
+
+If the JSON changed outside the crawler (e.g. a git pull), its records are
+upserted into the database the next time the store is opened; ids that
+only exist in the database are kept.
+Usage:
+    with UrlCache(Path("hospital_urls_cache.json")) as cache:
+        if hid not in cache:
+            cache[hid] = {"website": ..., "appointmentUrl": ...}
+        cache.stats()                  # counted in SQL, nothing loaded
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from collections.abc import Iterator, MutableMapping
+from pathlib import Path
+
+COMPACT_EVERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, record TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UrlCache(MutableMapping):
+    def __init__(self, json_path: Path, db_path: Path | None = None):
+        self.json_path = Path(json_path)
+        self.db_path = db_path or self.json_path.with_suffix(".sqlite")
+        self._db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")   # WAL + NORMAL: committed rows survive a process crash
+        self._db.executescript(SCHEMA)
+        self._writes = 0
+        self._import_json()
+
+    # ─── JSON compatibility ──────────────────────────────────────────────────
+    def _meta(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute("INSERT INTO meta VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                         (key, value))
+
+    def _import_json(self) -> None:
+        if not self.json_path.exists():
+            return
+        digest = _file_hash(self.json_path)
+        if self._meta("json_sha256") == digest:
+            return
+        with open(self.json_path, encoding="utf-8") as f:
+            records = json.load(f)
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO records VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET record = excluded.record",
+                ((hid, json.dumps(rec, ensure_ascii=False)) for hid, rec in records.items()))
+            self._set_meta("json_sha256", digest)
+
+    def compact(self) -> None:
+        """Rewrite the JSON file from the database (streamed, atomic rename)."""
+        tmp = self.json_path.with_name(f"{self.json_path.name}.{os.getpid()}.tmp")   # workers may compact at once
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("{")
+            first = True
+            for hid, record in self._db.execute("SELECT id, record FROM records ORDER BY rowid"):
+                body = json.dumps(json.loads(record), ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                f.write(("\n" if first else ",\n") + f"  {json.dumps(hid)}: {body}")
+                first = False
+            f.write("\n}" if not first else "}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.json_path)
+        self._set_meta("json_sha256", _file_hash(self.json_path))
+        self._writes = 0
+
+    # ─── Mapping ─────────────────────────────────────────────────────────────
+    def __getitem__(self, hid: str) -> dict:
+        row = self._db.execute("SELECT record FROM records WHERE id = ?", (hid,)).fetchone()
+        if row is None:
+            raise KeyError(hid)
+        return json.loads(row[0])
+
+    def __setitem__(self, hid: str, record: dict) -> None:
+        self._db.execute(
+            "INSERT INTO records VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET record = excluded.record",
+            (hid, json.dumps(record, ensure_ascii=False)))
+        self._wrote()
+
+    def update(self, records=(), /, **kw) -> None:
+        """Store many records in one transaction; the JSON is compacted at most once."""
+        items = dict(records, **kw)
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO records VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET record = excluded.record",
+                ((hid, json.dumps(record, ensure_ascii=False)) for hid, record in items.items()))
+        self._writes += len(items) - 1
+        if items:
+            self._wrote()
+
+    def __delitem__(self, hid: str) -> None:
+        if self._db.execute("DELETE FROM records WHERE id = ?", (hid,)).rowcount == 0:
+            raise KeyError(hid)
+        self._wrote()
+
+    def __contains__(self, hid: object) -> bool:
+        return self._db.execute("SELECT 1 FROM records WHERE id = ?", (hid,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for (hid,) in self._db.execute("SELECT id FROM records ORDER BY rowid"):
+            yield hid
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes >= COMPACT_EVERY:
+            self.compact()
+
+    # ─── Queries ─────────────────────────────────────────────────────────────
+    def stats(self) -> dict[str, int]:
+        total, web, appt = self._db.execute(
+            "SELECT COUNT(*),"
+            " COALESCE(SUM(COALESCE(json_extract(record, '$.website'), '') != ''), 0),"
+            " COALESCE(SUM(COALESCE(json_extract(record, '$.appointmentUrl'), '') != ''), 0)"
+            " FROM records").fetchone()
+        return {"records": total, "website": web, "appointmentUrl": appt}
+
+    def close(self) -> None:
+        if self._writes:
+            self.compact()
+        self._db.close()
+
+    def __enter__(self) -> "UrlCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,168 @@
+"""
+Persistent work queue for find_hospital_urls.py, keyed by hospital id.
+
+Items move pending → in_flight → done, or back to pending with an
+exponential backoff after a failure, and to failed once MAX_ATTEMPTS is
+used up. The queue is one SQLite file (WAL mode). lease() claims items
+in a BEGIN IMMEDIATE transaction, so any number of worker processes can
+share the file without claiming the same id twice. A lease that is not
+finished within its timeout (a killed worker) becomes leasable again;
+release() hands back the current holder's items on a clean interrupt.
+A queue opened with `only` leases (and waits for retries of) those ids
+alone, so a run over a changelog delta leaves older pending items for a
+later full run.
+An interrupted run therefore resumes exactly where it stopped, and ids
+are stable when the dataset changes, unlike list offsets.
+Usage:
+    with WorkQueue(QUEUE_DB) as queue:
+        queue.enqueue(h["id"] for h in need)
+        for hid in queue.lease(worker, n=4):
+            ...
+            queue.done(hid)            # or queue.fail(hid, "ConnectionError")
+        queue.counts()                 # {"pending": …, "in_flight": …, "done": …, "failed": …}
+"""
+import os
+import socket
+import sqlite3
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+QUEUE_DB = Path("crawl_queue.sqlite")
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 30.0           # seconds before the first retry; doubled per attempt
+BACKOFF_MAX = 3600.0
+LEASE_SECONDS = 900.0
+STATES = ("pending", "in_flight", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_at REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    error TEXT,
+    seq INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_ready ON items (state, next_at, seq);
+"""
+
+
+def backoff(attempts: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def worker_name(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+class WorkQueue:
+    def __init__(self, path: Path = QUEUE_DB, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, only: Iterable[str] | None = None):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._scope = ""
+        if only is not None:
+            # per-connection table, so other processes sharing the file are unaffected
+            self._db.execute("CREATE TEMP TABLE only_ids (id TEXT PRIMARY KEY)")
+            self._db.executemany("INSERT OR IGNORE INTO temp.only_ids VALUES (?)", ((hid,) for hid in only))
+            self._scope = " AND id IN (SELECT id FROM temp.only_ids)"
+
+    # ─── Filling ─────────────────────────────────────────────────────────────
+    def enqueue(self, ids: Iterable[str]) -> int:
+        """Add ids not in the queue yet (existing ones keep their state); returns how many were added."""
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM items").fetchone()[0]
+            added = 0
+            for hid in ids:
+                seq += 1
+                added += self._db.execute(
+                    "INSERT OR IGNORE INTO items (id, seq, updated_at) VALUES (?, ?, ?)",
+                    (hid, seq, now)).rowcount
+        return added
+
+    def requeue(self, ids: Iterable[str] | None = None, states: tuple[str, ...] = ("done", "failed")) -> int:
+        """Put items in `states` back to pending with a fresh attempt count (all of them when ids is None)."""
+        marks = ",".join("?" * len(states))
+        sql = (f"UPDATE items SET state = 'pending', attempts = 0, next_at = 0, error = NULL, "
+               f"owner = NULL, lease_until = NULL, updated_at = ? WHERE state IN ({marks})")
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            if ids is None:
+                return self._db.execute(sql, (now, *states)).rowcount
+            return sum(self._db.execute(sql + " AND id = ?", (now, *states, hid)).rowcount for hid in ids)
+
+    # ─── Leasing ─────────────────────────────────────────────────────────────
+    def lease(self, owner: str, n: int = 1) -> list[str]:
+        """Claim up to n ready items (pending and due, or with an expired lease), oldest first."""
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            ids = [hid for (hid,) in self._db.execute(
+                "SELECT id FROM items WHERE ((state = 'pending' AND next_at <= ?)"
+                f" OR (state = 'in_flight' AND lease_until < ?)){self._scope} ORDER BY seq LIMIT ?",
+                (now, now, n))]
+            self._db.executemany(
+                "UPDATE items SET state = 'in_flight', owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                ((owner, now + self.lease_seconds, now, hid) for hid in ids))
+        return ids
+
+    def done(self, hid: str) -> None:
+        self._db.execute(
+            "UPDATE items SET state = 'done', owner = NULL, lease_until = NULL, error = NULL, updated_at = ?"
+            " WHERE id = ?", (time.time(), hid))
+
+    def fail(self, hid: str, error: str) -> str:
+        """Record a failed attempt; returns the new state (pending with a backoff, or failed)."""
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute("SELECT attempts FROM items WHERE id = ?", (hid,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            state = "failed" if attempts >= self.max_attempts else "pending"
+            self._db.execute(
+                "UPDATE items SET state = ?, attempts = ?, next_at = ?, error = ?, owner = NULL,"
+                " lease_until = NULL, updated_at = ? WHERE id = ?",
+                (state, attempts, now + backoff(attempts), error, now, hid))
+        return state
+
+    def release(self, owner: str) -> int:
+        """Hand back `owner`'s in-flight items unchanged (clean interrupt); returns how many."""
+        return self._db.execute(
+            "UPDATE items SET state = 'pending', owner = NULL, lease_until = NULL, updated_at = ?"
+            " WHERE state = 'in_flight' AND owner = ?", (time.time(), owner)).rowcount
+
+    # ─── Queries ─────────────────────────────────────────────────────────────
+    def counts(self) -> dict[str, int]:
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self._db.execute("SELECT state, COUNT(*) FROM items GROUP BY state"))
+        return counts
+
+    def next_retry(self) -> float | None:
+        """Seconds until the next pending item is due; None when nothing is pending."""
+        row = self._db.execute(f"SELECT MIN(next_at) FROM items WHERE state = 'pending'{self._scope}").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def failures(self) -> list[tuple[str, int, str]]:
+        return self._db.execute(
+            "SELECT id, attempts, error FROM items WHERE state = 'failed' ORDER BY seq").fetchall()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()